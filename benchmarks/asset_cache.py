@@ -0,0 +1,160 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+import aiohttp
+from fakes import FakeCDN
+from prefix_cache import commit, parse_sizes
+from utils.assets import AssetCache
+from utils.benchmark import Histogram
+
+DEFAULT_REQUESTS: Final[tuple[int, ...]] = (1_000, 10_000)
+
+
+def lookups(count: int, emojis: int, seed: int = 0) -> list[int]:
+    """
+    Emoji IDs the way they are asked for, a few popular emojis make up most of the lookups
+    """
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, emojis + 1)]
+    return rng.choices(range(1, emojis + 1), weights=weights, k=count)
+
+
+async def measure(
+    name: str, fetch: Callable[[int], Awaitable[Any]], batch: list[int], concurrency: int
+) -> dict[str, float]:
+    histogram = Histogram(name)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(emoji_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter_ns()
+            await fetch(emoji_id)
+            histogram.record(time.perf_counter_ns() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*map(one, batch))
+    elapsed = time.perf_counter() - started
+    return {
+        f"{name}.seconds": elapsed,
+        f"{name}.per_second": len(batch) / elapsed if elapsed else 0.0,
+        f"{name}.p50_ms": histogram.percentile(0.50) / 1e6,
+        f"{name}.p99_ms": histogram.percentile(0.99) / 1e6,
+    }
+
+
+async def run(requests: int, args: argparse.Namespace) -> dict[str, float]:
+    metrics: dict[str, float] = {}
+    batch = lookups(requests, args.emojis)
+    fake = FakeCDN(size=args.size, latency=args.latency)
+    cdn = await fake.start()
+
+    # A session for every download and nothing kept, the way one-off downloads tend to be written
+    async def uncached(emoji_id: int) -> bytes:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{cdn}/emojis/{emoji_id}.png") as response:
+                return await response.read()
+
+    metrics.update(await measure("uncached", uncached, batch, args.concurrency))
+    metrics["uncached.requests"] = fake.requests
+    metrics["uncached.connections"] = len(fake.connections)
+
+    with tempfile.TemporaryDirectory() as root:
+        fake.requests = 0
+        fake.connections.clear()
+        cache = await AssetCache(root, cdn=cdn, max_memory_bytes=args.memory)
+        metrics.update(await measure("cold", cache.emoji, batch, args.concurrency))
+        metrics["cold.requests"] = fake.requests
+        metrics["cold.connections"] = len(fake.connections)
+        metrics["cold.hit_ratio"] = cache.stats.hit_ratio
+        metrics.update(await measure("warm", cache.emoji, batch, args.concurrency))
+        await cache.close()
+
+        # A restarted process only has the disk to go on
+        fake.requests = 0
+        cache = await AssetCache(root, cdn=cdn, max_memory_bytes=args.memory)
+        metrics.update(await measure("restarted", cache.emoji, batch, args.concurrency))
+        metrics["restarted.requests"] = fake.requests
+        await cache.close()
+    await fake.close()
+    return metrics
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the asset cache against a local fake of Discord's CDN"
+    )
+    parser.add_argument(
+        "--requests", type=parse_sizes, default=DEFAULT_REQUESTS, help="comma separated lookup counts"
+    )
+    parser.add_argument("--emojis", type=int, default=2_000, help="distinct emojis looked up")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="bytes of every image")
+    parser.add_argument("--latency", type=float, default=0.02, help="latency of the CDN, in seconds")
+    parser.add_argument("--memory", type=int, default=32 * 1024 * 1024, help="bytes of images kept in memory")
+    parser.add_argument("--concurrency", type=int, default=32, help="lookups in flight")
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_assets.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for requests in args.requests:
+        metrics = await run(requests, args)
+        results.append({"requests": requests, "metrics": metrics})
+        print(
+            f"requests={requests:<6} "
+            + " ".join(
+                f"{name}={metrics[f'{name}.per_second']:>8.0f}/s (p99 {metrics[f'{name}.p99_ms']:.1f}ms)"
+                for name in ("uncached", "cold", "warm", "restarted")
+            )
+            + f" connections={metrics['uncached.connections']:.0f}/{metrics['cold.connections']:.0f}",
+            flush=True,
+        )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "emojis": args.emojis,
+                "size": args.size,
+                "results": results,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+from discord.http import HTTPClient, Route
+from fakes import FakeDiscord
+from prefix_cache import commit, parse_sizes
+from utils.bulk import BulkScheduler, CreateEmoji, DeleteEmoji, EditEmoji, EmojiJob
+
+DEFAULT_GUILDS: Final[tuple[int, ...]] = (1, 10, 50)
+# The smallest valid GIF, the fake endpoint does not look at it anyway
+IMAGE: Final[bytes] = b"GIF89a\x01\x00\x01\x00\x00\x00\x00;"
+
+
+def jobs(guilds: int, per_guild: int) -> list[EmojiJob]:
+    """
+    A clone, a rename and a delete for every emoji, spread over the guilds
+    """
+    made: list[EmojiJob] = []
+    for index in range(per_guild):
+        for guild_id in range(1, guilds + 1):
+            kind = index % 3
+            if kind == 0:
+                made.append(CreateEmoji(guild_id, f"emoji_{index}", IMAGE))
+            elif kind == 1:
+                made.append(EditEmoji(guild_id, index, name=f"renamed_{index}"))
+            else:
+                made.append(DeleteEmoji(guild_id, index))
+    return made
+
+
+async def sequential(http: HTTPClient, batch: list[EmojiJob]) -> None:
+    for job in batch:
+        await job.run(http)
+
+
+async def scheduled(scheduler: BulkScheduler, batch: list[EmojiJob]) -> None:
+    await scheduler.submit(batch)
+
+
+async def run(guilds: int, args: argparse.Namespace) -> dict[str, float]:
+    metrics: dict[str, float] = {}
+    for name in ("sequential", "scheduled"):
+        fake = FakeDiscord(
+            limit=args.limit, window=args.window, latency=args.latency, error_rate=args.error_rate
+        )
+        Route.BASE = await fake.start()
+        http = HTTPClient(asyncio.get_running_loop())
+        await http.static_login("fake")
+        scheduler = BulkScheduler(http, concurrency=args.concurrency, base_delay=0.1)
+        batch = jobs(guilds, args.jobs)
+        started = time.perf_counter()
+        if name == "sequential":
+            await sequential(http, batch)
+        else:
+            await scheduled(scheduler, batch)
+        elapsed = time.perf_counter() - started
+        await http.close()
+        await fake.close()
+        metrics.update(
+            {
+                f"{name}.seconds": elapsed,
+                f"{name}.jobs_per_second": len(batch) / elapsed if elapsed else 0.0,
+                f"{name}.requests": fake.requests,
+                f"{name}.rate_limited": fake.limited,
+            }
+        )
+    return metrics
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks bulk emoji jobs against a local fake of Discord, one by one and scheduled"
+    )
+    parser.add_argument(
+        "--guilds", type=parse_sizes, default=DEFAULT_GUILDS, help="comma separated guild counts"
+    )
+    parser.add_argument("--jobs", type=int, default=30, help="jobs per guild")
+    parser.add_argument("--limit", type=int, default=5, help="requests a guild may make per window")
+    parser.add_argument("--window", type=float, default=1.0, help="rate limit window, in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="latency of every request, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs in flight across guilds")
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_bulk.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for guilds in args.guilds:
+        metrics = await run(guilds, args)
+        results.append({"guilds": guilds, "metrics": metrics})
+        print(
+            f"guilds={guilds:<4} jobs={guilds * args.jobs:<6} "
+            f"sequential={metrics['sequential.jobs_per_second']:>7.1f}/s "
+            f"scheduled={metrics['scheduled.jobs_per_second']:>7.1f}/s "
+            f"429s={metrics['sequential.rate_limited']:.0f}/{metrics['scheduled.rate_limited']:.0f}",
+            flush=True,
+        )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "jobs": args.jobs,
+                "results": results,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
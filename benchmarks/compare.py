@@ -0,0 +1,75 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Final
+
+# Metrics where a larger number is better, everything else is better when smaller
+HIGHER_IS_BETTER: Final[tuple[str, ...]] = ("_per_second",)
+# Counts that describe the run rather than measure it
+IGNORED: Final[tuple[str, ...]] = ("lazy.held",)
+
+
+def load(path: Path) -> dict[tuple[int, int], dict[str, float]]:
+    data: dict[str, Any] = json.loads(path.read_text(encoding="UTF-8"))
+    return {(result["guilds"], result["prefixes"]): result["metrics"] for result in data["results"]}
+
+
+def change(metric: str, before: float, after: float) -> float:
+    """
+    The relative change of a metric, positive when it got worse
+    """
+    if not before:
+        return 0.0
+    delta = (after - before) / before
+    return -delta if metric.endswith(HIGHER_IS_BETTER) else delta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares two prefix cache benchmark results")
+    parser.add_argument("before", type=Path, help="results of the baseline commit")
+    parser.add_argument("after", type=Path, help="results of the commit under test")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression"
+    )
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    for run in sorted(before.keys() & after.keys()):
+        for metric in sorted(before[run].keys() & after[run].keys()):
+            if metric in IGNORED:
+                continue
+            worse = change(metric, before[run][metric], after[run][metric])
+            flag = "REGRESSION" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(
+                f"guilds={run[0]:<9} prefixes={run[1]:<3} {metric:<28} "
+                f"{before[run][metric]:>16,.2f} -> {after[run][metric]:>16,.2f} {-worse:>+8.1%} {flag}"
+            )
+    if regressions:
+        print(f"{regressions} metrics regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
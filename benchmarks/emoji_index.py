@@ -0,0 +1,149 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+import psutil
+from prefix_cache import commit, parse_sizes
+from utils.benchmark import Histogram
+from utils.emojis import EmojiEntry, EmojiIndex
+
+DEFAULT_EMOJIS: Final[tuple[int, ...]] = (10_000, 100_000, 1_000_000)
+SYLLABLES: Final[tuple[str, ...]] = tuple(
+    consonant + vowel for consonant in "bcdfghjklmnprstvwz" for vowel in ("a", "e", "i", "o", "u", "ay", "oo")
+)
+
+
+def names(count: int, seed: int = 0) -> list[str]:
+    """
+    Emoji names the way people tend to make them up: a word or two, sometimes numbered
+    """
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(max(count // 20, 100))]
+    made: list[str] = []
+    for _ in range(count):
+        name = rng.choice(words)
+        if rng.random() < 0.4:
+            name = f"{name}_{rng.choice(words)}"
+        if rng.random() < 0.2:
+            name = f"{name}{rng.randint(1, 99)}"
+        made.append(name[:32])
+    return made
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    index = rng.randrange(len(name))
+    if rng.random() < 0.5:
+        return name[:index] + name[index + 1 :]
+    return name[:index] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[index + 1 :]
+
+
+def bench(prefix: str, search: Callable[[str], list[EmojiEntry]], queries: list[str]) -> dict[str, float]:
+    histogram = Histogram(prefix)
+    record = histogram.record
+    clock = time.perf_counter_ns
+    found = 0
+    for query in queries:
+        start = clock()
+        found += len(search(query))
+        record(clock() - start)
+    return {
+        f"{prefix}.p50_us": histogram.percentile(0.50) / 1e3,
+        f"{prefix}.p99_us": histogram.percentile(0.99) / 1e3,
+        f"{prefix}.max_us": histogram.max / 1e3,
+        f"{prefix}.found_per_query": found / len(queries),
+    }
+
+
+def run(count: int, queries: int) -> dict[str, float]:
+    rng = random.Random(1)
+    made = names(count)
+    process = psutil.Process()
+    gc.collect()
+    rss = process.memory_info().rss
+    index = EmojiIndex()
+    started = time.perf_counter()
+    for emoji_id, name in enumerate(made):
+        index.add(EmojiEntry(emoji_id, emoji_id // 50, name, emoji_id % 7 == 0))
+    elapsed = time.perf_counter() - started
+    metrics: dict[str, float] = {
+        "build.seconds": elapsed,
+        "build.emojis_per_second": count / elapsed if elapsed else 0.0,
+        "build.rss_bytes": process.memory_info().rss - rss,
+    }
+    sample = rng.choices(made, k=queries)
+    metrics.update(bench("exact", index.exact, sample))
+    metrics.update(bench("prefix", index.prefix, [name[: rng.randint(1, 4)] for name in sample]))
+    metrics.update(bench("fuzzy", index.fuzzy, [misspell(name, rng) for name in sample]))
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks building and searching the emoji index")
+    parser.add_argument(
+        "--emojis", type=parse_sizes, default=DEFAULT_EMOJIS, help="comma separated emoji counts"
+    )
+    parser.add_argument("--queries", type=int, default=10_000, help="searches of each kind per run")
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_emojis.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for count in args.emojis:
+        metrics = run(count, args.queries)
+        results.append({"emojis": count, "metrics": metrics})
+        print(
+            f"emojis={count:<9} build={metrics['build.emojis_per_second']:>10,.0f}/s "
+            f"exact p99={metrics['exact.p99_us']:.1f}us "
+            f"prefix p99={metrics['prefix.p99_us']:.1f}us "
+            f"fuzzy p99={metrics['fuzzy.p99_us']:.1f}us "
+            f"rss={metrics['build.rss_bytes'] / 2**20:,.1f}MiB",
+            flush=True,
+        )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "queries": args.queries,
+                "results": results,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
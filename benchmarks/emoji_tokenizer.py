@@ -0,0 +1,177 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+from prefix_cache import commit, parse_sizes
+from utils.emojis.tokenizer import (
+    CUSTOM_EMOJI,
+    QUALIFIED,
+    TOKENIZER,
+    Tokenizer,
+    load_sequences,
+    scan,
+    tokenize,
+)
+
+DEFAULT_MESSAGES: Final[tuple[int, ...]] = (10_000, 100_000)
+WORDS: Final[dict[str, tuple[str, ...]]] = {
+    "english": ("the", "emoji", "is", "so", "good", "lol", "what", "did", "you", "mean", "ok", "gg", "2nd"),
+    "russian": ("привет", "как", "дела", "это", "очень", "смешно", "да", "нет"),
+    "japanese": ("こんにちは", "絵文字", "かわいい", "ありがとう", "草", "です"),
+}
+CORPORA: Final[tuple[str, ...]] = ("chat", "multilingual", "emoji_heavy", "custom")
+
+
+def corpus(kind: str, count: int, sequences: list[str], seed: int = 0) -> list[str]:
+    """
+    Messages the way they tend to look in each kind of server: `chat` is mostly
+    English with an emoji every now and then, `multilingual` is the same beyond ASCII,
+    `emoji_heavy` has skin tones, families and flags in every message
+    and `custom` is mostly custom emojis
+    """
+    rng = random.Random(seed)
+    # A few emojis are used far more than the rest
+    popular = rng.sample(sequences, 50)
+    compound = [sequence for sequence in sequences if len(sequence) > 2]
+    made: list[str] = []
+    for _ in range(count):
+        words = WORDS["english" if kind in ("chat", "custom") else rng.choice(list(WORDS))]
+        parts = [rng.choice(words) for _ in range(rng.randint(1, 20))]
+        if kind == "chat" and rng.random() < 0.1:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(popular))
+        elif kind == "multilingual" and rng.random() < 0.3:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(popular))
+        elif kind == "emoji_heavy":
+            for _ in range(rng.randint(1, 6)):
+                parts.insert(rng.randrange(len(parts) + 1), rng.choice(compound))
+        elif kind == "custom":
+            for _ in range(rng.randint(1, 4)):
+                name = rng.choice(("pepe_laugh", "kek", "blobwave", "catJAM", "ok_hand"))
+                emoji = f"<{rng.choice(('', 'a'))}:{name}:{rng.randrange(10**17, 10**18)}>"
+                parts.insert(rng.randrange(len(parts) + 1), emoji)
+        made.append(" ".join(parts))
+    return made
+
+
+def naive(sequences: list[str]) -> re.Pattern[str]:
+    """
+    Every sequence as an alternative of its own, longest first, the way emoji regexes usually get written
+    """
+    ordered = sorted(sequences, key=len, reverse=True)
+    return re.compile("|".join((CUSTOM_EMOJI, *map(re.escape, ordered))))
+
+
+def measure(messages: list[str], func: Callable[[str], list[str]]) -> tuple[float, int]:
+    found = 0
+    started = time.perf_counter()
+    for message in messages:
+        found += len(func(message))
+    return time.perf_counter() - started, found
+
+
+def run(count: int, sequences: list[str], pattern: re.Pattern[str]) -> dict[str, float]:
+    metrics: dict[str, float] = {}
+    everything = [*sequences, *QUALIFIED]
+    implementations: dict[str, Callable[[str], list[str]]] = {
+        "naive": lambda message: [match["id"] or match[0] for match in pattern.finditer(message)],
+        "trie": lambda message: [match["id"] or match[0] for match in TOKENIZER.pattern.finditer(message)],
+        "starts": lambda message: [match["id"] or match[0] for match in TOKENIZER.finditer(message)],
+        "scan": scan,
+        "tokenize": lambda message: list(tokenize(message)),
+    }
+    for kind in CORPORA:
+        messages = corpus(kind, count, everything)
+        size = sum(len(message.encode()) for message in messages) / 1e6
+        counts: set[int] = set()
+        for name, func in implementations.items():
+            elapsed, found = measure(messages, func)
+            counts.add(found)
+            metrics[f"{kind}.{name}.messages_per_second"] = count / elapsed if elapsed else 0.0
+            metrics[f"{kind}.{name}.mb_per_second"] = size / elapsed if elapsed else 0.0
+        if len(counts) != 1:
+            raise AssertionError(f"The implementations disagree on {kind}: {counts}")
+        metrics[f"{kind}.emojis"] = counts.pop()
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the emoji tokenizer against a plain alternation of every emoji sequence"
+    )
+    parser.add_argument(
+        "--messages", type=parse_sizes, default=DEFAULT_MESSAGES, help="comma separated message counts"
+    )
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_tokenizer.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    sequences = load_sequences()
+    started = time.perf_counter()
+    pattern = naive([*sequences, *QUALIFIED])
+    naive_compile = time.perf_counter() - started
+    started = time.perf_counter()
+    Tokenizer([*sequences, *QUALIFIED])
+    trie_compile = time.perf_counter() - started
+    print(f"compile naive={naive_compile * 1e3:.0f}ms trie={trie_compile * 1e3:.0f}ms", flush=True)
+
+    results: list[dict[str, Any]] = []
+    for count in args.messages:
+        metrics = run(count, sequences, pattern)
+        results.append({"messages": count, "metrics": metrics})
+        for kind in CORPORA:
+            print(
+                f"messages={count:<7} {kind:<13} "
+                + " ".join(
+                    f"{name}={metrics[f'{kind}.{name}.mb_per_second']:>6.1f}MB/s"
+                    for name in ("naive", "trie", "starts", "scan", "tokenize")
+                ),
+                flush=True,
+            )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "compile_naive_seconds": naive_compile,
+                "compile_trie_seconds": trie_compile,
+                "results": results,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+
+
+if __name__ == "__main__":
+    main()
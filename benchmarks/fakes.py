@@ -0,0 +1,427 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, ClassVar, Final, Iterator
+
+from aiohttp import web
+from utils.caching.queries import CHANGES, SELECT, SELECT_ALL, SELECT_MANY, WATERMARK
+
+__all__: Final[tuple[str, ...]] = (
+    "FakeRecord",
+    "FakePool",
+    "FakeUser",
+    "FakeGuild",
+    "FakeMessage",
+    "FakeBot",
+    "FakeDiscord",
+    "prefixes_for",
+    "messages",
+)
+
+# Guilds mostly pick from a small set of popular prefixes, so do the fake ones
+_PREFIX_POOL: Final[tuple[str, ...]] = tuple(
+    f"{head}{tail}"
+    for head in ("!", "?", ".", "$", "e", "wiz", ">>", "em")
+    for tail in ("", "!", " ", ".", "?")
+) + tuple(f"p{index}" for index in range(960))
+
+
+def prefixes_for(guild_id: int, count: int) -> list[str]:
+    """
+    The prefixes a fake guild has, these are the same on every call
+
+    Args:
+        guild_id (int): The fake guild ID
+        count (int): How many prefixes the guilds have
+
+    Returns:
+        list[str]: The prefixes of the guild
+    """
+    start = guild_id * 31 % len(_PREFIX_POOL)
+    return [_PREFIX_POOL[(start + index) % len(_PREFIX_POOL)] for index in range(count)]
+
+
+class FakeRecord:
+    """
+    Stands in for `asyncpg.Record`, which cannot be built from Python,
+    it can be indexed both by position and by column name.
+    """
+
+    __slots__: ClassVar[tuple[str, str]] = ("__columns", "__values")
+
+    def __init__(self, columns: dict[str, int], values: tuple[Any, ...]) -> None:
+        self.__columns: dict[str, int] = columns
+        self.__values: tuple[Any, ...] = values
+
+    def __getitem__(self, key: int | str) -> Any:
+        if isinstance(key, str):
+            key = self.__columns[key]
+        return self.__values[key]
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def __repr__(self) -> str:
+        return f"<FakeRecord {' '.join(f'{k}={v!r}' for k, v in self.items())}>"
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__columns)
+
+    def values(self) -> Iterator[Any]:
+        return iter(self.__values)
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        return zip(self.__columns, self.__values)
+
+
+_COLUMNS: Final[dict[str, int]] = {"guild_id": 0, "guild_prefix": 1}
+_CHANGES: Final[dict[str, int]] = {"watermark": 0, "keys": 1}
+
+
+class FakeCursor:
+    __slots__: ClassVar[tuple[str]] = ("__rows",)
+
+    def __init__(self, rows: Iterator[FakeRecord]) -> None:
+        self.__rows: Iterator[FakeRecord] = rows
+
+    async def fetch(self, count: int) -> list[FakeRecord]:
+        return [row for _, row in zip(range(count), self.__rows)]
+
+
+class FakeTransaction:
+    __slots__: ClassVar[tuple[()]] = ()
+
+    async def __aenter__(self) -> FakeTransaction:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        return None
+
+
+class FakePool:
+    """
+    Stands in for both `asyncpg.Pool` and the connections acquired from it,
+    serving the prefix queries from a table that is generated on the fly,
+    `guilds` guilds (with IDs 0 through guilds - 1) with `prefixes` prefixes each.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("guilds", "prefixes", "queries")
+
+    def __init__(self, guilds: int, prefixes: int) -> None:
+        self.guilds: int = guilds
+        self.prefixes: int = prefixes
+        self.queries: int = 0
+
+    def rows(self, guild_ids: Iterator[int]) -> Iterator[FakeRecord]:
+        for guild_id in guild_ids:
+            if 0 <= guild_id < self.guilds:
+                for prefix in prefixes_for(guild_id, self.prefixes):
+                    yield FakeRecord(_COLUMNS, (guild_id, prefix))
+
+    def __select(self, query: str, args: tuple[Any, ...]) -> Iterator[FakeRecord]:
+        self.queries += 1
+        if query == SELECT_ALL.sql:
+            return self.rows(iter(range(self.guilds)))
+        if query == SELECT.sql:
+            return self.rows(iter(args[:1]))
+        if query == SELECT_MANY.sql:
+            return self.rows(iter(args[0]))
+        return iter(())
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[FakePool]:
+        yield self
+
+    def transaction(self, **_) -> FakeTransaction:
+        return FakeTransaction()
+
+    async def cursor(self, query: str, *args: Any) -> FakeCursor:
+        return FakeCursor(self.__select(query, args))
+
+    async def fetch(self, query: str, *args: Any, **_) -> list[FakeRecord]:
+        return list(self.__select(query, args))
+
+    async def fetchrow(self, query: str, *args: Any, **_) -> FakeRecord | None:
+        self.queries += 1
+        # The fake table never changes, so there is never anything to catch up on
+        return FakeRecord(_CHANGES, (0, [])) if query == CHANGES.sql else None
+
+    async def fetchval(self, query: str, *args: Any, **_) -> Any:
+        self.queries += 1
+        return 0 if query == WATERMARK.sql else None
+
+    async def execute(self, query: str, *args: Any, **_) -> str:
+        self.queries += 1
+        return "OK"
+
+
+class FakeUser:
+    __slots__: ClassVar[tuple[str]] = ("id",)
+
+    def __init__(self, user_id: int) -> None:
+        self.id: int = user_id
+
+
+class FakeGuild:
+    __slots__: ClassVar[tuple[str]] = ("id",)
+
+    def __init__(self, guild_id: int) -> None:
+        self.id: int = guild_id
+
+
+class FakeMessage:
+    __slots__: ClassVar[tuple[str, str]] = ("guild", "content")
+
+    def __init__(self, guild: FakeGuild | None, content: str) -> None:
+        self.guild: FakeGuild | None = guild
+        self.content: str = content
+
+
+class FakeBot:
+    __slots__: ClassVar[tuple[str]] = ("user",)
+
+    def __init__(self, user_id: int = 1) -> None:
+        self.user: FakeUser = FakeUser(user_id)
+
+
+def _json(payload: Any, *, status: int = 200, headers: dict[str, str] | None = None) -> web.Response:
+    # discord.py only decodes bodies sent as exactly `application/json`, without a charset
+    return web.Response(
+        body=json.dumps(payload).encode(),
+        status=status,
+        headers={**(headers or {}), "Content-Type": "application/json"},
+    )
+
+
+class FakeDiscord:
+    """
+    A local HTTP server that answers the emoji routes like Discord would, rate limiting
+    every guild to `limit` requests per `window` seconds with the same headers Discord sends.
+    Requests take `latency` seconds and `error_rate` of them fail with `error_status`.
+    The most requests each guild had in flight at once are kept in `peaks`.
+
+    Args:
+        limit (int): How many requests a guild may make per window
+        window (float): How long a window is, in seconds
+        latency (float): How long every request takes, in seconds
+        error_rate (float): The fraction of requests that fail
+        error_status (int): What failed requests respond with, discord.py retries a 502 by itself
+        seed (int): The seed of the random generator
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "limit",
+        "window",
+        "latency",
+        "error_rate",
+        "error_status",
+        "requests",
+        "limited",
+        "errors",
+        "peaks",
+        "__in_flight",
+        "__rng",
+        "__windows",
+        "__ids",
+        "__runner",
+    )
+
+    def __init__(
+        self,
+        *,
+        limit: int = 5,
+        window: float = 1.0,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        error_status: int = 502,
+        seed: int = 0,
+    ) -> None:
+        self.limit: int = limit
+        self.window: float = window
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.error_status: int = error_status
+        self.requests: int = 0
+        self.limited: int = 0
+        self.errors: int = 0
+        self.peaks: dict[int, int] = {}
+        self.__in_flight: dict[int, int] = {}
+        self.__rng = random.Random(seed)
+        # Guild ID to when its window started and how many requests it has made in it
+        self.__windows: dict[int, tuple[float, int]] = {}
+        self.__ids: Iterator[int] = itertools.count(1)
+        self.__runner: web.AppRunner | None = None
+
+    async def start(self, port: int = 0) -> str:
+        """
+        Returns:
+            str: The base URL of the API, for `discord.http.Route.BASE`
+        """
+        app = web.Application()
+        app.router.add_get("/api/v10/users/@me", self.__me)
+        app.router.add_post("/api/v10/guilds/{guild_id}/emojis", self.__emoji)
+        app.router.add_patch("/api/v10/guilds/{guild_id}/emojis/{emoji_id}", self.__emoji)
+        app.router.add_delete("/api/v10/guilds/{guild_id}/emojis/{emoji_id}", self.__emoji)
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, "127.0.0.1", port)
+        await site.start()
+        host, bound = self.__runner.addresses[0][:2]
+        return f"http://{host}:{bound}/api/v10"
+
+    async def close(self) -> None:
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+
+    async def __me(self, _request: web.Request) -> web.Response:
+        return _json({"id": "1", "username": "fake", "discriminator": "0", "avatar": None})
+
+    async def __emoji(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        guild_id = int(request.match_info["guild_id"])
+        in_flight = self.__in_flight[guild_id] = self.__in_flight.get(guild_id, 0) + 1
+        self.peaks[guild_id] = max(self.peaks.get(guild_id, 0), in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return await self.__respond(request, guild_id)
+        finally:
+            self.__in_flight[guild_id] -= 1
+
+    async def __respond(self, request: web.Request, guild_id: int) -> web.Response:
+        now = time.monotonic()
+        started, used = self.__windows.get(guild_id, (now, 0))
+        if now - started >= self.window:
+            started, used = now, 0
+        reset_after = self.window - (now - started)
+        if used >= self.limit:
+            self.limited += 1
+            return _json(
+                {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                status=429,
+                headers={**self.__headers(0, reset_after), "Via": "1.1 google"},
+            )
+        self.__windows[guild_id] = (started, used + 1)
+        headers = self.__headers(self.limit - used - 1, reset_after)
+        if self.__rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.error_status, text="Server Error", headers=headers)
+        if request.method == "DELETE":
+            return web.Response(status=204, headers=headers)
+        emoji_id = request.match_info.get("emoji_id") or str(next(self.__ids))
+        payload = await request.json()
+        return _json(
+            {"id": emoji_id, "name": payload.get("name"), "roles": [], "animated": False}, headers=headers
+        )
+
+    def __headers(self, remaining: int, reset_after: float) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": "emojis",
+        }
+
+
+class FakeCDN:
+    """
+    A local HTTP server that serves emoji images like Discord's CDN would, every image
+    is `size` made up bytes derived from its ID and takes `latency` seconds to arrive.
+
+    Args:
+        size (int): How many bytes every image is
+        latency (float): How long every request takes, in seconds
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("size", "latency", "requests", "connections", "__runner")
+
+    def __init__(self, *, size: int = 64 * 1024, latency: float = 0.02) -> None:
+        self.size: int = size
+        self.latency: float = latency
+        self.requests: int = 0
+        self.connections: set[tuple[str, int]] = set()
+        self.__runner: web.AppRunner | None = None
+
+    async def start(self, port: int = 0) -> str:
+        """
+        Returns:
+            str: The base URL of the CDN
+        """
+        app = web.Application()
+        app.router.add_get("/emojis/{name}", self.__emoji)
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, "127.0.0.1", port)
+        await site.start()
+        host, bound = self.__runner.addresses[0][:2]
+        return f"http://{host}:{bound}"
+
+    async def close(self) -> None:
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+
+    @staticmethod
+    def image(emoji_id: int, size: int) -> bytes:
+        """
+        Returns:
+            bytes: The made up image of an emoji
+        """
+        return random.Random(emoji_id).randbytes(size)
+
+    async def __emoji(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if request.transport is not None:
+            self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.latency)
+        emoji_id, _, extension = request.match_info["name"].partition(".")
+        return web.Response(
+            body=self.image(int(emoji_id), self.size),
+            content_type="image/gif" if extension == "gif" else "image/png",
+        )
+
+
+def messages(pool: FakePool, count: int, *, command_ratio: float = 0.1, seed: int = 0) -> list[FakeMessage]:
+    """
+    Builds a batch of fake messages spread over the guilds of the pool,
+    `command_ratio` of which start with one of their guild's prefixes.
+
+    Args:
+        pool (FakePool): The pool to take the guilds from
+        count (int): How many messages to build
+        command_ratio (float): The fraction of messages that are commands
+        seed (int): The seed of the random generator
+
+    Returns:
+        list[FakeMessage]: The messages
+    """
+    rng = random.Random(seed)
+    batch: list[FakeMessage] = []
+    for _ in range(count):
+        guild = FakeGuild(rng.randrange(pool.guilds))
+        if rng.random() < command_ratio:
+            content = f"{rng.choice(prefixes_for(guild.id, pool.prefixes))}help"
+        else:
+            content = rng.choice(("hello there", "lol", "anyone around?", ":emoji: nice", "gg"))
+        batch.append(FakeMessage(guild, content))
+    return batch
@@ -0,0 +1,144 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+from PIL import Image, ImageDraw
+from prefix_cache import commit
+from utils.benchmark import Histogram
+from utils.images import ImagePipeline, fit_emoji
+
+TICK: Final[float] = 0.01
+
+
+def animation(side: int, frames: int, *, noise: bool, seed: int = 0) -> bytes:
+    """
+    A moving circle, over noise (the worst case for GIF compression) or over nothing
+    """
+    rng = random.Random(seed)
+    made: list[Image.Image] = []
+    for index in range(frames):
+        if noise:
+            frame = Image.effect_noise((side, side), rng.randint(40, 100)).convert("RGB")
+        else:
+            frame = Image.new("RGBA", (side, side), (0, 0, 0, 0))
+        left = index * 4 % side
+        ImageDraw.Draw(frame).ellipse((left, side // 4, left + side // 4, side // 2), fill=(255, 80, 0))
+        made.append(frame)
+    buffer = io.BytesIO()
+    made[0].save(buffer, "GIF", save_all=True, append_images=made[1:], duration=40, loop=0, disposal=2)
+    return buffer.getvalue()
+
+
+async def ticker(histogram: Histogram, stop: asyncio.Event) -> None:
+    """
+    Stands in for the rest of the bot, records how late the event loop wakes it up
+    """
+    while not stop.is_set():
+        start = time.perf_counter_ns()
+        await asyncio.sleep(TICK)
+        histogram.record(max(0, time.perf_counter_ns() - start - int(TICK * 1e9)))
+
+
+async def measure(name: str, fit: Callable[[bytes], Awaitable[Any]], images: list[bytes]) -> dict[str, float]:
+    lag = Histogram(f"{name}.lag")
+    stop = asyncio.Event()
+    task = asyncio.create_task(ticker(lag, stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(fit(image) for image in images))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    return {
+        f"{name}.images_per_second": len(images) / elapsed,
+        f"{name}.passes": sum(result.passes for result in results) / len(results),
+        f"{name}.lag_p50_ms": lag.percentile(0.50) / 1e6,
+        f"{name}.lag_p99_ms": lag.percentile(0.99) / 1e6,
+        f"{name}.lag_max_ms": lag.max / 1e6,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmarks fitting GIFs under the emoji size limit, on the event loop and on the pipeline"
+        )
+    )
+    parser.add_argument("--images", type=int, default=8, help="how many GIFs to fit")
+    parser.add_argument("--side", type=int, default=320, help="how large the GIFs are")
+    parser.add_argument("--frames", type=int, default=60, help="how many frames the GIFs have")
+    parser.add_argument("--workers", type=int, default=None, help="image worker processes")
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_images.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    images = [
+        animation(args.side, args.frames, noise=index % 2 == 0, seed=index) for index in range(args.images)
+    ]
+    pipeline = ImagePipeline(workers=args.workers, max_pending=args.images, timeout=120.0)
+    # The workers are started up front, which the bot only pays for once
+    await pipeline.fit(images[-1])
+
+    async def inline(image: bytes) -> Any:
+        return fit_emoji(image)
+
+    metrics: dict[str, float] = {}
+    metrics.update(await measure("inline", inline, images))
+    metrics.update(await measure("pipeline", pipeline.fit, images))
+    pipeline.close()
+    for name in ("inline", "pipeline"):
+        print(
+            f"{name:<8} {metrics[f'{name}.images_per_second']:>6.2f} images/s "
+            f"passes={metrics[f'{name}.passes']:.1f} "
+            f"loop lag p99={metrics[f'{name}.lag_p99_ms']:.1f}ms max={metrics[f'{name}.lag_max_ms']:.1f}ms",
+            flush=True,
+        )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "workers": pipeline.workers,
+                "images": args.images,
+                "metrics": metrics,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,207 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# pylint: disable=wrong-import-position
+import psutil
+from fakes import FakeBot, FakeMessage, FakePool, messages
+from utils.benchmark import Histogram
+from utils.caching import PrefixCache
+from utils.caching.queries import SELECT_ALL
+
+DEFAULT_GUILDS: Final[tuple[int, ...]] = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_PREFIXES: Final[tuple[int, ...]] = (1, 8, 32)
+DEFAULT_PREFIX: Final[tuple[str, ...]] = ("!", "wiz ")
+
+
+def new_cache(pool: FakePool, **kwargs: Any) -> PrefixCache:
+    return PrefixCache(
+        pool=pool,
+        fetch_query=SELECT_ALL,
+        key="guild_id",
+        default=DEFAULT_PREFIX,
+        compact=True,
+        **kwargs,
+    )
+
+
+def latency(prefix: str, histogram: Histogram, elapsed: float) -> dict[str, float]:
+    return {
+        f"{prefix}.ops_per_second": histogram.count / elapsed if elapsed else 0.0,
+        f"{prefix}.p50_us": histogram.percentile(0.50) / 1e3,
+        f"{prefix}.p95_us": histogram.percentile(0.95) / 1e3,
+        f"{prefix}.p99_us": histogram.percentile(0.99) / 1e3,
+    }
+
+
+async def bench_pull(pool: FakePool) -> tuple[PrefixCache, dict[str, float]]:
+    process = psutil.Process()
+    gc.collect()
+    rss = process.memory_info().rss
+    cache = new_cache(pool)
+    started = time.perf_counter()
+    await cache.pull()
+    elapsed = time.perf_counter() - started
+    rows = pool.guilds * pool.prefixes
+    return cache, {
+        "pull.seconds": elapsed,
+        "pull.rows_per_second": rows / elapsed if elapsed else 0.0,
+        "pull.rss_bytes": process.memory_info().rss - rss,
+        "store.footprint_bytes": cache.footprint(),
+    }
+
+
+async def bench_call(cache: PrefixCache, batch: list[FakeMessage], prefix: str) -> dict[str, float]:
+    bot = FakeBot()
+    histogram = Histogram(prefix)
+    record = histogram.record
+    clock = time.perf_counter_ns
+    started = time.perf_counter()
+    for message in batch:
+        start = clock()
+        await cache(bot, message)
+        record(clock() - start)
+    return latency(prefix, histogram, time.perf_counter() - started)
+
+
+async def bench_get_prefix_for(cache: PrefixCache, batch: list[FakeMessage]) -> dict[str, float]:
+    histogram = Histogram("get_prefix_for")
+    record = histogram.record
+    clock = time.perf_counter_ns
+    started = time.perf_counter()
+    for message in batch:
+        start = clock()
+        try:
+            await cache.get_prefix_for(message.guild.id)
+        except KeyError:
+            pass
+        record(clock() - start)
+    return latency("get_prefix_for", histogram, time.perf_counter() - started)
+
+
+async def bench_lazy(pool: FakePool, batch: list[FakeMessage]) -> dict[str, float]:
+    cache = new_cache(pool, lazy=True, max_size=max(pool.guilds // 2, 1))
+    await cache
+    bot = FakeBot()
+    queries = pool.queries
+    started = time.perf_counter()
+    # Messages come in concurrently, so that misses get coalesced like they would be live
+    for start in range(0, len(batch), 1_000):
+        await asyncio.gather(*(cache(bot, message) for message in batch[start : start + 1_000]))
+    elapsed = time.perf_counter() - started
+    return {
+        "lazy.ops_per_second": len(batch) / elapsed if elapsed else 0.0,
+        "lazy.queries": pool.queries - queries,
+        "lazy.held": len(cache),
+    }
+
+
+async def run(guilds: int, prefixes: int, count: int) -> dict[str, float]:
+    pool = FakePool(guilds, prefixes)
+    batch = messages(pool, count)
+    cache, metrics = await bench_pull(pool)
+    # The first pass compiles the matchers, the second one only looks them up
+    metrics.update(await bench_call(cache, batch, "call_cold"))
+    metrics.update(await bench_call(cache, batch, "call"))
+    metrics.update(await bench_get_prefix_for(cache, batch))
+    del cache
+    metrics.update(await bench_lazy(pool, batch))
+    return metrics
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"),
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_sizes(value: str) -> tuple[int, ...]:
+    return tuple(int(size.replace("_", "")) for size in value.split(","))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmarks the prefix cache (pull, prefix resolution and lazy loading) "
+            "offline, against a fake pool and fake messages"
+        )
+    )
+    parser.add_argument(
+        "--guilds", type=parse_sizes, default=DEFAULT_GUILDS, help="comma separated guild counts"
+    )
+    parser.add_argument(
+        "--prefixes", type=parse_sizes, default=DEFAULT_PREFIXES, help="comma separated prefixes per guild"
+    )
+    parser.add_argument("--messages", type=int, default=100_000, help="messages resolved per run")
+    parser.add_argument(
+        "--output", type=Path, default=Path("bench_results.json"), help="where to write the results"
+    )
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for guilds in args.guilds:
+        for prefixes in args.prefixes:
+            metrics = await run(guilds, prefixes, args.messages)
+            results.append({"guilds": guilds, "prefixes": prefixes, "metrics": metrics})
+            print(
+                f"guilds={guilds:<9} prefixes={prefixes:<3} "
+                f"pull={metrics['pull.rows_per_second']:>12,.0f} rows/s "
+                f"call={metrics['call.ops_per_second']:>10,.0f} ops/s "
+                f"(p99 {metrics['call.p99_us']:.1f}us) "
+                f"store={metrics['store.footprint_bytes'] / 2**20:,.1f}MiB",
+                flush=True,
+            )
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "commit": commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "messages": args.messages,
+                "results": results,
+            },
+            indent=2,
+        ),
+        encoding="UTF-8",
+    )
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
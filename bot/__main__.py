@@ -17,11 +17,54 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import asyncio
 import logging
+import signal
+from multiprocessing.synchronize import Event
 
 import asyncpg
 import tools
-from core import EmojiBot
-from options import ALLOWED_MENTIONS, DEFAULT_PREFIX, INTENTS, LOGGING_FORMAT
+from cluster import Cluster, fetch_gateway
+from core import AutoShardedEmojiBot, EmojiBot
+from options import (
+    ALLOWED_MENTIONS,
+    ASSET_CACHE_DIR,
+    ASSET_CDN,
+    ASSET_DISK_BYTES,
+    ASSET_INDEX_INTERVAL,
+    ASSET_MEMORY_BYTES,
+    AUTO_SHARDED,
+    BULK_CONCURRENCY,
+    BULK_MAX_ATTEMPTS,
+    BULK_PER_GUILD,
+    CHUNK_GUILDS_AT_STARTUP,
+    CLUSTER_PROCESSES,
+    COMMAND_TIMEOUT,
+    DEFAULT_PREFIX,
+    IMAGE_QUEUE_DEPTH,
+    IMAGE_TIMEOUT,
+    IMAGE_WORKERS,
+    INTENTS,
+    LAZY_PREFIXES,
+    LEAN,
+    LOGGING_FORMAT,
+    MAX_INACTIVE_CONNECTION_LIFETIME,
+    MAX_MESSAGES,
+    MAX_RATELIMIT_TIMEOUT,
+    MEMBER_CACHE_FLAGS,
+    MEMORY_REPORT_INTERVAL,
+    POOL_MAX_SIZE,
+    POOL_MIN_SIZE,
+    PREFIX_CACHE_SIZE,
+    PREFIX_CHANNEL,
+    PREFIX_SNAPSHOT,
+    PREFIX_SNAPSHOT_INTERVAL,
+    PREFIX_SYNC_INTERVAL,
+    SHARD_COUNT,
+    STATEMENT_CACHE_SIZE,
+    USAGE_BUCKET,
+    USAGE_FLUSH_INTERVAL,
+)
+from utils import benchmark
+from utils.migrations import migrate
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -29,19 +72,120 @@ logging.basicConfig(
 )
 
 
-async def main() -> None:
+async def main(
+    *,
+    shard_ids: list[int] | None = None,
+    shard_count: int | None = SHARD_COUNT,
+    ready: Event | None = None,
+) -> None:
     """
     Instantiates `EmojiBot` and starts it.
     This is the main entry point for the bot.
+
+    Args:
+        shard_ids (list[int] | None): The shards this process runs, None for all of them
+        shard_count (int | None): The total number of shards, None lets Discord recommend one
+        ready (Event | None): Set once every shard of this process is ready
     """
-    bot: EmojiBot = EmojiBot(
+    if benchmark.ENABLED:
+        # Dumps the benchmark histograms on `kill -USR1 <pid>`
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, benchmark.report)
+    dsn = tools.findenv("DATABASE_URL")
+    # The schema has to be up to date before the bot queries it
+    connection = await asyncpg.connect(dsn)
+    try:
+        await migrate(connection)
+    finally:
+        await connection.close()
+    sharded = AUTO_SHARDED or shard_ids is not None
+    snapshot = PREFIX_SNAPSHOT
+    assets = ASSET_CACHE_DIR
+    if shard_ids is not None:
+        # Every worker of a cluster holds different guilds
+        if snapshot is not None:
+            snapshot = f"{snapshot}.{shard_ids[0]}-{shard_ids[-1]}"
+        assets = f"{assets}/{shard_ids[0]}-{shard_ids[-1]}"
+    options = {"shard_ids": shard_ids} if shard_ids is not None else {}
+    bot: EmojiBot = (AutoShardedEmojiBot if sharded else EmojiBot)(
         default_prefix=DEFAULT_PREFIX,
         allowed_mentions=ALLOWED_MENTIONS,
         intents=INTENTS,
-        pool=await asyncpg.create_pool(tools.findenv("DATABASE_URL")),
+        member_cache_flags=MEMBER_CACHE_FLAGS,
+        chunk_guilds_at_startup=CHUNK_GUILDS_AT_STARTUP,
+        max_messages=MAX_MESSAGES,
+        pool=await asyncpg.create_pool(
+            dsn,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            statement_cache_size=STATEMENT_CACHE_SIZE,
+            command_timeout=COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=MAX_INACTIVE_CONNECTION_LIFETIME,
+        ),
+        lazy_prefixes=LAZY_PREFIXES,
+        prefix_cache_size=PREFIX_CACHE_SIZE,
+        prefix_channel=PREFIX_CHANNEL,
+        prefix_sync_interval=PREFIX_SYNC_INTERVAL,
+        prefix_snapshot=snapshot,
+        prefix_snapshot_interval=PREFIX_SNAPSHOT_INTERVAL,
+        usage_bucket=USAGE_BUCKET,
+        usage_flush_interval=USAGE_FLUSH_INTERVAL,
+        bulk_concurrency=BULK_CONCURRENCY,
+        bulk_per_guild=BULK_PER_GUILD,
+        bulk_max_attempts=BULK_MAX_ATTEMPTS,
+        max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT,
+        image_workers=IMAGE_WORKERS,
+        image_queue_depth=IMAGE_QUEUE_DEPTH,
+        image_timeout=IMAGE_TIMEOUT,
+        asset_cache_dir=assets,
+        asset_disk_bytes=ASSET_DISK_BYTES,
+        asset_memory_bytes=ASSET_MEMORY_BYTES,
+        asset_cdn=ASSET_CDN,
+        asset_index_interval=ASSET_INDEX_INTERVAL,
+        lean=LEAN,
+        memory_report_interval=MEMORY_REPORT_INTERVAL,
+        shard_count=shard_count,
+        **options,
     )
+    if ready is not None:
+
+        async def on_ready() -> None:
+            ready.set()
+
+        bot.add_listener(on_ready)
     await bot.start(tools.findenv("DISCORD_TOKEN"))
 
 
+def work(shard_ids: list[int], shard_count: int, ready: Event) -> None:
+    """
+    Runs a single worker process of the cluster
+
+    Args:
+        shard_ids (list[int]): The shards this worker runs
+        shard_count (int): The total number of shards
+        ready (Event): Set once every shard of this worker is ready
+    """
+    asyncio.run(main(shard_ids=shard_ids, shard_count=shard_count, ready=ready))
+
+
+def run_cluster(processes: int) -> None:
+    """
+    Spreads the shards over `processes` worker processes and supervises them
+
+    Args:
+        processes (int): The number of worker processes
+    """
+    shard_count, max_concurrency = fetch_gateway(tools.findenv("DISCORD_TOKEN"))
+    supervisor = Cluster(
+        work,
+        processes=processes,
+        shard_count=SHARD_COUNT or max(shard_count, processes),
+        max_concurrency=max_concurrency,
+    )
+    supervisor.run()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if CLUSTER_PROCESSES:
+        run_cluster(CLUSTER_PROCESSES)
+    else:
+        asyncio.run(main())
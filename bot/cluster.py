@@ -0,0 +1,241 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import multiprocessing
+import signal
+import time
+import urllib.request
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from multiprocessing.synchronize import Event
+from typing import Callable, ClassVar, Final
+
+__all__: Final[tuple[str, ...]] = ("Cluster", "shard_ranges", "fetch_gateway")
+
+logger = logging.getLogger(__name__)
+
+# Discord allows `max_concurrency` identifies every this many seconds
+IDENTIFY_INTERVAL: Final[float] = 5.0
+
+WorkerTarget = Callable[[list[int], int, Event], None]
+
+
+def shard_ranges(shard_count: int, processes: int) -> list[list[int]]:
+    """
+    Splits the shards into contiguous ranges, one for each process,
+    the first few ranges take one more shard when they do not split evenly
+
+    Args:
+        shard_count (int): The total number of shards
+        processes (int): The number of processes
+
+    Returns:
+        list[list[int]]: The shard IDs of every process
+    """
+    if not 0 < processes <= shard_count:
+        raise ValueError(f"Cannot split {shard_count} shards over {processes} processes")
+    size, extra = divmod(shard_count, processes)
+    ranges: list[list[int]] = []
+    start = 0
+    for index in range(processes):
+        stop = start + size + (index < extra)
+        ranges.append(list(range(start, stop)))
+        start = stop
+    return ranges
+
+
+def fetch_gateway(token: str) -> tuple[int, int]:
+    """
+    Asks Discord for the recommended number of shards and the identify concurrency
+
+    Args:
+        token (str): The bot token
+
+    Returns:
+        tuple[int, int]: The shard count and the max concurrency
+    """
+    request = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (EmojiWizard)"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        data = json.load(response)
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+class Worker:
+    """
+    A single worker process of the cluster, along with its restart bookkeeping
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "index",
+        "shard_ids",
+        "process",
+        "ready",
+        "failures",
+        "started_at",
+    )
+
+    def __init__(self, index: int, shard_ids: list[int]) -> None:
+        self.index: int = index
+        self.shard_ids: list[int] = shard_ids
+        self.process: BaseProcess | None = None
+        self.ready: Event | None = None
+        self.failures: int = 0
+        self.started_at: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Worker index={self.index} shards={self.shard_ids[0]}-{self.shard_ids[-1]}>"
+
+
+class Cluster:
+    """
+    Runs the bot over several processes, each of them owning a contiguous range of shards.
+    Workers are started one after the other, each one only once the previous one has
+    identified all of its shards (or took too long to), so that together they stay
+    within the identify concurrency. Workers that exit are restarted with an exponential backoff.
+
+    Args:
+        target (WorkerTarget): Runs a worker, given its shard IDs, the shard count
+            and an event it has to set once all of its shards are ready
+        processes (int): The number of worker processes
+        shard_count (int): The total number of shards
+        max_concurrency (int): How many shards may identify every 5 seconds
+        max_backoff (float): The longest a crashed worker waits before it is restarted
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "target",
+        "shard_count",
+        "max_concurrency",
+        "max_backoff",
+        "workers",
+        "__context",
+        "__stopping",
+    )
+
+    # A worker that stays up for this long is considered healthy again
+    HEALTHY_AFTER: ClassVar[float] = 60.0
+
+    def __init__(
+        self,
+        target: WorkerTarget,
+        *,
+        processes: int,
+        shard_count: int,
+        max_concurrency: int = 1,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.target: WorkerTarget = target
+        self.shard_count: int = shard_count
+        self.max_concurrency: int = max_concurrency
+        self.max_backoff: float = max_backoff
+        self.workers: list[Worker] = [
+            Worker(index, shard_ids) for index, shard_ids in enumerate(shard_ranges(shard_count, processes))
+        ]
+        self.__context = multiprocessing.get_context("spawn")
+        self.__stopping: bool = False
+
+    def run(self) -> None:
+        """
+        Starts every worker and supervises them until SIGINT or SIGTERM is received
+        """
+        signal.signal(signal.SIGTERM, self.__stop)
+        signal.signal(signal.SIGINT, self.__stop)
+        logger.info("Starting %s workers for %s shards", len(self.workers), self.shard_count)
+        try:
+            for worker in self.workers:
+                if self.__stopping:
+                    break
+                self.__start(worker)
+            self.__supervise()
+        finally:
+            self.__shutdown()
+
+    def __start(self, worker: Worker) -> None:
+        worker.ready = self.__context.Event()
+        worker.process = self.__context.Process(
+            target=self.target,
+            args=(worker.shard_ids, self.shard_count, worker.ready),
+            name=f"emojiwizard-worker-{worker.index}",
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        logger.info("Started %r as pid %s", worker, worker.process.pid)
+        # Identifies of the next worker have to wait for this one's to go through
+        windows = math.ceil(len(worker.shard_ids) / self.max_concurrency)
+        timeout = IDENTIFY_INTERVAL * windows + 60.0
+        deadline = worker.started_at + timeout
+        while not worker.ready.wait(0.5):
+            if self.__stopping or not worker.process.is_alive():
+                return
+            if time.monotonic() > deadline:
+                logger.warning("%r did not become ready within %.0fs, moving on", worker, timeout)
+                break
+        time.sleep(IDENTIFY_INTERVAL)
+
+    def __supervise(self) -> None:
+        while not self.__stopping:
+            sentinels = {
+                worker.process.sentinel: worker for worker in self.workers if worker.process is not None
+            }
+            for sentinel in wait(list(sentinels), timeout=1.0):
+                worker = sentinels[sentinel]
+                if self.__stopping:
+                    break
+                self.__restart(worker)
+
+    def __restart(self, worker: Worker) -> None:
+        worker.process.join()
+        uptime = time.monotonic() - worker.started_at
+        worker.failures = 0 if uptime > self.HEALTHY_AFTER else worker.failures + 1
+        delay = min(2.0**worker.failures, self.max_backoff) if worker.failures else 0.0
+        logger.error(
+            "%r exited with code %s after %.0fs, restarting in %.0fs",
+            worker,
+            worker.process.exitcode,
+            uptime,
+            delay,
+        )
+        worker.process.close()
+        worker.process = None
+        deadline = time.monotonic() + delay
+        while not self.__stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
+        if not self.__stopping:
+            self.__start(worker)
+
+    def __stop(self, signum: int, _frame: object) -> None:
+        logger.info("Received %s, stopping the cluster", signal.Signals(signum).name)
+        self.__stopping = True
+
+    def __shutdown(self) -> None:
+        running = [worker.process for worker in self.workers if worker.process is not None]
+        for process in running:
+            if process.is_alive():
+                process.terminate()
+        for process in running:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        logger.info("Cluster stopped")
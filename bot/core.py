@@ -19,15 +19,24 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
 from pathlib import Path
-from typing import ClassVar, Coroutine, Final
+from typing import ClassVar, Coroutine, Final, Sequence
 
-from asyncpg import Pool
-from discord.ext import commands
+from asyncpg import InterfaceError, Pool, PostgresError
+from discord import Emoji, Guild, Message, RawReactionActionEvent
+from discord.ext import commands, tasks
+from utils.assets import CDN, AssetCache
+from utils.bulk import BulkScheduler
 from utils.caching import PrefixCache
 from utils.caching.queries import SELECT_ALL
+from utils.emojis import EmojiIndex
+from utils.images import ImagePipeline
+from utils.memory import discord_caches, process_memory
+from utils.startup import Stage, Startup
+from utils.usage import UsageRecorder
 
-__all__: Final[tuple[str]] = ("EmojiBot",)
+__all__: Final[tuple[str, str]] = ("EmojiBot", "AutoShardedEmojiBot")
 
 logger = logging.getLogger(__name__)
 
@@ -38,23 +47,115 @@ class EmojiBot(commands.Bot):
     This class is slotted and does not have a __dict__ attribute
     """
 
-    __slots__: ClassVar[tuple[str, str]] = ("prefix", "pool")
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "prefix",
+        "pool",
+        "prefix_channel",
+        "prefix_sync",
+        "prefix_snapshot",
+        "startup",
+        "__closing",
+        "emoji_index",
+        "usage",
+        "usage_flush",
+        "bulk",
+        "images",
+        "assets",
+        "asset_index",
+        "lean",
+        "memory_reports",
+        "accepted_messages",
+        "rejected_messages",
+    )
 
-    def __init__(self, *args, pool: Pool, **kwargs) -> None:
+    def __init__(
+        self,
+        *args,
+        pool: Pool,
+        lazy_prefixes: bool = False,
+        prefix_cache_size: int | None = None,
+        prefix_channel: str | None = None,
+        prefix_sync_interval: float = 300.0,
+        prefix_snapshot: str | os.PathLike[str] | None = None,
+        prefix_snapshot_interval: float = 900.0,
+        usage_bucket: int = 3600,
+        usage_flush_interval: float = 60.0,
+        bulk_concurrency: int = 8,
+        bulk_per_guild: int = 1,
+        bulk_max_attempts: int = 5,
+        image_workers: int | None = None,
+        image_queue_depth: int = 32,
+        image_timeout: float = 20.0,
+        asset_cache_dir: str | os.PathLike[str] = "assets",
+        asset_disk_bytes: int = 512 * 1024 * 1024,
+        asset_memory_bytes: int = 32 * 1024 * 1024,
+        asset_cdn: str = CDN,
+        asset_index_interval: float = 300.0,
+        lean: bool = False,
+        memory_report_interval: float | None = 600.0,
+        **kwargs,
+    ) -> None:
         if "command_prefix" in kwargs:
             raise ValueError("command_prefix need not be set manually, provide default_prefix instead")
         if (default_prefix := kwargs.pop("default_prefix")) is None:
             raise ValueError("default_prefix must be set")
 
         self.pool: Pool = pool
+        self.startup: Startup = Startup(on_failure=self.abort_startup)
+        self.__closing: asyncio.Task[None] | None = None
+        # Every emoji of every guild the bot can see, searchable by name
+        self.emoji_index: EmojiIndex = EmojiIndex()
+        # Fits uploaded images within the size limit of emojis, on worker processes
+        self.images: ImagePipeline = ImagePipeline(
+            workers=image_workers, max_pending=image_queue_depth, timeout=image_timeout
+        )
+        # Downloaded emoji images, kept in memory and on disk by their content
+        self.assets: AssetCache = AssetCache(
+            asset_cache_dir,
+            cdn=asset_cdn,
+            max_disk_bytes=asset_disk_bytes,
+            max_memory_bytes=asset_memory_bytes,
+        )
+        # Keeps the index of the assets on disk fresh, so that a crashed process still finds them
+        self.asset_index: tasks.Loop = tasks.loop(seconds=asset_index_interval)(self.assets.save)
+        self.asset_index.add_exception_type(OSError)
+        # Emoji usage is counted in memory and written to the database in batches
+        self.usage: UsageRecorder = UsageRecorder(pool, bucket=usage_bucket)
+        self.usage_flush: tasks.Loop = tasks.loop(seconds=usage_flush_interval)(self.usage.flush)
+        self.usage_flush.add_exception_type(PostgresError, InterfaceError)
+        # Only tells the memory reports apart, the caches themselves are set up by discord.py
+        self.lean: bool = lean
+        self.memory_reports: tasks.Loop | None = None
+        if memory_report_interval is not None:
+            self.memory_reports = tasks.loop(seconds=memory_report_interval)(self.log_memory)
+        self.accepted_messages: int = 0
+        self.rejected_messages: int = 0
+        self.prefix_channel: str | None = prefix_channel
         self.prefix: PrefixCache = PrefixCache(
             default=default_prefix,
             pool=pool,
             fetch_query=SELECT_ALL,
             key="guild_id",
-            pass_into=commands.when_mentioned_or,
+            mentionable=True,
+            compact=True,
+            lazy=lazy_prefixes,
+            max_size=prefix_cache_size,
+            snapshot=prefix_snapshot,
         )
+        # Catches up on whatever changes the notifications may have missed
+        self.prefix_sync: tasks.Loop = tasks.loop(seconds=prefix_sync_interval)(self.prefix.sync)
+        self.prefix_sync.add_exception_type(PostgresError, InterfaceError, OSError)
+        # Keeps the snapshot fresh, so that a crashed process can still warm up from it
+        self.prefix_snapshot: tasks.Loop = tasks.loop(seconds=prefix_snapshot_interval)(self.prefix.save)
+        self.prefix_snapshot.add_exception_type(OSError)
         super().__init__(*args, **kwargs, command_prefix=self.prefix)
+        # Runs bulk emoji jobs (cloning, mass deleting, renaming) within the rate limits
+        self.bulk: BulkScheduler = BulkScheduler(
+            self.http,
+            concurrency=bulk_concurrency,
+            per_guild=bulk_per_guild,
+            max_attempts=bulk_max_attempts,
+        )
 
     async def on_ready(self) -> None:
         """
@@ -64,16 +165,114 @@ class EmojiBot(commands.Bot):
         """
         logger.info("Successfully logged in as %s", self.user)
 
+    async def on_guild_available(self, guild: Guild) -> None:
+        """
+        Called when a guild becomes available, including when the bot first connects
+        """
+        self.emoji_index.replace_guild(guild.id, guild.emojis)
+
+    async def on_guild_join(self, guild: Guild) -> None:
+        """
+        Called when the bot joins a guild
+        """
+        self.emoji_index.replace_guild(guild.id, guild.emojis)
+
+    async def on_guild_remove(self, guild: Guild) -> None:
+        """
+        Called when the bot leaves a guild, or the guild is deleted
+        """
+        self.emoji_index.drop_guild(guild.id)
+
+    async def on_guild_emojis_update(
+        self, guild: Guild, _before: Sequence[Emoji], after: Sequence[Emoji]
+    ) -> None:
+        """
+        Called when a guild adds, removes or renames emojis, only those are indexed again
+        """
+        self.emoji_index.replace_guild(guild.id, after)
+
+    async def on_message(self, message: Message) -> None:
+        """
+        Called for every message the bot can see, the emojis used in it are counted
+        before it is processed as a command
+        """
+        if not message.author.bot:
+            self.usage.record_message(message)
+        await self.process_commands(message)
+
+    async def on_raw_reaction_add(self, payload: RawReactionActionEvent) -> None:
+        """
+        Called when a reaction is added to any message, cached or not
+        """
+        if payload.member is None or not payload.member.bot:
+            self.usage.record_reaction(payload)
+
+    async def process_commands(self, message: Message) -> None:
+        """
+        Drops the messages that cannot be commands before a context is built for them,
+        only the ones that start with a prefix of their guild (or a mention) go through.
+        The number of accepted and rejected messages is kept count of.
+        """
+        if message.author.bot:
+            return
+        if not self.prefix.could_be_command(self, message):
+            self.rejected_messages += 1
+            return
+        self.accepted_messages += 1
+        # Commands cannot be found until their extensions are loaded, whereas
+        # the prefixes are looked up guild by guild until the cache is warm
+        if not self.startup.is_ready("extensions") and not await self.startup.wait_for("extensions"):
+            return
+        await super().process_commands(message)
+
     async def setup_hook(self) -> None:
         """
         To perform asynchronous setup after the bot is logged in but
         before it has connected to the Websocket.
-        Here, this will be leveraged to ready up the prefix cache
-        and load extension from the `cogs` directory
+        Here, this kicks off readying up the prefix cache and loading the extensions
+        from the `cogs` directory, without waiting for either, see `startup`.
+        The bot is closed if either of them fails
+        """
+        self.startup.add("prefix", self.warm_prefixes, critical=True)
+        self.startup.add("extensions", self.load_extensions, critical=True)
+        self.startup.add("assets", self.load_assets)
+        self.startup.start()
+        self.usage_flush.start()
+        if self.memory_reports is not None:
+            self.memory_reports.start()
+
+    def abort_startup(self, stage: Stage) -> None:
+        """
+        Called when a stage the bot cannot run without fails, such as when the database
+        cannot be reached or an extension does not load, the bot is closed rather than left half up
+        """
+        logger.critical("Closing, as startup stage %s failed: %r", stage.name, stage.error)
+        if self.__closing is None:
+            # Not awaited by the stage, since closing cancels what is left of the startup
+            self.__closing = asyncio.create_task(self.close())
+
+    async def warm_prefixes(self) -> None:
+        """
+        Readies up the prefix cache, then starts keeping it in step with the database
         """
-        # Ready up prefix
         await self.prefix
-        # Load extensions
+        if self.prefix_channel is not None:
+            await self.prefix.listen(self.prefix_channel)
+        self.prefix_sync.start()
+        if self.prefix.snapshot is not None:
+            self.prefix_snapshot.start()
+
+    async def load_assets(self) -> None:
+        """
+        Loads the index of the asset cache, then starts saving it every now and then
+        """
+        await self.assets.load()
+        self.asset_index.start()
+
+    async def load_extensions(self) -> None:
+        """
+        Loads every extension in the `cogs` directory
+        """
         load_ext: list[Coroutine[None, None, None]] = []
         path = (Path(__file__).parent / "cogs").resolve()
 
@@ -81,3 +280,124 @@ class EmojiBot(commands.Bot):
             load_ext.append(self.load_extension(f"cogs.{ext.stem}"))
 
         await asyncio.gather(*load_ext)
+
+    def memory_report(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: The memory of the process in bytes, and how many objects every cache holds
+        """
+        return {
+            **process_memory(),
+            **discord_caches(self),
+            "prefixes": len(self.prefix),
+            "indexed_emojis": len(self.emoji_index),
+            "assets_on_disk": len(self.assets.disk),
+            "asset_memory_bytes": self.assets.memory_size,
+            "pending_usage": len(self.usage),
+        }
+
+    async def log_memory(self) -> None:
+        """
+        Logs the RSS of the process along with the size of every cache
+        """
+        report = self.memory_report()
+        logger.info(
+            "Memory of the %s configuration: %.1f MiB RSS, %s",
+            "lean" if self.lean else "full",
+            report.pop("rss") / 2**20,
+            report,
+        )
+
+    async def close(self) -> None:
+        """
+        Stops listening for and syncing prefix changes, saves a last snapshot
+        of the prefixes, flushes the emoji usage, cancels the bulk jobs, stops the image workers
+        and saves the index of the asset cache before closing the bot, logging a last memory report
+        """
+        self.startup.cancel()
+        if self.memory_reports is not None:
+            self.memory_reports.cancel()
+        await self.log_memory()
+        await self.bulk.close()
+        self.images.close()
+        self.asset_index.cancel()
+        await self.assets.close()
+        self.usage_flush.cancel()
+        await self.usage.flush()
+        self.prefix_sync.cancel()
+        self.prefix_snapshot.cancel()
+        await self.prefix.unlisten()
+        try:
+            await self.prefix.save()
+        except OSError:
+            logger.exception("Could not save a snapshot of the prefixes")
+        logger.info(
+            "Accepted %s and rejected %s messages before building a context",
+            self.accepted_messages,
+            self.rejected_messages,
+        )
+        logger.info("Prefix cache stats: %s", self.prefix.stats.summary())
+        logger.info("Bulk scheduler stats: %s", self.bulk.summary())
+        logger.info("Asset cache stats: %s", self.assets.stats.summary())
+        await super().close()
+
+
+class AutoShardedEmojiBot(EmojiBot, commands.AutoShardedBot):
+    """
+    The auto sharded variant of `EmojiBot`, its prefix cache is partitioned so that
+    only the guilds of the shards this process owns are held.
+    A shard that stays disconnected for longer than `shard_grace` seconds
+    is dropped from the cache, and pulled again if it ever connects back.
+    """
+
+    __slots__: ClassVar[tuple[str, str]] = ("shard_grace", "__dropping")
+
+    def __init__(self, *args, shard_grace: float = 300.0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.shard_grace: float = shard_grace
+        self.__dropping: dict[int, asyncio.TimerHandle] = {}
+
+    async def setup_hook(self) -> None:
+        """
+        Partitions the prefix cache before it is readied up,
+        asking Discord for the recommended shard count if none was given
+        """
+        if self.shard_count is None:
+            self.shard_count, _, _ = await self.http.get_bot_gateway()
+        self.prefix.partition(self.shard_count, self.shard_ids)
+        await super().setup_hook()
+
+    async def on_shard_disconnect(self, shard_id: int) -> None:
+        """
+        Called when a shard is disconnected, which also happens right before it reconnects,
+        so the shard is only dropped from the cache if it does not come back in time
+        """
+        if shard_id not in self.__dropping:
+            self.__dropping[shard_id] = asyncio.get_running_loop().call_later(
+                self.shard_grace, self.__drop, shard_id
+            )
+
+    async def on_shard_connect(self, shard_id: int) -> None:
+        """
+        Called when a shard connects, this is also called for the initial connection
+        """
+        await self.__revive(shard_id)
+
+    async def on_shard_resumed(self, shard_id: int) -> None:
+        """
+        Called when a shard resumes its session
+        """
+        await self.__revive(shard_id)
+
+    def __drop(self, shard_id: int) -> None:
+        del self.__dropping[shard_id]
+        logger.warning(
+            "Shard %s did not reconnect within %ss, dropping it from the cache", shard_id, self.shard_grace
+        )
+        self.prefix.drop_shard(shard_id)
+
+    async def __revive(self, shard_id: int) -> None:
+        if (handle := self.__dropping.pop(shard_id, None)) is not None:
+            handle.cancel()
+        if shard_id not in self.prefix.shard_ids:
+            await self.prefix.pull_shard(shard_id)
@@ -17,20 +17,57 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from typing import Final
 
-from discord import AllowedMentions, Intents
+from discord import AllowedMentions, Intents, MemberCacheFlags
 
 __all__: Final[tuple[str, ...]] = (
     "DEFAULT_PREFIX",
+    "LEAN",
     "INTENTS",
+    "MEMBER_CACHE_FLAGS",
+    "CHUNK_GUILDS_AT_STARTUP",
+    "MAX_MESSAGES",
+    "MEMORY_REPORT_INTERVAL",
     "ALLOWED_MENTIONS",
     "LOGGING_FORMAT",
+    "LAZY_PREFIXES",
+    "PREFIX_CACHE_SIZE",
+    "PREFIX_CHANNEL",
+    "PREFIX_SYNC_INTERVAL",
+    "PREFIX_SNAPSHOT",
+    "PREFIX_SNAPSHOT_INTERVAL",
+    "USAGE_BUCKET",
+    "USAGE_FLUSH_INTERVAL",
+    "BULK_CONCURRENCY",
+    "BULK_PER_GUILD",
+    "BULK_MAX_ATTEMPTS",
+    "MAX_RATELIMIT_TIMEOUT",
+    "IMAGE_WORKERS",
+    "IMAGE_QUEUE_DEPTH",
+    "IMAGE_TIMEOUT",
+    "ASSET_CACHE_DIR",
+    "ASSET_DISK_BYTES",
+    "ASSET_MEMORY_BYTES",
+    "ASSET_CDN",
+    "ASSET_INDEX_INTERVAL",
+    "AUTO_SHARDED",
+    "SHARD_COUNT",
+    "CLUSTER_PROCESSES",
+    "POOL_MIN_SIZE",
+    "POOL_MAX_SIZE",
+    "STATEMENT_CACHE_SIZE",
+    "COMMAND_TIMEOUT",
+    "MAX_INACTIVE_CONNECTION_LIFETIME",
 )
 
 
 DEFAULT_PREFIX: Final[tuple[str, ...]] = ("!", "wiz ")
+# The emoji features never look at members, nor at messages after they are sent.
+# Lean mode neither receives members nor caches them, does not chunk guilds on startup
+# and keeps no message cache, which is most of the memory of a bot in many large guilds
+LEAN: Final[bool] = False
 INTENTS: Final[Intents] = Intents(
     guilds=True,
-    members=True,
+    members=not LEAN,
     bans=False,
     emojis_and_stickers=True,
     integrations=False,
@@ -46,5 +83,78 @@ INTENTS: Final[Intents] = Intents(
 )
 ALLOWED_MENTIONS: Final[AllowedMentions] = AllowedMentions.none()
 ALLOWED_MENTIONS.replied_user = True
+MEMBER_CACHE_FLAGS: Final[MemberCacheFlags] = (
+    MemberCacheFlags.none() if LEAN else MemberCacheFlags.from_intents(INTENTS)
+)
+CHUNK_GUILDS_AT_STARTUP: Final[bool] = not LEAN
+# Messages kept so that edits, deletions and reactions come along with the message, None keeps none
+MAX_MESSAGES: Final[int | None] = None if LEAN else 1000
+# Logs the RSS of the process and how many objects each cache holds every this many seconds,
+# None only does so on shutdown
+MEMORY_REPORT_INTERVAL: Final[float | None] = 600.0
 
 LOGGING_FORMAT: Final[str] = "[%(levelname)s] [%(asctime)s] %(message)s"
+
+# Every guild's prefixes are pulled on startup and kept in memory by default.
+# Set LAZY_PREFIXES to True to pull a guild's prefixes on its first message instead,
+# and PREFIX_CACHE_SIZE to keep at most that many guilds in memory (None for no limit),
+# the least recently used ones are evicted and pulled again when needed
+LAZY_PREFIXES: Final[bool] = False
+PREFIX_CACHE_SIZE: Final[int | None] = None
+# The notification channel prefix changes are published on, so that every process can pick them up
+PREFIX_CHANNEL: Final[str | None] = "guild_prefixes"
+# How often (in seconds) the prefix cache pulls whatever has changed since it last did
+PREFIX_SYNC_INTERVAL: Final[float] = 300.0
+# Where the prefix cache is snapshotted to (every PREFIX_SNAPSHOT_INTERVAL seconds and on close),
+# a restart warms up from it rather than pulling everything again (None to never snapshot)
+PREFIX_SNAPSHOT: Final[str | None] = "snapshots/prefixes.bin"
+PREFIX_SNAPSHOT_INTERVAL: Final[float] = 900.0
+
+# Emoji usage is counted per time bucket of USAGE_BUCKET seconds,
+# and written to the database every USAGE_FLUSH_INTERVAL seconds
+USAGE_BUCKET: Final[int] = 3600
+USAGE_FLUSH_INTERVAL: Final[float] = 60.0
+
+# Bulk emoji jobs in flight across every guild, and within a single guild,
+# a job is given up on after failing BULK_MAX_ATTEMPTS times (rate limits aside)
+BULK_CONCURRENCY: Final[int] = 8
+BULK_PER_GUILD: Final[int] = 1
+BULK_MAX_ATTEMPTS: Final[int] = 5
+# Rate limits longer than this (in seconds, 30 at least) raise rather than being slept through
+# within the request, so that the bulk scheduler can put the guild aside until they reset
+MAX_RATELIMIT_TIMEOUT: Final[float | None] = 30.0
+
+# Worker processes that fit uploaded images within the size limit of emojis (None for half of the CPUs),
+# every process of a cluster runs its own. At most IMAGE_QUEUE_DEPTH images are queued at once,
+# each of them given IMAGE_TIMEOUT seconds
+IMAGE_WORKERS: Final[int | None] = None
+IMAGE_QUEUE_DEPTH: Final[int] = 32
+IMAGE_TIMEOUT: Final[float] = 20.0
+
+# Downloaded emoji images are kept under ASSET_CACHE_DIR, up to ASSET_DISK_BYTES of them,
+# the hottest ASSET_MEMORY_BYTES of which are held in memory as well.
+# Every process of a cluster keeps its own directory
+ASSET_CACHE_DIR: Final[str] = "assets"
+ASSET_DISK_BYTES: Final[int] = 512 * 1024 * 1024
+ASSET_MEMORY_BYTES: Final[int] = (8 if LEAN else 32) * 1024 * 1024
+ASSET_CDN: Final[str] = "https://cdn.discordapp.com"
+# The index of what is on disk is saved every this many seconds, and on shutdown
+ASSET_INDEX_INTERVAL: Final[float] = 300.0
+
+# Run the auto sharded bot, whose prefix cache only holds the guilds of its own shards.
+# SHARD_COUNT is the total number of shards, None lets Discord recommend one
+AUTO_SHARDED: Final[bool] = False
+SHARD_COUNT: Final[int | None] = None
+# Spread the shards over this many processes, each running an auto sharded bot
+# over a contiguous range of them (None runs everything in this process)
+CLUSTER_PROCESSES: Final[int | None] = None
+
+# Connection pool of every process, one of its connections is held for LISTEN
+# when PREFIX_CHANNEL is set. Each connection prepares a query the first time it runs it
+# and keeps it in its statement cache, which should be larger than the number of queries
+POOL_MIN_SIZE: Final[int] = 2
+POOL_MAX_SIZE: Final[int] = 10
+STATEMENT_CACHE_SIZE: Final[int] = 128
+# In seconds, None waits forever
+COMMAND_TIMEOUT: Final[float | None] = 30.0
+MAX_INACTIVE_CONNECTION_LIFETIME: Final[float] = 300.0
@@ -15,20 +15,13 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from typing import TYPE_CHECKING, Callable, Final, Iterable, TypeAlias, TypeVar
+from typing import TYPE_CHECKING, Final, TypeVar
 
-from discord import Message
-
-__all__: Final[tuple[str, ...]] = ("EmojiBot", "PassIntoBase", "Self")
+__all__: Final[tuple[str, ...]] = ("EmojiBot", "Self")
 
 if TYPE_CHECKING:
     from core import EmojiBot
-    from typing_extensions import Self, Unpack
-
-    PassIntoBase: TypeAlias = Callable[
-        [Unpack[tuple[str, ...]]], Callable[[EmojiBot, Message], Iterable[str]]
-    ]
+    from typing_extensions import Self
 else:
     EmojiBot = TypeVar("EmojiBot")
-    PassIntoBase = TypeVar("PassIntoBase", bound=Callable)
     Self = TypeVar("Self")
@@ -0,0 +1,239 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, ClassVar, Final, Generator
+
+import aiohttp
+from typing_extensions import Self
+from utils.caching import CacheStats
+
+from .store import DiskStore
+
+__all__: Final[tuple[str, ...]] = ("AssetCache", "CDN")
+
+logger = logging.getLogger(__name__)
+
+CDN: Final[str] = "https://cdn.discordapp.com"
+
+
+class AssetCache:
+    """
+    Downloads assets (emoji images and such) once and serves them from memory or disk after that.
+    Lookups go through a small in memory LRU of the hottest assets first, bounded by
+    `max_memory_bytes`, then through the `DiskStore`, and only then to the network, over
+    a single connection pooled session. Concurrent lookups of an asset that is being
+    downloaded share the download. Assets are handed out as read only `memoryview`s
+    of the cached buffers, so that serving one from memory copies nothing.
+
+    Awaiting the cache loads the index of the disk store.
+
+    Args:
+        root (str | os.PathLike[str]): The directory to keep the assets in
+        cdn (str): Where emoji images are downloaded from
+        max_disk_bytes (int): The most bytes the assets on disk may take
+        max_memory_bytes (int): The most bytes the assets in memory may take
+        max_asset_bytes (int): Larger assets are refused, rather than downloaded
+        connections (int): The most connections the session keeps open at once
+        timeout (float): How long a download may take, in seconds
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "cdn",
+        "disk",
+        "max_memory_bytes",
+        "max_asset_bytes",
+        "connections",
+        "timeout",
+        "stats",
+        "memory_size",
+        "__memory",
+        "__inflight",
+        "__session",
+    )
+
+    def __init__(
+        self,
+        root: str | os.PathLike[str],
+        *,
+        cdn: str = CDN,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        max_asset_bytes: int = 8 * 1024 * 1024,
+        connections: int = 32,
+        timeout: float = 30.0,
+    ) -> None:
+        self.cdn: str = cdn.rstrip("/")
+        self.disk: DiskStore = DiskStore(root, max_bytes=max_disk_bytes)
+        self.max_memory_bytes: int = max_memory_bytes
+        self.max_asset_bytes: int = max_asset_bytes
+        self.connections: int = connections
+        self.timeout: float = timeout
+        # Hits are served from memory or disk, misses are downloaded
+        self.stats: CacheStats = CacheStats(f"{__name__}.{self.__class__.__name__}")
+        self.memory_size: int = 0
+        self.__memory: OrderedDict[str, bytes] = OrderedDict()
+        self.__inflight: dict[str, asyncio.Task[bytes]] = {}
+        self.__session: aiohttp.ClientSession | None = None
+
+    def __await__(self) -> Generator[Any, None, Self]:
+        yield from self.load().__await__()
+        return self
+
+    def __repr__(self) -> str:
+        return (
+            f"<AssetCache memory={len(self.__memory)} memory_size={self.memory_size} "
+            f"disk={len(self.disk)} disk_size={self.disk.size}>"
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Returns:
+            aiohttp.ClientSession: The session every download goes through, opened on first use
+        """
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.__session
+
+    def emoji_url(self, emoji_id: int, *, animated: bool = False) -> str:
+        """
+        Args:
+            emoji_id (int): The ID of the emoji
+            animated (bool): Whether the emoji is animated
+
+        Returns:
+            str: Where the image of the emoji is downloaded from
+        """
+        return f"{self.cdn}/emojis/{emoji_id}.{'gif' if animated else 'png'}"
+
+    async def emoji(self, emoji_id: int, *, animated: bool = False) -> memoryview:
+        """
+        Args:
+            emoji_id (int): The ID of the emoji
+            animated (bool): Whether the emoji is animated
+
+        Returns:
+            memoryview: The image of the emoji
+        """
+        return await self.fetch(self.emoji_url(emoji_id, animated=animated), key=f"emoji:{emoji_id}")
+
+    async def fetch(self, url: str, *, key: str | None = None) -> memoryview:
+        """
+        Gets an asset, from wherever it is closest
+
+        Args:
+            url (str): Where the asset is downloaded from
+            key (str | None): What the asset is cached by, the URL when None
+
+        Raises:
+            aiohttp.ClientResponseError: The asset could not be downloaded
+            ValueError: The asset is larger than `max_asset_bytes`
+
+        Returns:
+            memoryview: The asset, read only
+        """
+        key = key or url
+        if (data := self.__memory.get(key)) is not None:
+            self.__memory.move_to_end(key)
+            self.stats.hits += 1
+            return memoryview(data)
+        if (task := self.__inflight.get(key)) is None:
+            # The download runs on its own, so that a caller being cancelled cancels neither it
+            # nor the other callers waiting on it
+            task = self.__inflight[key] = asyncio.ensure_future(self.__load(url, key))
+            task.add_done_callback(functools.partial(self.__settled, key))
+        return memoryview(await asyncio.shield(task))
+
+    async def load(self) -> None:
+        """
+        Loads the index of the disk store, the assets already on disk are served from then on
+        """
+        await self.disk.load()
+
+    async def save(self) -> None:
+        """
+        Saves the index of the disk store, assets stored since the last save
+        are not found by their keys after a crash
+        """
+        await self.disk.save()
+
+    async def close(self) -> None:
+        """
+        Cancels the downloads in flight, saves the index of the disk store and closes the session
+        """
+        downloads = list(self.__inflight.values())
+        for task in downloads:
+            task.cancel()
+        await asyncio.gather(*downloads, return_exceptions=True)
+        try:
+            await self.save()
+        except OSError:
+            logger.exception("Could not save the asset index")
+        if self.__session is not None:
+            await self.__session.close()
+
+    async def __load(self, url: str, key: str) -> bytes:
+        if (data := await self.disk.get(key)) is not None:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+            started = time.perf_counter_ns()
+            data = await self.__download(url)
+            self.stats.loads.record(time.perf_counter_ns() - started)
+            await self.disk.put(key, data)
+        self.__remember(key, data)
+        return data
+
+    async def __download(self, url: str) -> bytes:
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            if response.content_length is not None and response.content_length > self.max_asset_bytes:
+                raise ValueError(f"{url} is {response.content_length} bytes, over {self.max_asset_bytes}")
+            data = await response.content.read(self.max_asset_bytes + 1)
+            if len(data) > self.max_asset_bytes:
+                raise ValueError(f"{url} is over {self.max_asset_bytes} bytes")
+            return data
+
+    def __settled(self, key: str, task: asyncio.Task[bytes]) -> None:
+        if self.__inflight.get(key) is task:
+            del self.__inflight[key]
+        if not task.cancelled():
+            # Every caller may have been cancelled, which would leave the exception unretrieved
+            task.exception()
+
+    def __remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        if (previous := self.__memory.pop(key, None)) is not None:
+            self.memory_size -= len(previous)
+        self.__memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.max_memory_bytes:
+            _, evicted = self.__memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+            self.stats.evictions += 1
@@ -0,0 +1,239 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import marshal
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, ClassVar, Final
+
+__all__: Final[tuple[str]] = ("DiskStore",)
+
+logger = logging.getLogger(__name__)
+
+_DIGEST: Final[re.Pattern[str]] = re.compile("[0-9a-f]{40}")
+
+
+class DiskStore:
+    """
+    Keeps assets on disk, content addressed: every asset is written once under the digest
+    of its content (no matter how many keys it is stored under) and keys only point at digests.
+    Once the assets take more than `max_bytes`, the least recently used ones are deleted.
+
+    The keys are held in memory and written to an index file by `save`, `load` reads it back
+    and reconciles it with the disk. Assets written after the index was last saved (say, before
+    a crash) are kept, least recently used of all: no key points at them until their content
+    is stored again, which then costs no write, and they are the first to be evicted otherwise.
+
+    Args:
+        root (str | os.PathLike[str]): The directory to keep the assets in
+        max_bytes (int): The most bytes the assets may take together
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("root", "max_bytes", "size", "__keys", "__blobs", "__users")
+
+    index_version: ClassVar[int] = 1
+
+    def __init__(self, root: str | os.PathLike[str], *, max_bytes: int) -> None:
+        self.root: Path = Path(root)
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        # Key to the digest of its asset
+        self.__keys: dict[str, str] = {}
+        # Digest to the size of the asset, least recently used first
+        self.__blobs: OrderedDict[str, int] = OrderedDict()
+        # Digest to the keys pointing at it
+        self.__users: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__blobs)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__keys
+
+    def __repr__(self) -> str:
+        return (
+            f"<DiskStore root={str(self.root)!r} assets={len(self.__blobs)} "
+            f"keys={len(self.__keys)} size={self.size}>"
+        )
+
+    @staticmethod
+    def digest(data: bytes | memoryview) -> str:
+        """
+        Args:
+            data (bytes | memoryview): The content of an asset
+
+        Returns:
+            str: What the asset is addressed by
+        """
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    async def get(self, key: str) -> bytes | None:
+        """
+        Args:
+            key (str): The key the asset was stored under
+
+        Returns:
+            bytes | None: The asset, None when it is not on disk
+        """
+        if (digest := self.__keys.get(key)) is None:
+            return None
+        self.__blobs.move_to_end(digest)
+        try:
+            return await asyncio.to_thread(self.__path(digest).read_bytes)
+        except FileNotFoundError:
+            logger.warning("Asset %s of %s went missing from the disk", digest, key)
+            self.__forget(digest)
+            return None
+
+    async def put(self, key: str, data: bytes | memoryview) -> str:
+        """
+        Stores an asset under a key, only writing it if no other key has the same content
+
+        Args:
+            key (str): The key to store the asset under
+            data (bytes | memoryview): The asset
+
+        Returns:
+            str: The digest of the asset
+        """
+        digest = self.digest(data)
+        if (previous := self.__keys.get(key)) is not None and previous != digest:
+            self.__users[previous].discard(key)
+        self.__keys[key] = digest
+        self.__users.setdefault(digest, set()).add(key)
+        if digest in self.__blobs:
+            self.__blobs.move_to_end(digest)
+            return digest
+        # Accounted for before it is written, so that the same content put twice is only counted once
+        self.__blobs[digest] = len(data)
+        self.size += len(data)
+        try:
+            await asyncio.to_thread(self.__write, self.__path(digest), data)
+        except OSError:
+            self.__forget(digest)
+            raise
+        await self.__evict()
+        return digest
+
+    async def load(self) -> None:
+        """
+        Reads the index back from the disk, forgetting the keys whose assets are gone
+        and picking up the assets the index does not know of
+        """
+        started = asyncio.get_running_loop().time()
+        keys, blobs, unknown = await asyncio.to_thread(self.__load)
+        self.__keys, self.__blobs, self.__users = {}, OrderedDict(), {}
+        self.size = 0
+        for digest, size in blobs:
+            self.__blobs[digest] = size
+            self.size += size
+        for key, digest in keys.items():
+            if digest in self.__blobs:
+                self.__keys[key] = digest
+                self.__users.setdefault(digest, set()).add(key)
+        logger.info(
+            "Loaded %s assets (%s bytes) from %s in %.2fs, %s of which were not in the index",
+            len(self.__blobs),
+            self.size,
+            self.root,
+            asyncio.get_running_loop().time() - started,
+            unknown,
+        )
+        await self.__evict()
+
+    async def save(self) -> None:
+        """
+        Writes the index to the disk, next to it first and then moved over it
+        """
+        index = {
+            "version": self.index_version,
+            "keys": dict(self.__keys),
+            "blobs": list(self.__blobs.items()),
+        }
+        await asyncio.to_thread(self.__write, self.root / "index", marshal.dumps(index))
+
+    async def __evict(self) -> None:
+        evicted: list[Path] = []
+        while self.size > self.max_bytes and self.__blobs:
+            digest = next(iter(self.__blobs))
+            evicted.append(self.__path(digest))
+            self.__forget(digest)
+        if evicted:
+            logger.debug("Evicting %s assets from %s", len(evicted), self.root)
+            await asyncio.to_thread(self.__unlink, evicted)
+
+    def __forget(self, digest: str) -> None:
+        self.size -= self.__blobs.pop(digest, 0)
+        for key in self.__users.pop(digest, ()):
+            if self.__keys.get(key) == digest:
+                del self.__keys[key]
+
+    def __path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def __load(self) -> tuple[dict[str, str], list[tuple[str, int]], int]:
+        try:
+            index: dict[str, Any] = marshal.loads((self.root / "index").read_bytes())
+            if index.get("version") != self.index_version:
+                raise ValueError(f"Unknown index version {index.get('version')}")
+        except FileNotFoundError:
+            index = {"keys": {}, "blobs": []}
+        except (OSError, ValueError, EOFError, TypeError) as exc:
+            logger.warning("Could not read the asset index of %s, starting over: %s", self.root, exc)
+            index = {"keys": {}, "blobs": []}
+        on_disk: dict[str, Path] = {}
+        strays: list[Path] = []
+        for path in (self.root / "objects").glob("*/*"):
+            if _DIGEST.fullmatch(path.name) and path.parent.name == path.name[:2]:
+                on_disk[path.name] = path
+            elif path.is_file():
+                # Such as what is left of a write that was cut short
+                strays.append(path)
+        self.__unlink(strays)
+        known = [(digest, size) for digest, size in index["blobs"] if on_disk.pop(digest, None) is not None]
+        unknown: list[tuple[float, str, int]] = []
+        for digest, path in on_disk.items():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            unknown.append((stat.st_mtime, digest, stat.st_size))
+        unknown.sort()
+        return index["keys"], [(digest, size) for _, digest, size in unknown] + known, len(unknown)
+
+    @staticmethod
+    def __write(path: Path, data: bytes | memoryview) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.partial")
+        with open(partial, "wb") as file:
+            file.write(data)
+        os.replace(partial, path)
+
+    @staticmethod
+    def __unlink(paths: list[Path]) -> None:
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -15,19 +15,224 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import time
+from __future__ import annotations
+
 import functools
+import inspect
+import logging
+import os
+from time import perf_counter_ns
+from typing import Callable, ClassVar, Final, TypeVar
+
+__all__: Final[tuple[str, ...]] = (
+    "ENABLED",
+    "Histogram",
+    "benchmark",
+    "histogram",
+    "histograms",
+    "summary",
+    "report",
+)
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+# Instrumentation is opt-in, when it is off `benchmark` hands back the function untouched
+ENABLED: Final[bool] = os.getenv("BENCHMARK", "").lower() in {"1", "true", "yes"}
+
+_HISTOGRAMS: dict[str, Histogram] = {}
+
+
+class Histogram:
+    """
+    A log-linear histogram of durations in nanoseconds.
+    Every power of two is split into 8 buckets, which keeps the percentiles
+    within about 6% of the real value, while recording stays a couple of integer operations.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("name", "counts", "count", "total", "min", "max")
+
+    SUB_BITS: ClassVar[int] = 3
+    BUCKETS: ClassVar[int] = 512
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.counts: list[int] = [0] * self.BUCKETS
+        self.count: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name!r} count={self.count}>"
+
+    def record(self, value: int) -> None:
+        """
+        Records a duration
+
+        Args:
+            value (int): The duration in nanoseconds
+        """
+        shift = max(value.bit_length() - self.SUB_BITS - 1, 0)
+        self.counts[min((shift << self.SUB_BITS) + (value >> shift), self.BUCKETS - 1)] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Approximates a percentile of the recorded durations
+
+        Args:
+            fraction (float): The percentile as a fraction, 0.99 for p99
+
+        Returns:
+            int: The duration in nanoseconds, 0 if nothing was recorded
+        """
+        if not self.count:
+            return 0
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= threshold:
+                middle = (self.lower_bound(index) + self.lower_bound(index + 1)) // 2
+                return min(max(middle, self.min), self.max)
+        return self.max
+
+    @classmethod
+    def lower_bound(cls, index: int) -> int:
+        """
+        The smallest duration that lands in a bucket
+
+        Args:
+            index (int): The index of the bucket
+
+        Returns:
+            int: The duration in nanoseconds
+        """
+        if index < 2 << cls.SUB_BITS:
+            return index
+        shift = (index >> cls.SUB_BITS) - 1
+        return (index - (shift << cls.SUB_BITS)) << shift
 
+    def summary(self) -> dict[str, float]:
+        """
+        Returns:
+            dict[str, float]: The call count and the mean, min, max, p50, p95 and p99 durations in seconds
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e9 if self.count else 0.0,
+            "min": self.min / 1e9,
+            "max": self.max / 1e9,
+            "p50": self.percentile(0.50) / 1e9,
+            "p95": self.percentile(0.95) / 1e9,
+            "p99": self.percentile(0.99) / 1e9,
+        }
 
-def benchmark(logger):
-    def wrapper(func):
-        @functools.wraps(func)
-        def inner(*args, **kwargs):
-            start = time.perf_counter()
-            result = func(*args, **kwargs)
-            logger.debug(f"{func.__name__} took {time.perf_counter() - start} seconds to complete")
-            return result
+
+def benchmark(log: logging.Logger) -> Callable[[F], F]:
+    """
+    Records how long every call to the decorated function takes, into a histogram
+    named after the logger and the function. Coroutine functions are awaited, and
+    generator functions (such as `__await__`) are timed until they are exhausted.
+    When instrumentation is disabled, the function is handed back as it is.
+
+    Args:
+        log (logging.Logger): The logger of the module the function lives in
+
+    Returns:
+        Callable[[F], F]: The decorator
+    """
+
+    def wrapper(func: F) -> F:
+        if not ENABLED:
+            return func
+        record = histogram(f"{log.name}.{func.__qualname__}").record
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def inner(*args, **kwargs):
+                start = perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record(perf_counter_ns() - start)
+
+        elif inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                start = perf_counter_ns()
+                try:
+                    return (yield from func(*args, **kwargs))
+                finally:
+                    record(perf_counter_ns() - start)
+
+        else:
+
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                start = perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    record(perf_counter_ns() - start)
 
         return inner
 
     return wrapper
+
+
+def histogram(name: str) -> Histogram:
+    """
+    Looks up a histogram by name, registering a new one if there is none yet
+
+    Args:
+        name (str): The name of the histogram
+
+    Returns:
+        Histogram: The histogram
+    """
+    if (found := _HISTOGRAMS.get(name)) is None:
+        found = _HISTOGRAMS[name] = Histogram(name)
+    return found
+
+
+def histograms() -> dict[str, Histogram]:
+    """
+    Returns:
+        dict[str, Histogram]: Every histogram that has been registered, by name
+    """
+    return dict(_HISTOGRAMS)
+
+
+def summary() -> dict[str, dict[str, float]]:
+    """
+    Returns:
+        dict[str, dict[str, float]]: The summary of every histogram that has recorded anything, by name
+    """
+    return {name: histogram.summary() for name, histogram in _HISTOGRAMS.items() if histogram.count}
+
+
+def report() -> None:
+    """
+    Logs the summary of every histogram, slowest p99 first.
+    """
+    if not ENABLED:
+        logger.info("Benchmarking is disabled, set BENCHMARK=1 to enable it")
+        return
+    rows = sorted(summary().items(), key=lambda item: item[1]["p99"], reverse=True)
+    lines = [f"{'name':<60} {'count':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+    for name, stats in rows:
+        lines.append(
+            f"{name:<60} {stats['count']:>10} {stats['p50'] * 1e3:>10.3f} "
+            f"{stats['p95'] * 1e3:>10.3f} {stats['p99'] * 1e3:>10.3f} {stats['max'] * 1e3:>10.3f}"
+        )
+    logger.info("Benchmark summary:\n%s", "\n".join(lines))
@@ -0,0 +1,177 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import base64
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, ClassVar, Final
+
+if TYPE_CHECKING:
+    from discord.http import HTTPClient
+
+__all__: Final[tuple[str, ...]] = ("EmojiJob", "CreateEmoji", "EditEmoji", "DeleteEmoji")
+
+
+def _image_data(image: bytes) -> str:
+    """
+    Encodes an image the way Discord takes it in JSON payloads
+
+    Args:
+        image (bytes): The image, PNG, JPEG, GIF or WEBP
+
+    Raises:
+        ValueError: When the image is none of those
+
+    Returns:
+        str: The image as a base64 data URI
+    """
+    if image.startswith(b"\x89PNG\r\n\x1a\n"):
+        mime = "image/png"
+    elif image.startswith(b"\xff\xd8\xff") or image[6:10] in (b"JFIF", b"Exif"):
+        mime = "image/jpeg"
+    elif image.startswith((b"GIF87a", b"GIF89a")):
+        mime = "image/gif"
+    elif image.startswith(b"RIFF") and image[8:12] == b"WEBP":
+        mime = "image/webp"
+    else:
+        raise ValueError("Unsupported image type given")
+    return f"data:{mime};base64,{base64.b64encode(image).decode('ascii')}"
+
+
+class EmojiJob(ABC):
+    """
+    A single emoji operation on a guild, which the scheduler runs (and retries) for it.
+    Subclasses implement `run`, a job is run at most once at a time.
+
+    Args:
+        guild_id (int): The ID of the guild the emoji belongs to
+        reason (str | None): Shows up in the audit log of the guild
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("guild_id", "reason", "attempts")
+
+    def __init__(self, guild_id: int, *, reason: str | None = None) -> None:
+        self.guild_id: int = guild_id
+        self.reason: str | None = reason
+        self.attempts: int = 0
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} guild_id={self.guild_id} attempts={self.attempts}>"
+
+    @abstractmethod
+    async def run(self, http: HTTPClient) -> Any:
+        """
+        Makes the request for the job
+
+        Args:
+            http (HTTPClient): The HTTP client of the bot
+
+        Returns:
+            Any: Whatever Discord responded with
+        """
+
+
+class CreateEmoji(EmojiJob):
+    """
+    Uploads a new emoji
+
+    Args:
+        guild_id (int): The ID of the guild to upload the emoji to
+        name (str): The name of the emoji
+        image (bytes): The image of the emoji, PNG, JPEG, GIF or WEBP
+        roles (list[int] | None): The IDs of the only roles allowed to use the emoji
+        reason (str | None): Shows up in the audit log of the guild
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("name", "image", "roles")
+
+    def __init__(
+        self,
+        guild_id: int,
+        name: str,
+        image: bytes,
+        *,
+        roles: list[int] | None = None,
+        reason: str | None = None,
+    ) -> None:
+        super().__init__(guild_id, reason=reason)
+        self.name: str = name
+        self.image: bytes = image
+        self.roles: list[int] | None = roles
+
+    async def run(self, http: HTTPClient) -> Any:
+        return await http.create_custom_emoji(
+            self.guild_id, self.name, _image_data(self.image), roles=self.roles, reason=self.reason
+        )
+
+
+class EditEmoji(EmojiJob):
+    """
+    Renames an emoji, or changes the roles allowed to use it
+
+    Args:
+        guild_id (int): The ID of the guild the emoji belongs to
+        emoji_id (int): The ID of the emoji
+        name (str | None): The new name of the emoji, None to leave it as is
+        roles (list[int] | None): The IDs of the only roles allowed to use the emoji, None to leave them as is
+        reason (str | None): Shows up in the audit log of the guild
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("emoji_id", "name", "roles")
+
+    def __init__(
+        self,
+        guild_id: int,
+        emoji_id: int,
+        *,
+        name: str | None = None,
+        roles: list[int] | None = None,
+        reason: str | None = None,
+    ) -> None:
+        super().__init__(guild_id, reason=reason)
+        self.emoji_id: int = emoji_id
+        self.name: str | None = name
+        self.roles: list[int] | None = roles
+
+    async def run(self, http: HTTPClient) -> Any:
+        payload: dict[str, Any] = {}
+        if self.name is not None:
+            payload["name"] = self.name
+        if self.roles is not None:
+            payload["roles"] = self.roles
+        return await http.edit_custom_emoji(self.guild_id, self.emoji_id, payload=payload, reason=self.reason)
+
+
+class DeleteEmoji(EmojiJob):
+    """
+    Deletes an emoji
+
+    Args:
+        guild_id (int): The ID of the guild the emoji belongs to
+        emoji_id (int): The ID of the emoji
+        reason (str | None): Shows up in the audit log of the guild
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("emoji_id",)
+
+    def __init__(self, guild_id: int, emoji_id: int, *, reason: str | None = None) -> None:
+        super().__init__(guild_id, reason=reason)
+        self.emoji_id: int = emoji_id
+
+    async def run(self, http: HTTPClient) -> Any:
+        return await http.delete_custom_emoji(self.guild_id, self.emoji_id, reason=self.reason)
@@ -0,0 +1,342 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Final, Generator, Iterable
+
+import aiohttp
+from discord import DiscordServerError, HTTPException, RateLimited
+from utils.benchmark import Histogram, histogram
+
+from .jobs import EmojiJob
+
+if TYPE_CHECKING:
+    from discord.http import HTTPClient
+
+__all__: Final[tuple[str, ...]] = ("BulkOperation", "BulkScheduler")
+
+logger = logging.getLogger(__name__)
+
+# Failures that are worth retrying, anything else Discord responds with (4xx) is final
+TRANSIENT: Final[tuple[type[BaseException], ...]] = (
+    DiscordServerError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+
+class BulkOperation:
+    """
+    Jobs that were submitted together, awaiting it waits for every one of them
+    and gives back their results in the same order, failed jobs give back the exception they failed with.
+
+    Args:
+        jobs (list[EmojiJob]): The jobs
+        on_progress (Callable[[BulkOperation], Any] | None): Called every time a job is finished
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "jobs",
+        "results",
+        "done",
+        "failed",
+        "on_progress",
+        "started_at",
+        "finished_at",
+        "__finished",
+    )
+
+    def __init__(
+        self, jobs: list[EmojiJob], *, on_progress: Callable[[BulkOperation], Any] | None = None
+    ) -> None:
+        self.jobs: list[EmojiJob] = jobs
+        self.results: list[Any] = [None] * len(jobs)
+        self.done: int = 0
+        self.failed: int = 0
+        self.on_progress: Callable[[BulkOperation], Any] | None = on_progress
+        self.started_at: float = time.perf_counter()
+        self.finished_at: float | None = None
+        self.__finished: asyncio.Event = asyncio.Event()
+        if not jobs:
+            self.__finish()
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def __repr__(self) -> str:
+        return f"<BulkOperation jobs={len(self.jobs)} done={self.done} failed={self.failed}>"
+
+    def __await__(self) -> Generator[Any, None, list[Any]]:
+        yield from self.__finished.wait().__await__()
+        return self.results
+
+    @property
+    def finished(self) -> bool:
+        """
+        Returns:
+            bool: Whether every job is done
+        """
+        return self.__finished.is_set()
+
+    @property
+    def progress(self) -> float:
+        """
+        Returns:
+            float: The share of the jobs that are done (failed or not), between 0 and 1
+        """
+        return self.done / len(self.jobs) if self.jobs else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Returns:
+            float: How long the operation has been running (or ran for), in seconds
+        """
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        Returns:
+            float: How many jobs were done every second so far
+        """
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed else 0.0
+
+    @property
+    def failures(self) -> list[tuple[EmojiJob, BaseException]]:
+        """
+        Returns:
+            list[tuple[EmojiJob, BaseException]]: The jobs that failed, along with why
+        """
+        return [
+            (job, result) for job, result in zip(self.jobs, self.results) if isinstance(result, BaseException)
+        ]
+
+    def resolve(self, index: int, result: Any) -> None:
+        """
+        Settles a job, this is up to the scheduler
+
+        Args:
+            index (int): Where the job is within `jobs`
+            result (Any): What the job resulted in, or the exception it failed with
+        """
+        self.results[index] = result
+        self.done += 1
+        if isinstance(result, BaseException):
+            self.failed += 1
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Progress callback of %r failed", self)
+        if self.done == len(self.jobs):
+            self.__finish()
+
+    def __finish(self) -> None:
+        self.finished_at = time.perf_counter()
+        self.__finished.set()
+        if self.jobs:
+            logger.info(
+                "Bulk operation of %s jobs finished in %.2fs (%.1f jobs/s), %s failed",
+                len(self.jobs),
+                self.elapsed,
+                self.throughput,
+                self.failed,
+            )
+
+
+class BulkScheduler:
+    """
+    Runs emoji jobs, queued per guild. Emoji routes are rate limited per guild,
+    so every guild works through its own queue with at most `per_guild` jobs in flight,
+    while up to `concurrency` jobs run at once across every guild. A job that runs into
+    a rate limit (when `max_ratelimit_timeout` of the client makes it raise rather than wait)
+    or a transient failure is retried once the limit resets, or after an exponential backoff
+    with jitter, without holding up the other guilds in the meantime.
+
+    Args:
+        http (HTTPClient): The HTTP client of the bot, which keeps track of the rate limit buckets
+        concurrency (int): How many jobs may be in flight across every guild
+        per_guild (int): How many jobs of a single guild may be in flight
+        max_attempts (int): How many times a job may fail before it is given up on, rate limits aside
+        base_delay (float): The backoff of the first retry, in seconds, it doubles with every retry
+        max_delay (float): The longest backoff, in seconds
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "http",
+        "per_guild",
+        "max_attempts",
+        "base_delay",
+        "max_delay",
+        "completed",
+        "failed",
+        "retries",
+        "rate_limited",
+        "latency",
+        "__semaphore",
+        "__queues",
+        "__workers",
+    )
+
+    def __init__(
+        self,
+        http: HTTPClient,
+        *,
+        concurrency: int = 8,
+        per_guild: int = 1,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        self.http: HTTPClient = http
+        self.per_guild: int = per_guild
+        self.max_attempts: int = max_attempts
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.completed: int = 0
+        self.failed: int = 0
+        self.retries: int = 0
+        self.rate_limited: int = 0
+        self.latency: Histogram = histogram(f"{__name__}.request")
+        self.__semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        self.__queues: dict[int, deque[tuple[BulkOperation, int]]] = {}
+        self.__workers: dict[int, set[asyncio.Task[None]]] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self.__queues.values()))
+
+    def __repr__(self) -> str:
+        return f"<BulkScheduler pending={len(self)} guilds={len(self.__workers)} completed={self.completed}>"
+
+    def submit(
+        self, jobs: Iterable[EmojiJob], *, on_progress: Callable[[BulkOperation], Any] | None = None
+    ) -> BulkOperation:
+        """
+        Queues jobs, they start right away as far as the limits allow
+
+        Args:
+            jobs (Iterable[EmojiJob]): The jobs, jobs of the same guild run in this order
+            on_progress (Callable[[BulkOperation], Any] | None): Called every time a job is finished
+
+        Returns:
+            BulkOperation: Awaitable for the results, and keeps track of the progress
+        """
+        operation = BulkOperation(list(jobs), on_progress=on_progress)
+        for index, job in enumerate(operation.jobs):
+            self.__queues.setdefault(job.guild_id, deque()).append((operation, index))
+        for guild_id in {job.guild_id for job in operation.jobs}:
+            workers = self.__workers.setdefault(guild_id, set())
+            while len(workers) < min(self.per_guild, len(self.__queues[guild_id])):
+                task = asyncio.create_task(self.__work(guild_id, workers))
+                workers.add(task)
+        return operation
+
+    def summary(self) -> dict[str, float]:
+        """
+        Returns:
+            dict[str, float]: The counters and the request latency percentiles (in seconds),
+                ready to be logged
+        """
+        return {
+            "pending": len(self),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            **{f"request_{name}": value for name, value in self.latency.summary().items()},
+        }
+
+    async def close(self) -> None:
+        """
+        Cancels every job, the ones that did not finish fail with `asyncio.CancelledError`
+        """
+        workers = [task for tasks in self.__workers.values() for task in tasks]
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for queue in self.__queues.values():
+            for operation, index in queue:
+                operation.resolve(index, asyncio.CancelledError())
+        self.__queues.clear()
+
+    async def __work(self, guild_id: int, workers: set[asyncio.Task[None]]) -> None:
+        queue = self.__queues[guild_id]
+        operation: BulkOperation | None = None
+        try:
+            while queue:
+                operation, index = queue.popleft()
+                operation.resolve(index, await self.__run(operation.jobs[index]))
+                operation = None
+        except BaseException as exc:
+            # Cancelled, or worse, the job must not be left for its operation to wait on forever
+            if operation is not None:
+                operation.resolve(index, exc)
+            raise
+        finally:
+            workers.discard(asyncio.current_task())  # type: ignore[arg-type]
+            if not workers:
+                del self.__workers[guild_id]
+                if not queue:
+                    del self.__queues[guild_id]
+
+    async def __run(self, job: EmojiJob) -> Any:
+        # Waiting out a rate limit is not the job failing, so those do not count
+        failures = 0
+        while True:
+            job.attempts += 1
+            async with self.__semaphore:
+                start = time.perf_counter_ns()
+                try:
+                    result = await job.run(self.http)
+                except RateLimited as exc:
+                    error: BaseException = exc
+                    delay = exc.retry_after
+                    self.rate_limited += 1
+                except TRANSIENT as exc:
+                    error = exc
+                    failures += 1
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (failures - 1)))
+                except HTTPException as exc:
+                    logger.warning("%r failed: %s", job, exc)
+                    self.failed += 1
+                    return exc
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Such as an image of a type Discord does not take, retrying would not help
+                    logger.exception("%r failed", job)
+                    self.failed += 1
+                    return exc
+                else:
+                    self.completed += 1
+                    return result
+                finally:
+                    self.latency.record(time.perf_counter_ns() - start)
+            if failures >= self.max_attempts:
+                logger.warning("%r failed after %s attempts: %s", job, job.attempts, error)
+                self.failed += 1
+                return error
+            self.retries += 1
+            logger.debug("Retrying %r in %.2fs: %s", job, delay, error)
+            await asyncio.sleep(delay)
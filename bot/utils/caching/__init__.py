@@ -16,9 +16,19 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from .base import BaseCache
+from .loader import BatchLoader
+from .matcher import PrefixMatcher
 from .prefix import PrefixCache
+from .stats import CacheStats
+from .store import LFUStore, LRUStore, TTLStore
 
-__all__: tuple[str, str] = (
+__all__: tuple[str, ...] = (
     "PrefixCache",
+    "PrefixMatcher",
     "BaseCache",
+    "BatchLoader",
+    "CacheStats",
+    "LFUStore",
+    "LRUStore",
+    "TTLStore",
 )
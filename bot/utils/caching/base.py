@@ -17,19 +17,41 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+import uuid
 from abc import ABC, abstractmethod
-from collections.abc import Mapping
+from collections.abc import Mapping, MutableMapping
+from pathlib import Path
 from pprint import pformat
-from typing import Awaitable, ClassVar, Final, Generator, Hashable, Iterable
+from typing import Any, Awaitable, Callable, ClassVar, Final, Generator, Hashable, Iterable
 
-from asyncpg import Pool, Record
+import asyncpg
+from asyncpg import Connection, Pool, Record
 from typing_extensions import Self
 
-__all__: Final[tuple[str]] = ("BaseCache",)
+from .queries import NOTIFY, WATERMARK, Query
+from .stats import CacheStats
+from .store import LRUStore
+
+__all__: Final[tuple[str, str]] = ("BaseCache", "StoreFactory")
+
+# Builds a bounded store, given its maximum size and what to call back with evicted keys
+StoreFactory = Callable[[int, Callable[[Hashable], object]], MutableMapping[Hashable, Any]]
+
 
 logger = logging.getLogger(__name__)
 
+# Tags the notifications published by this process, so that it can skip its own
+ORIGIN: Final[str] = uuid.uuid4().hex
+
 
 class BaseCache(Mapping, ABC):
     """
@@ -44,10 +66,90 @@ class BaseCache(Mapping, ABC):
     Mixins methods:
         __str__
         pull
+        pack
+        compact_row
+        footprint
+        listen
+        unlisten
+        publish
+        refresh
+        resync
+        decode_key
+        mark
+        sync
+        apply
+        tracks
+        save
+        restore
+        fingerprint
+        new_store
+        evicted
+        lookup
+        pull_key
+        pull_keys
+        fetch_keys
+    Mixins properties:
+        compact
+        query_args
+        changes_query
+        many_query
+        key_query
+        snapshot
+        snapshot_tag
+
+    In compact mode, the records for a key are not held as they are, instead every
+    record is boiled down to a tuple of its values (without the key, which is already
+    the key of the mapping), and records with a single value collapse to that value.
+    String values are interned so that repeats across keys share the same object.
+
+    Caches in different processes are kept in step over a Postgres notification channel,
+    once `listen` is called, every change `publish`ed by one process makes the others
+    `refresh` the affected key.
+
+    Caches whose table keeps a watermark (see `changes_query`) can also `sync` incrementally,
+    only the keys that have changed since the last pull or sync are pulled again.
 
+    Given a `max_size`, `new_store` builds stores that evict keys past it, the least recently
+    used ones by default, or as decided by any other `eviction` policy (see `store`).
+    Single keys (or batches of them) can be pulled again with `pull_key` and `pull_keys`,
+    when the cache has a `key_query` and a `many_query`. Lookups, evictions and
+    the latency of these pulls are kept count of in `stats`.
+
+    Compact stores can be `save`d to a snapshot on disk (see `snapshot`), which a new process
+    `restore`s from instead of pulling, syncing whatever changed since in the background.
     """
 
-    __slots__: ClassVar[tuple[()]] = ()
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "__channel",
+        "__listener",
+        "__tasks",
+        "__watermark",
+        "__synced_at",
+        "max_size",
+        "eviction",
+        "stats",
+    )
+
+    # Tombstones are pruned after a day, a cache that has not synced
+    # for this long may have missed some and has to start over
+    sync_horizon: ClassVar[float] = 12 * 60 * 60
+    # How many records `pull` fetches from the cursor at a time
+    pull_chunk_size: ClassVar[int] = 10_000
+    # Magic, format version, when the watermark was taken (unix time),
+    # the watermark itself (-1 for none) and the `fingerprint` of the cache
+    snapshot_header: ClassVar[struct.Struct] = struct.Struct("<4sHdq8s")
+    snapshot_magic: ClassVar[bytes] = b"EWSN"
+    snapshot_version: ClassVar[int] = 1
+
+    def __init__(self, *, max_size: int | None = None, eviction: StoreFactory = LRUStore) -> None:
+        self.max_size: int | None = max_size
+        self.eviction: StoreFactory = eviction
+        self.stats: CacheStats = CacheStats(f"{__name__}.{self.__class__.__name__}")
+        self.__channel: str | None = None
+        self.__listener: Connection | None = None
+        self.__tasks: set[asyncio.Task[None]] = set()
+        self.__watermark: int | None = None
+        self.__synced_at: float = 0.0
 
     def __len__(self) -> int:
         return len(self.__store__)
@@ -59,7 +161,8 @@ class BaseCache(Mapping, ABC):
         return iter(self.__store__)
 
     def __await__(self) -> Generator[Awaitable[None], None, Self]:
-        yield from self.pull().__await__()
+        if not self.restore():
+            yield from self.pull().__await__()
         return self
 
     def __str__(self) -> str:
@@ -69,23 +172,574 @@ class BaseCache(Mapping, ABC):
         """
         Pulls all the values from the database and stores them in the __store__
         mapping, the key is the value of the key property.
+        The records are streamed through a server side cursor, `pull_chunk_size`
+        records at a time, and are packed into the store as they come in.
+        Changes made while the pull ran are synced right after it.
         """
         clsname = self.__class__.__name__
         logger.info("Pulling data for %s", clsname)
-        resp: list[Record] = await self.pool.fetch(self.query)
-        logger.debug("Pulled data for %s: %s", clsname, resp)
-        journal: dict[Hashable, list[Record]] = {}
+        started = time.perf_counter()
+        journal: dict[Hashable, list[Any]] = {}
+        count = 0
 
-        for item in resp:
-            journal.setdefault(item[self.key], []).append(item)
+        # The watermark has to come from the same snapshot as the records
+        async with self.pool.acquire() as conn, conn.transaction(isolation="repeatable_read", readonly=True):
+            watermark: int | None = None if self.changes_query is None else await WATERMARK.fetchval(conn)
+            cursor = await self.query.cursor(conn, *self.query_args)
+            key, compactor = self.key, None
+
+            while chunk := await cursor.fetch(self.pull_chunk_size):
+                if self.compact and compactor is None:
+                    compactor = self.compactor_for(chunk[0])
+                for item in chunk:
+                    journal.setdefault(item[key], []).append(item if compactor is None else compactor(item))
+                count += len(chunk)
 
-        self.__store__ = {**journal}
+        if self.compact:
+            for key, rows in journal.items():
+                journal[key] = tuple(rows)
+        self.__store__ = self.__filled(journal)
+        self.__watermark, self.__synced_at = watermark, time.monotonic()
+        if watermark is not None:
+            # Whatever was written through while the pull ran was just replaced,
+            # and the snapshot the pull was read from may not have it yet
+            await self.__catch_up()
+        elapsed = time.perf_counter() - started
         logger.info(
-            "Completed pulling data for %s, held %s records in memory (%s in store)",
+            "Completed pulling data for %s, held %s records in memory (%s in store) "
+            "in %.2fs (%.0f records/s)",
             clsname,
-            len(resp),
+            count,
             len(self.__store__),
+            elapsed,
+            count / elapsed if elapsed else 0.0,
         )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Store of %s takes up %s bytes", clsname, self.footprint())
+
+    async def mark(self) -> None:
+        """
+        Sets the watermark to now without pulling anything, for caches
+        that are filled up key by key rather than with `pull`.
+        """
+        self.__watermark, self.__synced_at = await WATERMARK.fetchval(self.pool), time.monotonic()
+
+    async def sync(self) -> None:
+        """
+        Pulls the keys that have changed (including deleted ones) since the last
+        pull or sync, and applies them to the store in place.
+        Falls back to `resync` when there is nothing to sync from, which is when
+        the table has no watermark, the cache was never pulled, or it was last synced
+        longer than `sync_horizon` seconds ago.
+        """
+        clsname = self.__class__.__name__
+        if (
+            self.changes_query is None
+            or self.__watermark is None
+            or time.monotonic() - self.__synced_at > self.sync_horizon
+        ):
+            logger.info("Cannot sync %s incrementally, resyncing", clsname)
+            await self.resync()
+            return
+
+        await self.__catch_up()
+
+    async def __catch_up(self) -> None:
+        changes: Record = await self.changes_query.fetchrow(self.pool, self.__watermark)
+        keys = [key for key in changes["keys"] if self.tracks(key)]
+        if keys:
+            await self.pull_keys(keys)
+        self.__watermark, self.__synced_at = changes["watermark"], time.monotonic()
+        logger.debug("Synced %s keys for %s", len(keys), self.__class__.__name__)
+
+    def apply(self, key: Hashable, records: list[Record]) -> None:
+        """
+        Replaces the records held for a key, the key is removed
+        from the store when there are no records left for it.
+
+        Args:
+            key (Hashable): The key whose records are being replaced
+            records (list[Record]): Every record there is for the key
+        """
+        if records:
+            self.__store__[key] = self.pack(records)
+        else:
+            self.__store__.pop(key, None)
+
+    def tracks(self, key: Hashable) -> bool:
+        """
+        Whether changes to a key should be pulled by `sync`, which is always by default
+
+        Args:
+            key (Hashable): The key that has changed
+
+        Returns:
+            bool: True if the key should be pulled
+        """
+        return True
+
+    async def listen(self, channel: str) -> None:
+        """
+        Subscribes to the notification channel on a connection dedicated to it,
+        which is acquired from the pool and held until `unlisten` is called.
+
+        Args:
+            channel (str): The name of the notification channel
+        """
+        if self.__listener is not None:
+            raise RuntimeError(f"{self.__class__.__name__} is already listening on {self.__channel}")
+        self.__channel = channel
+        listener: Connection = await self.pool.acquire()
+        try:
+            listener.add_termination_listener(self.__on_terminate)
+            await listener.add_listener(channel, self.__on_notify)
+        except BaseException:
+            # Left as it was, so that listening can be tried again
+            listener.remove_termination_listener(self.__on_terminate)
+            await self.pool.release(listener)
+            raise
+        self.__listener = listener
+        logger.info("%s is listening on %s", self.__class__.__name__, channel)
+
+    async def unlisten(self) -> None:
+        """
+        Unsubscribes from the notification channel and hands the connection back to the pool.
+        """
+        listener, self.__listener = self.__listener, None
+        if listener is None:
+            return
+        listener.remove_termination_listener(self.__on_terminate)
+        if not listener.is_closed():
+            await listener.remove_listener(self.__channel, self.__on_notify)
+        await self.pool.release(listener)
+        logger.info("%s stopped listening on %s", self.__class__.__name__, self.__channel)
+
+    async def publish(self, key: Hashable, *, connection: Connection | None = None) -> None:
+        """
+        Lets the other processes know that the records for a key have changed.
+        When a connection is given, the notification is sent on it, so if the connection
+        is in a transaction, the notification is only delivered once it is committed.
+        This does nothing if the cache is not listening.
+
+        Args:
+            key (Hashable): The key whose records have changed
+            connection (Connection | None): The connection to notify on, defaults to the pool
+        """
+        if self.__channel is None:
+            return
+        await NOTIFY.execute(connection or self.pool, self.__channel, f"{ORIGIN}:{key}")
+
+    async def refresh(self, key: Hashable) -> None:
+        """
+        Called when another process has changed the records for a key.
+        By default this pulls the key again if it is `tracks`ed, or
+        everything again when the cache has no `key_query`.
+
+        Args:
+            key (Hashable): The key whose records have changed
+        """
+        if self.key_query is None:
+            await self.pull()
+        elif self.tracks(key):
+            await self.pull_key(key)
+
+    async def pull_key(self, key: Hashable) -> None:
+        """
+        Similar to `pull`, but only pulls the records of a single key with `key_query`
+
+        Args:
+            key (Hashable): The key to pull
+        """
+        started = time.perf_counter_ns()
+        resp: list[Record] = await self.key_query.fetch(self.pool, key)
+        self.apply(key, resp)
+        self.stats.loads.record(time.perf_counter_ns() - started)
+
+    async def pull_keys(self, keys: list[Hashable]) -> None:
+        """
+        Similar to `pull_key`, but pulls many keys at once with `many_query`,
+        the keys without any records left are removed from the store.
+
+        Args:
+            keys (list[Hashable]): The keys to pull
+        """
+        for key, records in (await self.fetch_keys(keys)).items():
+            self.apply(key, records)
+
+    async def fetch_keys(self, keys: list[Hashable]) -> dict[Hashable, list[Record]]:
+        """
+        Fetches the records of many keys at once with `many_query`, without storing them
+
+        Args:
+            keys (list[Hashable]): The keys to fetch
+
+        Returns:
+            dict[Hashable, list[Record]]: Every record there is for each of the keys
+        """
+        started = time.perf_counter_ns()
+        resp: list[Record] = await self.many_query.fetch(self.pool, keys)
+        journal: dict[Hashable, list[Record]] = {key: [] for key in keys}
+
+        for item in resp:
+            journal[item[self.key]].append(item)
+        self.stats.loads.record(time.perf_counter_ns() - started)
+        return journal
+
+    def new_store(self) -> MutableMapping[Hashable, Any]:
+        """
+        Builds an empty store, which evicts keys as decided by `eviction`
+        once there are more than `max_size` of them
+
+        Returns:
+            MutableMapping[Hashable, Any]: A plain dict when there is no `max_size`
+        """
+        if self.max_size is None:
+            return {}
+        return self.eviction(self.max_size, self.evicted)
+
+    def __filled(self, values: dict[Hashable, Any]) -> MutableMapping[Hashable, Any]:
+        # Pulled and restored values go through `new_store`, so that bounded caches stay bounded
+        if self.max_size is None:
+            return values
+        store = self.new_store()
+        store.update(values)
+        return store
+
+    def evicted(self, key: Hashable) -> None:
+        """
+        Called when a key is evicted from a bounded store, subclasses that keep
+        anything else around for the key should extend this.
+
+        Args:
+            key (Hashable): The key that was evicted
+        """
+        self.stats.evictions += 1
+
+    def lookup(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets the value held for a key, counting the lookup as
+        a hit or a miss and as a use of the key for the eviction policy
+
+        Args:
+            key (Hashable): The key to look up
+            default (Any): What to return when the key is missing
+
+        Returns:
+            Any: The value held for the key, or the default
+        """
+        store = self.__store__
+        try:
+            value = store[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        if self.max_size is not None:
+            store.touch(key)
+        return value
+
+    async def resync(self) -> None:
+        """
+        Called when the cache has to start over, when it cannot `sync` incrementally.
+        By default this pulls everything again.
+        """
+        await self.pull()
+
+    def decode_key(self, raw: str) -> Hashable:
+        """
+        Turns the key of a notification payload back into a key of the store
+
+        Args:
+            raw (str): The key as it was published
+
+        Returns:
+            Hashable: The key of the store
+        """
+        return raw
+
+    def __on_notify(self, _connection: Connection, _pid: int, _channel: str, payload: str) -> None:
+        origin, _, raw = payload.partition(":")
+        if origin == ORIGIN:
+            return
+        logger.debug("%s received a change for %s", self.__class__.__name__, raw)
+        self.__spawn(self.refresh(self.decode_key(raw)))
+
+    def __on_terminate(self, _connection: Connection) -> None:
+        logger.warning("%s lost its listening connection, resubscribing", self.__class__.__name__)
+        listener, self.__listener = self.__listener, None
+        self.__spawn(self.__resubscribe(listener))
+
+    async def __resubscribe(self, listener: Connection | None) -> None:
+        if listener is not None:
+            await self.pool.release(listener)
+        delay = 1
+        while True:
+            try:
+                await self.listen(self.__channel)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Could not resubscribe to %s, retrying in %ss: %s", self.__channel, delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            else:
+                break
+        # Notifications may have been missed while the connection was down
+        await self.sync()
+
+    def __spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.create_task(coro)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def save(self) -> None:
+        """
+        Writes the store to `snapshot` along with the watermark, does nothing
+        when there is no snapshot or the store was never filled up.
+        The snapshot is written next to the file and moved over it, so that a crash
+        midway does not leave a torn snapshot behind.
+
+        Raises:
+            TypeError: When the store is not compact, records cannot be written out as they are
+        """
+        if self.snapshot is None or not self.__synced_at:
+            # Nothing has been pulled yet, there is nothing worth saving
+            return
+        if not self.compact:
+            raise TypeError("Only compact stores can be snapshotted")
+        header = self.snapshot_header.pack(
+            self.snapshot_magic,
+            self.snapshot_version,
+            time.time() - (time.monotonic() - self.__synced_at),
+            -1 if self.__watermark is None else self.__watermark,
+            self.fingerprint(),
+        )
+        store = dict(self.__store__)
+        started = time.perf_counter()
+        await asyncio.to_thread(self.__write_snapshot, Path(self.snapshot), header, store)
+        logger.info(
+            "Saved %s keys of %s to %s in %.2fs",
+            len(store),
+            self.__class__.__name__,
+            self.snapshot,
+            time.perf_counter() - started,
+        )
+
+    @staticmethod
+    def __write_snapshot(path: Path, header: bytes, store: dict[Hashable, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.partial")
+        with open(partial, "wb") as file:
+            file.write(header)
+            marshal.dump(store, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial, path)
+
+    def restore(self) -> bool:
+        """
+        Fills the store up from `snapshot` so that it can be served from right away,
+        then syncs whatever has changed since the snapshot was taken in the background.
+        Snapshots that were taken by a differently set up cache (see `fingerprint`),
+        or longer than `sync_horizon` seconds ago, are not restored from.
+
+        The snapshot is memory mapped only to be read, lookups are served from the
+        unmarshalled store like after a pull, not from the mapping. What the mapping saves is
+        reading the whole file into a bytes object first: the header is checked without reading
+        the rest, and the store is unmarshalled straight out of the page cache.
+
+        Returns:
+            bool: Whether the store was restored, it is left as it is otherwise
+        """
+        if self.snapshot is None or not self.compact:
+            return False
+        clsname = self.__class__.__name__
+        started = time.perf_counter()
+        try:
+            with open(self.snapshot, "rb") as file, mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                magic, version, taken_at, watermark, fingerprint = self.snapshot_header.unpack_from(mapped)
+                age = time.time() - taken_at
+                if (magic, version, fingerprint) != (
+                    self.snapshot_magic,
+                    self.snapshot_version,
+                    self.fingerprint(),
+                ):
+                    logger.info("Snapshot of %s does not match the cache, not restoring it", clsname)
+                    return False
+                if age > self.sync_horizon:
+                    logger.info("Snapshot of %s is %.0fs old, not restoring it", clsname, age)
+                    return False
+                with memoryview(mapped)[self.snapshot_header.size :] as view:
+                    store = marshal.loads(view)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, EOFError, TypeError, struct.error) as exc:
+            logger.warning("Could not restore %s from %s: %s", clsname, self.snapshot, exc)
+            return False
+
+        self.__store__ = self.__filled(store)
+        self.__watermark = None if watermark < 0 else watermark
+        self.__synced_at = time.monotonic() - age
+        logger.info(
+            "Restored %s keys of %s from a %.0fs old snapshot in %.2fs",
+            len(store),
+            clsname,
+            age,
+            time.perf_counter() - started,
+        )
+        self.__spawn(self.sync())
+        return True
+
+    def fingerprint(self) -> bytes:
+        """
+        Returns:
+            bytes: A digest of `snapshot_tag`, which tells apart snapshots of differently set up caches
+        """
+        return hashlib.blake2b(repr(self.snapshot_tag).encode(), digest_size=8).digest()
+
+    def pack(self, records: Iterable[Record]) -> list[Record] | tuple[Any, ...]:
+        """
+        Packs the records of a single key into the value that will be held in the store
+
+        Args:
+            records (Iterable[Record]): The records sharing the same key
+
+        Returns:
+            list[Record] | tuple[Any, ...]: The records as they are,
+            or a tuple of compacted rows in compact mode
+        """
+        if not self.compact:
+            return list(records)
+        return tuple(map(self.compact_row, records))
+
+    def compact_row(self, record: Record) -> Any:
+        """
+        Boils down a record to its values without the key column,
+        interning the strings along the way
+
+        Args:
+            record (Record): The record to compact
+
+        Returns:
+            Any: The only value of the record, or a tuple of the values if there are many
+        """
+        return self.compactor_for(record)(record)
+
+    def compactor_for(self, record: Record) -> Callable[[Record], Any]:
+        """
+        Builds a function that compacts records laid out like the given one,
+        this is what `compact_row` uses, but it is cheaper when compacting many records at once
+
+        Args:
+            record (Record): A record to take the layout from
+
+        Returns:
+            Callable[[Record], Any]: A function that behaves like `compact_row`
+        """
+        intern = sys.intern
+        indices = tuple(index for index, column in enumerate(record.keys()) if column != self.key)
+
+        if len(indices) == 1:
+            (index,) = indices
+
+            def compactor(rec: Record) -> Any:
+                value = rec[index]
+                return intern(value) if type(value) is str else value
+
+        else:
+
+            def compactor(rec: Record) -> Any:
+                return tuple(
+                    intern(value) if type(value) is str else value for value in map(rec.__getitem__, indices)
+                )
+
+        return compactor
+
+    def footprint(self) -> int:
+        """
+        Approximates the memory held by the store, objects that are shared
+        (such as interned strings) are only accounted for once
+
+        Returns:
+            int: The size of the store in bytes
+        """
+        seen: set[int] = set()
+
+        def sizeof(obj: Any) -> int:
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            size = sys.getsizeof(obj)
+            if isinstance(obj, (list, tuple)):
+                size += sum(map(sizeof, obj))
+            elif isinstance(obj, Record):
+                size += sum(map(sizeof, obj.values()))
+            return size
+
+        store = self.__store__
+        return sys.getsizeof(store) + sum(sizeof(key) + sizeof(value) for key, value in store.items())
+
+    @property
+    def compact(self) -> bool:
+        """
+        Returns:
+            bool: Whether the store is held in compact mode, defaults to False
+        """
+        return False
+
+    @property
+    def changes_query(self) -> Query | None:
+        """
+        Returns:
+            Query | None: A query taking a watermark, that returns a single row holding
+            the keys changed since then as `keys`, and the new watermark as `watermark`.
+            Defaults to None, for tables that do not keep a watermark
+        """
+        return None
+
+    @property
+    def query_args(self) -> tuple[Any, ...]:
+        """
+        Returns:
+            tuple[Any, ...]: The arguments `query` is pulled with, defaults to none
+        """
+        return ()
+
+    @property
+    def many_query(self) -> Query | None:
+        """
+        Returns:
+            Query | None: A query taking an array of keys, that returns all of their records.
+            Needed along with `changes_query`
+        """
+        return None
+
+    @property
+    def key_query(self) -> Query | None:
+        """
+        Returns:
+            Query | None: A query taking a single key, that returns all of its records.
+            Needed by `pull_key`
+        """
+        return None
+
+    @property
+    def snapshot(self) -> str | os.PathLike[str] | None:
+        """
+        Returns:
+            str | os.PathLike[str] | None: Where the store is saved to and restored from,
+            defaults to None, for caches that are not snapshotted
+        """
+        return None
+
+    @property
+    def snapshot_tag(self) -> tuple[Any, ...]:
+        """
+        Returns:
+            tuple[Any, ...]: Whatever decides what the store holds, a snapshot is only
+            restored by a cache with the same tag
+        """
+        return (self.__class__.__name__, self.key, self.query.sql, self.query_args, self.compact)
 
     @property
     @abstractmethod
@@ -113,10 +767,10 @@ class BaseCache(Mapping, ABC):
 
     @property
     @abstractmethod
-    def query(self) -> str:
+    def query(self) -> Query:
         """
         Returns:
-            str: A query string to pull all the records from the database
+            Query: A query to pull all the records from the database
         """
 
     @property
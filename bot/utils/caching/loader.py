@@ -0,0 +1,137 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, ClassVar, Final, Generic, Hashable, Mapping, TypeVar
+
+__all__: Final[tuple[str]] = ("BatchLoader",)
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Coalesces concurrent loads in the style of a dataloader.
+    Loads for a key that is already in flight share the same result,
+    and loads for different keys that come in within `delay` seconds
+    of each other are handed to `load_many` as a single batch.
+
+    Args:
+        load_many (Callable[[list[K]], Awaitable[Mapping[K, V]]]):
+            Loads a batch of keys, keys missing in the returned mapping resolve to `default`
+        delay (float): How long to wait for more keys before a batch is dispatched
+        max_batch (int): Dispatch a batch right away once it has this many keys
+        default (V | None): What keys missing in the result of `load_many` resolve to
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "load_many",
+        "delay",
+        "max_batch",
+        "default",
+        "__pending",
+        "__inflight",
+        "__handle",
+        "__tasks",
+    )
+
+    def __init__(
+        self,
+        load_many: Callable[[list[K]], Awaitable[Mapping[K, V]]],
+        *,
+        delay: float = 0.002,
+        max_batch: int = 500,
+        default: V | None = None,
+    ) -> None:
+        self.load_many: Callable[[list[K]], Awaitable[Mapping[K, V]]] = load_many
+        self.delay: float = delay
+        self.max_batch: int = max_batch
+        self.default: V | None = default
+        self.__pending: list[K] = []
+        self.__inflight: dict[K, asyncio.Future[V | None]] = {}
+        self.__handle: asyncio.TimerHandle | None = None
+        self.__tasks: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return len(self.__inflight)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__inflight
+
+    async def load(self, key: K) -> V | None:
+        """
+        Loads a key, joining the load that is already in flight for it if there is one.
+
+        Args:
+            key (K): The key to load
+
+        Returns:
+            V | None: The value loaded for the key
+        """
+        future = self.__inflight.get(key)
+        if future is None:
+            future = self.__schedule(key)
+        # Shielded so that one waiter being cancelled does not cancel the load for everyone else
+        return await asyncio.shield(future)
+
+    def __schedule(self, key: K) -> asyncio.Future[V | None]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[V | None] = loop.create_future()
+        self.__inflight[key] = future
+        self.__pending.append(key)
+        if len(self.__pending) >= self.max_batch:
+            self.__dispatch()
+        elif self.__handle is None:
+            self.__handle = loop.call_later(self.delay, self.__dispatch)
+        return future
+
+    def __dispatch(self) -> None:
+        if self.__handle is not None:
+            self.__handle.cancel()
+            self.__handle = None
+        keys, self.__pending = self.__pending, []
+        task = asyncio.create_task(self.__run(keys))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def __run(self, keys: list[K]) -> None:
+        logger.debug("Loading a batch of %s keys", len(keys))
+        try:
+            result = await self.load_many(keys)
+        except Exception as exc:  # pylint: disable=broad-except
+            for future in self.__settle(keys).values():
+                future.set_exception(exc)
+            return
+        except BaseException:
+            # The batch was cancelled (or torn down), its waiters are cancelled along with it
+            # and the keys are forgotten, so that they are loaded again the next time around
+            for future in self.__settle(keys).values():
+                future.cancel()
+            raise
+        for key, future in self.__settle(keys).items():
+            future.set_result(result.get(key, self.default))
+
+    def __settle(self, keys: list[K]) -> dict[K, asyncio.Future[V | None]]:
+        # Takes the keys out of flight, handing back the futures that are yet to be resolved
+        futures = {key: self.__inflight.pop(key) for key in keys}
+        return {key: future for key, future in futures.items() if not future.done()}
@@ -0,0 +1,66 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+from typing import ClassVar, Final, Iterable
+
+__all__: Final[tuple[str]] = ("PrefixMatcher",)
+
+
+class PrefixMatcher:
+    """
+    An immutable, precompiled set of prefixes for a single guild.
+    Prefixes are held longest first, so the first prefix that matches
+    is also the longest one, the leading characters of every prefix are
+    kept in a set so that most non-command messages are rejected with
+    a single lookup.
+    """
+
+    __slots__: ClassVar[tuple[str, str]] = ("prefixes", "heads")
+
+    def __init__(self, prefixes: Iterable[str]) -> None:
+        self.prefixes: Final[tuple[str, ...]] = tuple(
+            sorted({pfx for pfx in prefixes if pfx}, key=lambda pfx: (-len(pfx), pfx))
+        )
+        self.heads: Final[frozenset[str]] = frozenset(pfx[0] for pfx in self.prefixes)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} prefixes={self.prefixes!r}>"
+
+    def __contains__(self, prefix: object) -> bool:
+        return prefix in self.prefixes
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def match(self, content: str) -> str | None:
+        """
+        Finds the prefix that the given content starts with.
+
+        Args:
+            content (str): The content of the message
+
+        Returns:
+            str | None: The longest matching prefix, or None if nothing matched
+        """
+        if not content or content[0] not in self.heads or not content.startswith(self.prefixes):
+            return None
+        for prefix in self.prefixes:
+            if content.startswith(prefix):
+                return prefix
+        return None
@@ -18,15 +18,27 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from __future__ import annotations
 
 import logging
-from itertools import repeat
-from typing import Awaitable, ClassVar, Final, Generator, Hashable, Iterable
+import os
+from typing import Any, Awaitable, ClassVar, Final, Generator, Hashable, Iterable
 
 from asyncpg import Pool, Record
-from typeshack import PassIntoBase, Self
-
+from typeshack import Self
 from utils.benchmark import benchmark
-from .base import BaseCache
-from .queries import CREATE_PREFIX_TABLE, INSERT, REMOVE, REMOVE_ALL, SELECT
+
+from .base import BaseCache, StoreFactory
+from .loader import BatchLoader
+from .matcher import PrefixMatcher
+from .queries import (
+    CHANGES,
+    INSERT,
+    REMOVE,
+    REMOVE_ALL,
+    SELECT,
+    SELECT_MANY,
+    SELECT_SHARDS,
+    Query,
+)
+from .store import LRUStore
 
 __all__: Final[tuple[str]] = ("PrefixCache",)
 
@@ -36,6 +48,24 @@ logger = logging.getLogger(__name__)
 class PrefixCache(BaseCache):
     """
     Caches the prefixes for every guild available in the database.
+    Every guild's prefixes are compiled into a `PrefixMatcher` the first time
+    they are needed, and the matcher is only rebuilt when that guild's prefixes change.
+
+    In lazy mode nothing is pulled up front, instead a guild is pulled the first time
+    one of its messages comes through. Guilds without any prefixes are remembered as such,
+    so they are not pulled again. If `max_size` is set, the least recently used guilds
+    (or whichever the `eviction` policy picks) are evicted once the cache grows past it.
+    Guilds that were evicted (or did not fit in a full pull) are pulled again when needed,
+    lazy or not. Concurrent misses are coalesced by a `BatchLoader`, so a burst of messages
+    (or guilds) only costs a single query.
+
+    Once `partition`ed, only the guilds of the shards this process owns are pulled,
+    the shards are filtered in the query itself.
+
+    Given a `snapshot` path (and compact mode), the cache is restored from it on startup
+    rather than pulled or marked, and is only pulled when the snapshot cannot be used.
+    Until the cache is `warm`, guilds are pulled one by one as their messages come through,
+    just like in lazy mode, so that the cache can be used while it is warming up.
     """
 
     __slots__: ClassVar[tuple[str, ...]] = (
@@ -43,8 +73,19 @@ class PrefixCache(BaseCache):
         "__fetch_query",
         "__key",
         "default",
-        "pass_into",
+        "mentionable",
+        "__compact",
+        "lazy",
         "__store",
+        "__matchers",
+        "__mentions",
+        "__default_matcher",
+        "__loader",
+        "__writes",
+        "shard_count",
+        "shard_ids",
+        "__snapshot",
+        "warm",
     )
 
     @benchmark(logger)
@@ -52,33 +93,116 @@ class PrefixCache(BaseCache):
         self,
         *,
         pool: Pool,
-        fetch_query: str,
+        fetch_query: Query,
         key: str,
         default: Iterable[str],
-        pass_into: PassIntoBase = lambda *pfx: lambda bot, message: pfx,
+        mentionable: bool = True,
+        compact: bool = False,
+        lazy: bool = False,
+        max_size: int | None = None,
+        eviction: StoreFactory = LRUStore,
+        snapshot: str | os.PathLike[str] | None = None,
     ) -> None:
+        super().__init__(max_size=max_size, eviction=eviction)
         self.__pool: Pool = pool
-        self.__fetch_query: str = fetch_query
+        self.__fetch_query: Query = fetch_query
         self.__key: str = key
-        self.default: Iterable[str] = default
-        self.pass_into: PassIntoBase = pass_into
-        self.__store: dict[Hashable, Record] = {}
+        self.default: tuple[str, ...] = tuple(default)
+        self.mentionable: bool = mentionable
+        self.__compact: bool = compact
+        self.lazy: bool = lazy
+        self.__matchers: dict[Hashable, PrefixMatcher] = {}
+        self.__store: dict[Hashable, Record] = self.new_store()
+        self.__mentions: tuple[str, ...] = ()
+        self.__default_matcher: PrefixMatcher = PrefixMatcher(self.default)
+        self.__loader: BatchLoader[int, None] = BatchLoader(self.__pull_many)
+        # How many times each guild that is being loaded has been written to since
+        self.__writes: dict[Hashable, int] = {}
+        self.shard_count: int | None = None
+        self.shard_ids: frozenset[int] = frozenset()
+        self.__snapshot: str | os.PathLike[str] | None = snapshot
+        self.warm: bool = False
 
     @benchmark(logger)
     def __await__(self) -> Generator[Awaitable[None], None, Self]:
-        yield from self.ensure_table_exists().__await__()
-        yield from self.pull().__await__()
+        if not self.restore():
+            yield from (self.mark() if self.lazy else self.pull()).__await__()
+        self.warm = True
         return self
 
     @benchmark(logger)
-    async def __call__(self, bot, message) -> Iterable[str]:
+    async def __call__(self, bot, message) -> str | tuple[str, ...]:
+        if self.mentionable and not self.__mentions and bot.user is not None:
+            self.learn_mentions(bot.user.id)
+        guild_id = message.guild.id if message.guild is not None else None
+        if self.__unseen(guild_id):
+            self.stats.misses += 1
+            await self.load_for(guild_id)
+        else:
+            self.stats.hits += 1
+        matcher = self.matcher_for(guild_id)
+        # Handing back the matched prefix spares discord.py from trying every prefix again,
+        # when nothing matched the whole tuple is handed back so that it bails out on its own
+        return matcher.match(message.content) or matcher.prefixes
+
+    def could_be_command(self, bot, message) -> bool:
+        """
+        A cheap, synchronous check of whether a message starts with one of its guild's
+        prefixes (or a mention of the bot), meant for dropping messages before any
+        context is built for them. Guilds that are yet to be pulled in lazy mode
+        (or before the cache is warm) are given the benefit of the doubt.
+
+        Args:
+            bot: The bot the message was sent to
+            message: The message to check
+
+        Returns:
+            bool: False if the message certainly is not a command
+        """
+        if self.mentionable and not self.__mentions and bot.user is not None:
+            self.learn_mentions(bot.user.id)
+        guild_id = message.guild.id if message.guild is not None else None
+        if self.__unseen(guild_id):
+            return True
+        return self.matcher_for(guild_id).match(message.content) is not None
+
+    def learn_mentions(self, user_id: int) -> None:
+        """
+        Sets the mention forms of the bot user, these are
+        compiled into every matcher alongside the prefixes.
+        All the matchers compiled so far are discarded.
+
+        Args:
+            user_id (int): The ID of the bot user
+        """
+        self.__mentions = (f"<@{user_id}> ", f"<@!{user_id}> ")
+        self.__default_matcher = PrefixMatcher((*self.__mentions, *self.default))
+        self.__matchers.clear()
+
+    def matcher_for(self, guild_id: int | None) -> PrefixMatcher:
+        """
+        Gets the compiled prefix matcher for a given guild,
+        compiling it if this is the first time it has been asked for.
+        Guilds without any prefixes of their own share the default matcher.
+
+        Args:
+            guild_id (int | None): The guild ID, or None for direct messages
+
+        Returns:
+            PrefixMatcher: The matcher for the guild
+        """
+        if self.max_size is not None:
+            self.__store.touch(guild_id)
         try:
-            prefixes = await self.get_prefix_for(message.guild.id)
-            logger.debug("Found prefix for %s: %s, with default %s", message.guild.id, prefixes, self.default)
-            return self.pass_into(*self.default, *prefixes)(bot, message)
+            return self.__matchers[guild_id]
         except KeyError:
-            logger.debug("No prefix found for %s, using default", message.guild.id)
-            return self.pass_into(*self.default)(bot, message)
+            pass
+        value = self.__store.get(guild_id)
+        if not value:
+            return self.__default_matcher
+        matcher = PrefixMatcher((*self.__mentions, *self.default, *self.unpack(value)))
+        self.__matchers[guild_id] = matcher
+        return matcher
 
     @benchmark(logger)
     async def pull_for(self, guild_id: int) -> None:
@@ -91,18 +215,52 @@ class PrefixCache(BaseCache):
             guild_id (int): The guild ID to pull for.
         """
         logger.debug("Pulling prefixes for %s", guild_id)
-        resp: list[Record] = await self.pool.fetch(SELECT, guild_id)
-        self.__store[guild_id] = resp
+        await self.pull_key(guild_id)
 
-    @benchmark(logger)
-    async def ensure_table_exists(self) -> None:
+    async def load_for(self, guild_id: int) -> None:
+        """
+        Similar to `pull_for`, but joins the pull that is already in flight for the guild
+        if there is one, and batches together the pulls for other guilds that come in
+        around the same time. This is meant for cache misses, changes made to the
+        guild's prefixes should be followed by `pull_for` instead.
+
+        Args:
+            guild_id (int): The guild ID to pull for.
+        """
+        await self.__loader.load(guild_id)
+
+    async def __pull_many(self, guild_ids: list[int]) -> dict[int, None]:
+        logger.debug("Pulling prefixes for %s guilds", len(guild_ids))
+        seen = {guild_id: self.__writes.get(guild_id, 0) for guild_id in guild_ids}
+        try:
+            journal = await self.fetch_keys(guild_ids)
+            # Guilds written to while the batch was running already hold fresher prefixes
+            for guild_id, records in journal.items():
+                if self.__writes.get(guild_id, 0) == seen[guild_id]:
+                    self.apply(guild_id, records)
+        finally:
+            for guild_id in guild_ids:
+                self.__writes.pop(guild_id, None)
+        return {}
+
+    async def write_through(self, query: Query, guild_id: int, *args) -> None:
         """
-        Execute the table create query on the pool
-        This should create the table if it doesn't exist already
-        This function is yielded when a instance of this class is awaited
+        Executes a change to a guild's prefixes and updates the cache with its outcome.
+        The query is expected to return every prefix the guild is left with, so the
+        guild is not pulled again. The change and its notification are sent in a single
+        transaction, so other processes only hear of it once it is committed.
+
+        Args:
+            query (Query): The query that makes the change
+            guild_id (int): The guild ID whose prefixes are being changed
+            *args: Any further arguments to the query
         """
-        logger.debug("Ensuring prefix table exists")
-        await self.pool.execute(CREATE_PREFIX_TABLE)
+        async with self.pool.acquire() as conn, conn.transaction():
+            resp: list[Record] = await query.fetch(conn, guild_id, *args)
+            await self.publish(guild_id, connection=conn)
+        if guild_id in self.__loader:
+            self.__writes[guild_id] = self.__writes.get(guild_id, 0) + 1
+        self.apply(guild_id, resp)
 
     @benchmark(logger)
     async def append(self, guild_id: int, prefix: str) -> None:
@@ -113,8 +271,7 @@ class PrefixCache(BaseCache):
             guild_id (int): The guild ID to add the prefix to
             prefix (str): The prefix to add
         """
-        await self.pool.execute(INSERT, guild_id, prefix)
-        await self.pull_for(guild_id)
+        await self.write_through(INSERT, guild_id, [prefix])
         logger.debug("Added prefix %s to %s", prefix, guild_id)
 
     @benchmark(logger)
@@ -126,8 +283,8 @@ class PrefixCache(BaseCache):
             guild_id (int): The guild ID to add the prefixes to
             prefixes (Iterable[str]): An iterable of prefixes to add
         """
-        await self.pool.executemany(INSERT, (repeat(guild_id), prefixes))
-        await self.pull_for(guild_id)
+        prefixes = list(prefixes)
+        await self.write_through(INSERT, guild_id, prefixes)
         logger.debug("Extended prefixes %s to %s", prefixes, guild_id)
 
     @benchmark(logger)
@@ -139,8 +296,7 @@ class PrefixCache(BaseCache):
             guild_id (int): The guild ID to remove the prefix from
             prefix (str): The prefix itself to be removed
         """
-        await self.pool.execute(REMOVE, guild_id, prefix)
-        await self.pull_for(guild_id)
+        await self.write_through(REMOVE, guild_id, prefix)
         logger.debug("Removed prefix %s from %s", prefix, guild_id)
 
     @benchmark(logger)
@@ -151,10 +307,113 @@ class PrefixCache(BaseCache):
         Args:
             guild_id (int): The guild ID to clear the record from
         """
-        await self.pool.execute(REMOVE_ALL, guild_id)
-        await self.pull_for(guild_id)
+        await self.write_through(REMOVE_ALL, guild_id)
         logger.debug("Cleared prefixes for %s", guild_id)
 
+    async def resync(self) -> None:
+        """
+        Pulls every prefix again, in lazy mode the cache is emptied instead.
+        """
+        if self.lazy:
+            self.__store__ = self.new_store()
+            await self.mark()
+        else:
+            await self.pull()
+
+    def apply(self, key: Hashable, records: list[Record]) -> None:
+        """
+        Replaces the prefixes held for a guild and drops its compiled matcher.
+        In lazy mode, with a `max_size` (or before the cache is warm), guilds
+        without any prefixes are kept so that they are not pulled again.
+
+        Args:
+            key (Hashable): The guild ID
+            records (list[Record]): Every prefix record there is for the guild
+        """
+        if records or self.on_demand or not self.warm:
+            self.__store[key] = self.pack(records)
+        else:
+            self.__store.pop(key, None)
+        self.__matchers.pop(key, None)
+
+    def tracks(self, key: Hashable) -> bool:
+        return self.owns(key) and (not self.on_demand or key in self.__store)
+
+    def partition(self, shard_count: int, shard_ids: Iterable[int] | None = None) -> None:
+        """
+        Narrows the cache down to the guilds of the given shards,
+        this should be called before the cache is awaited.
+
+        Args:
+            shard_count (int): The total number of shards
+            shard_ids (Iterable[int] | None): The shards this process owns, defaults to all of them
+        """
+        self.shard_count = shard_count
+        self.shard_ids = frozenset(range(shard_count) if shard_ids is None else shard_ids)
+        logger.info("Partitioned prefixes to shards %s of %s", sorted(self.shard_ids), shard_count)
+
+    def shard_of(self, guild_id: int) -> int:
+        """
+        Args:
+            guild_id (int): The guild ID
+
+        Returns:
+            int: The shard the guild is on, 0 if the cache is not partitioned
+        """
+        return 0 if self.shard_count is None else (guild_id >> 22) % self.shard_count
+
+    def owns(self, guild_id: int) -> bool:
+        """
+        Args:
+            guild_id (int): The guild ID
+
+        Returns:
+            bool: Whether the guild is on one of the shards of this process
+        """
+        return self.shard_count is None or self.shard_of(guild_id) in self.shard_ids
+
+    async def pull_shard(self, shard_id: int) -> None:
+        """
+        Takes a shard (back) on, pulling the prefixes of its guilds.
+        In lazy mode, the guilds are left to be pulled on their first message.
+
+        Args:
+            shard_id (int): The shard ID
+        """
+        if self.shard_count is None:
+            raise RuntimeError("The cache has not been partitioned")
+        self.shard_ids |= {shard_id}
+        if self.lazy:
+            return
+        resp: list[Record] = await SELECT_SHARDS.fetch(self.pool, self.shard_count, [shard_id])
+        journal: dict[int, list[Record]] = {}
+
+        for item in resp:
+            journal.setdefault(item[self.key], []).append(item)
+
+        for guild_id, records in journal.items():
+            self.apply(guild_id, records)
+        logger.info("Pulled prefixes of %s guilds for shard %s", len(journal), shard_id)
+
+    def drop_shard(self, shard_id: int) -> None:
+        """
+        Lets go of a shard, along with every guild of it that is held.
+
+        Args:
+            shard_id (int): The shard ID
+        """
+        if self.shard_count is None:
+            raise RuntimeError("The cache has not been partitioned")
+        self.shard_ids -= {shard_id}
+        dropped = [guild_id for guild_id in self.__store if self.shard_of(guild_id) == shard_id]
+        for guild_id in dropped:
+            del self.__store[guild_id]
+            self.__matchers.pop(guild_id, None)
+        logger.info("Dropped prefixes of %s guilds for shard %s", len(dropped), shard_id)
+
+    def decode_key(self, raw: str) -> int:
+        return int(raw)
+
     @benchmark(logger)
     async def get_prefix_for(self, guild_id: int) -> Iterable[str]:
         """
@@ -169,10 +428,42 @@ class PrefixCache(BaseCache):
         """
         rec = self.__store__[guild_id]
         logger.debug("Found prefixes for %s: %s", guild_id, rec)
-        ret = [pfx["guild_prefix"] for pfx in rec]
+        ret = self.unpack(rec)
         logger.debug("Returning prefixes for %s: %s", guild_id, ret)
         return ret
 
+    def unpack(self, value: list[Record] | tuple[str, ...]) -> Iterable[str]:
+        """
+        Gets the prefixes out of a value held in the store.
+
+        Args:
+            value (list[Record] | tuple[str, ...]): The value held for a guild
+
+        Returns:
+            Iterable[str]: The prefixes themselves
+        """
+        if self.__compact:
+            return value
+        return [pfx["guild_prefix"] for pfx in value]
+
+    def __unseen(self, guild_id: int | None) -> bool:
+        # Whether a guild has to be pulled on its own, rather than assumed to have no prefixes
+        return (self.on_demand or not self.warm) and guild_id is not None and guild_id not in self.__store
+
+    def evicted(self, key: Hashable) -> None:
+        super().evicted(key)
+        self.__matchers.pop(key, None)
+
+    @property
+    def on_demand(self) -> bool:
+        """
+        Returns:
+            bool: Whether guilds missing from the cache are pulled when they are needed, rather than
+                assumed to have no prefixes. That is in lazy mode, and whenever `max_size` is set,
+                since guilds that are evicted (or did not fit in a full pull) are missing too
+        """
+        return self.lazy or self.max_size is not None
+
     @property
     def pool(self) -> Pool:
         return self.__pool
@@ -183,11 +474,43 @@ class PrefixCache(BaseCache):
 
     @__store__.setter
     def __store__(self, value: dict[Hashable, Record]) -> None:
+        self.__matchers.clear()
         self.__store: dict[Hashable, Record] = value
 
     @property
-    def query(self) -> str:
-        return self.__fetch_query
+    def compact(self) -> bool:
+        return self.__compact
+
+    @property
+    def changes_query(self) -> Query:
+        return CHANGES
+
+    @property
+    def many_query(self) -> Query:
+        return SELECT_MANY
+
+    @property
+    def key_query(self) -> Query:
+        return SELECT
+
+    @property
+    def query(self) -> Query:
+        return self.__fetch_query if self.shard_count is None else SELECT_SHARDS
+
+    @property
+    def query_args(self) -> tuple[int, list[int]] | tuple[()]:
+        if self.shard_count is None:
+            return ()
+        return self.shard_count, sorted(self.shard_ids)
+
+    @property
+    def snapshot(self) -> str | os.PathLike[str] | None:
+        return self.__snapshot
+
+    @property
+    def snapshot_tag(self) -> tuple[Any, ...]:
+        # A lazy store only holds the guilds that were seen, which a full one cannot start from
+        return super().snapshot_tag + (self.lazy,)
 
     @property
     def key(self) -> str:
@@ -18,15 +18,26 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Final
+from time import perf_counter_ns
+from typing import Any, ClassVar, Final
+
+from asyncpg import Connection, Pool, Record
+from asyncpg.cursor import CursorFactory
+from utils.benchmark import ENABLED, Histogram, histogram
 
 __all__: Final[tuple[str, ...]] = (
     "load_query",
-    "CREATE_PREFIX_TABLE",
+    "Query",
+    "QUERIES",
+    "CHANGES",
     "INSERT",
+    "NOTIFY",
     "REMOVE",
     "REMOVE_ALL",
     "SELECT",
+    "SELECT_MANY",
+    "SELECT_SHARDS",
+    "WATERMARK",
 )
 
 
@@ -47,10 +58,79 @@ def load_query(file_path: str | Path) -> str:
         return sql_query_file.read()
 
 
+class Query:
+    """
+    A query loaded from a `.sql` file, which runs itself on a pool or a connection
+    and, when benchmarking is enabled, records how long every run takes into a histogram named after the file.
+
+    Args:
+        name (str): The name of the file, without the extension
+        sql (str): The query itself
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("name", "sql", "timings")
+
+    def __init__(self, name: str, sql: str) -> None:
+        self.name: str = name
+        self.sql: str = sql
+        self.timings: Histogram = histogram(f"{__name__}.{name}")
+
+    def __repr__(self) -> str:
+        return f"<Query name={self.name!r}>"
+
+    async def fetch(
+        self, executor: Pool | Connection, *args: Any, timeout: float | None = None
+    ) -> list[Record]:
+        return await self.__run("fetch", executor, args, timeout)
+
+    async def fetchrow(
+        self, executor: Pool | Connection, *args: Any, timeout: float | None = None
+    ) -> Record | None:
+        return await self.__run("fetchrow", executor, args, timeout)
+
+    async def fetchval(self, executor: Pool | Connection, *args: Any, timeout: float | None = None) -> Any:
+        return await self.__run("fetchval", executor, args, timeout)
+
+    async def execute(self, executor: Pool | Connection, *args: Any, timeout: float | None = None) -> str:
+        return await self.__run("execute", executor, args, timeout)
+
+    def cursor(self, connection: Connection, *args: Any) -> CursorFactory:
+        """
+        Cursors are not timed, since how long they take depends on how they are read
+
+        Args:
+            connection (Connection): The connection to open the cursor on, within a transaction
+            *args: The arguments to the query
+
+        Returns:
+            CursorFactory: The cursor, to be awaited or iterated over
+        """
+        return connection.cursor(self.sql, *args)
+
+    async def __run(
+        self, method: str, executor: Pool | Connection, args: tuple[Any, ...], timeout: float | None
+    ) -> Any:
+        run = getattr(executor, method)
+        if not ENABLED:
+            return await run(self.sql, *args, timeout=timeout)
+        start = perf_counter_ns()
+        try:
+            return await run(self.sql, *args, timeout=timeout)
+        finally:
+            self.timings.record(perf_counter_ns() - start)
+
+
 _PATH = Path(__file__).parent
-CREATE_PREFIX_TABLE: Final[str] = load_query(_PATH / "create.sql")
-INSERT: Final[str] = load_query(_PATH / "insert.sql")
-REMOVE: Final[str] = load_query(_PATH / "remove.sql")
-REMOVE_ALL: Final[str] = load_query(_PATH / "remove_all.sql")
-SELECT: Final[str] = load_query(_PATH / "select.sql")
-SELECT_ALL: Final[str] = load_query(_PATH / "select_all.sql")
+QUERIES: Final[dict[str, Query]] = {
+    path.stem: Query(path.stem, load_query(path)) for path in sorted(_PATH.glob("*.sql"))
+}
+CHANGES: Final[Query] = QUERIES["changes"]
+INSERT: Final[Query] = QUERIES["insert"]
+NOTIFY: Final[Query] = QUERIES["notify"]
+REMOVE: Final[Query] = QUERIES["remove"]
+REMOVE_ALL: Final[Query] = QUERIES["remove_all"]
+SELECT: Final[Query] = QUERIES["select"]
+SELECT_ALL: Final[Query] = QUERIES["select_all"]
+SELECT_MANY: Final[Query] = QUERIES["select_many"]
+SELECT_SHARDS: Final[Query] = QUERIES["select_shards"]
+WATERMARK: Final[Query] = QUERIES["watermark"]
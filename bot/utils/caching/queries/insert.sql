@@ -15,5 +15,14 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 */
-INSERT INTO guild_prefixes (guild_id, guild_prefix) 
-VALUES ($1, $2);
\ No newline at end of file
+-- Inserts the given prefixes and returns every prefix the guild is left with,
+-- the outer query cannot see the rows inserted by the CTE, hence the union.
+WITH inserted AS (
+    INSERT INTO guild_prefixes (guild_id, guild_prefix)
+    SELECT $1, UNNEST($2::VARCHAR[])
+    RETURNING guild_id, guild_prefix
+)
+SELECT guild_id, guild_prefix FROM guild_prefixes
+WHERE guild_id = $1
+UNION ALL
+SELECT guild_id, guild_prefix FROM inserted;
\ No newline at end of file
@@ -15,6 +15,13 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 */
-DELETE FROM guild_prefixes
+-- Removes the given prefix and returns every prefix the guild is left with,
+-- the outer query still sees the row deleted by the CTE, hence the filter.
+WITH removed AS (
+    DELETE FROM guild_prefixes
+    WHERE guild_id = $1
+        AND guild_prefix = $2
+)
+SELECT guild_id, guild_prefix FROM guild_prefixes
 WHERE guild_id = $1
-    AND guild_prefix = $2;
\ No newline at end of file
+    AND guild_prefix <> $2;
\ No newline at end of file
@@ -15,5 +15,5 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 */
-SELECT * FROM guild_prefixes
+SELECT guild_id, guild_prefix FROM guild_prefixes
 WHERE guild_id = $1;
\ No newline at end of file
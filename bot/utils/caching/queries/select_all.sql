@@ -15,4 +15,4 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 */
-SELECT * FROM guild_prefixes;
\ No newline at end of file
+SELECT guild_id, guild_prefix FROM guild_prefixes;
\ No newline at end of file
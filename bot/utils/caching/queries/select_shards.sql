@@ -0,0 +1,21 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+-- Discord puts a guild on shard (guild_id >> 22) % shard_count,
+-- this pulls the guilds of the given shards only.
+SELECT guild_id, guild_prefix FROM guild_prefixes
+WHERE (guild_id >> 22) % $1 = ANY($2::BIGINT[]);
\ No newline at end of file
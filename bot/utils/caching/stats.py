@@ -0,0 +1,72 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+from typing import ClassVar, Final
+
+from utils.benchmark import Histogram
+
+__all__: Final[tuple[str]] = ("CacheStats",)
+
+
+class CacheStats:
+    """
+    Counters kept by every cache, these are plain integers so that
+    counting a lookup costs next to nothing.
+    Loads (pulls of single keys, or batches of them) are timed into a histogram.
+
+    Args:
+        name (str): The name of the cache, which the load histogram is named after
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("hits", "misses", "evictions", "loads")
+
+    def __init__(self, name: str) -> None:
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.loads: Histogram = Histogram(f"{name}.load")
+
+    def __repr__(self) -> str:
+        return (
+            f"<CacheStats hits={self.hits} misses={self.misses} "
+            f"evictions={self.evictions} loads={self.loads.count}>"
+        )
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        Returns:
+            float: The share of lookups that were hits, 0.0 when there were none
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> dict[str, float]:
+        """
+        Returns:
+            dict[str, float]: The counters, the hit ratio and the load latency
+            percentiles (in seconds), ready to be logged
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "evictions": self.evictions,
+            **{f"load_{name}": value for name, value in self.loads.summary().items()},
+        }
@@ -0,0 +1,276 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Final,
+    Hashable,
+    ItemsView,
+    Iterable,
+    Iterator,
+    KeysView,
+    Mapping,
+    ValuesView,
+)
+
+__all__: Final[tuple[str, ...]] = ("LRUStore", "LFUStore", "TTLStore")
+
+
+class LRUStore(OrderedDict):
+    """
+    A size bounded mapping that evicts the least recently used keys.
+    Setting a key counts as using it, lookups through `__getitem__` do not,
+    so that iterating over the store does not reorder it, use `touch` instead.
+    """
+
+    __slots__: ClassVar[tuple[str, str]] = ("maxsize", "on_evict")
+
+    def __init__(self, maxsize: int, on_evict: Callable[[Hashable], object] | None = None) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        super().__init__()
+        self.maxsize: int = maxsize
+        self.on_evict: Callable[[Hashable], object] | None = on_evict
+
+    def __setitem__(self, key: Hashable, value: object) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            evicted, _ = self.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def touch(self, key: Hashable) -> None:
+        """
+        Marks the key as the most recently used one, if it is present.
+
+        Args:
+            key (Hashable): The key that was used
+        """
+        if key in self:
+            self.move_to_end(key)
+
+
+class LFUStore(dict):
+    """
+    A size bounded mapping that evicts the least frequently used keys,
+    the least recently used one among them when there is a tie.
+    Setting a key and `touch`ing it count as using it, lookups do not.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("maxsize", "on_evict", "__uses", "__buckets", "__least")
+
+    def __init__(self, maxsize: int, on_evict: Callable[[Hashable], object] | None = None) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        super().__init__()
+        self.maxsize: int = maxsize
+        self.on_evict: Callable[[Hashable], object] | None = on_evict
+        self.__uses: dict[Hashable, int] = {}
+        # Keys by how many times they were used, each bucket is in the order of last use
+        self.__buckets: dict[int, dict[Hashable, None]] = {}
+        self.__least: int = 0
+
+    def __setitem__(self, key: Hashable, value: object) -> None:
+        if key in self:
+            super().__setitem__(key, value)
+            self.touch(key)
+            return
+        while len(self) >= self.maxsize:
+            self.__evict()
+        super().__setitem__(key, value)
+        self.__uses[key] = 1
+        self.__buckets.setdefault(1, {})[key] = None
+        self.__least = 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        super().__delitem__(key)
+        self.__unlink(key)
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        if key not in self:
+            return super().pop(key, *default)
+        self.__unlink(key)
+        return super().pop(key)
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        key, value = super().popitem()
+        self.__unlink(key)
+        return key, value
+
+    def clear(self) -> None:
+        super().clear()
+        self.__uses.clear()
+        self.__buckets.clear()
+        self.__least = 0
+
+    def update(
+        self, other: Mapping[Hashable, Any] | Iterable[tuple[Hashable, Any]] = (), /, **kwargs: Any
+    ) -> None:
+        items = other.items() if isinstance(other, Mapping) else other
+        for key, value in items:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def setdefault(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def touch(self, key: Hashable) -> None:
+        """
+        Counts a use of the key, if it is present.
+
+        Args:
+            key (Hashable): The key that was used
+        """
+        if (uses := self.__uses.get(key)) is None:
+            return
+        bucket = self.__buckets[uses]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[uses]
+            if self.__least == uses:
+                self.__least = uses + 1
+        self.__uses[key] = uses + 1
+        self.__buckets.setdefault(uses + 1, {})[key] = None
+
+    def __evict(self) -> None:
+        while self.__least not in self.__buckets:
+            self.__least += 1
+        evicted = next(iter(self.__buckets[self.__least]))
+        del self[evicted]
+        if self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def __unlink(self, key: Hashable) -> None:
+        uses = self.__uses.pop(key)
+        bucket = self.__buckets[uses]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[uses]
+
+
+class TTLStore(OrderedDict):
+    """
+    A size bounded mapping whose keys expire `ttl` seconds after they were last set,
+    the oldest keys are evicted first when it grows past `maxsize`.
+    Since keys are kept in the order they were set, the expired ones are always at the front,
+    they are purged before every read, which costs a single comparison when none have expired.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("maxsize", "on_evict", "ttl", "__set_at")
+
+    def __init__(
+        self, maxsize: int, on_evict: Callable[[Hashable], object] | None = None, *, ttl: float
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        super().__init__()
+        self.maxsize: int = maxsize
+        self.on_evict: Callable[[Hashable], object] | None = on_evict
+        self.ttl: float = ttl
+        self.__set_at: dict[Hashable, float] = {}
+
+    def __setitem__(self, key: Hashable, value: object) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        self.__set_at[key] = time.monotonic()
+        self.expire()
+        while super().__len__() > self.maxsize:
+            self.__evict(next(super().__iter__()))
+
+    def __getitem__(self, key: Hashable) -> Any:
+        self.expire()
+        return super().__getitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        self.expire()
+        return super().__contains__(key)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        self.expire()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self.expire()
+        return super().__len__()
+
+    def __delitem__(self, key: Hashable) -> None:
+        super().__delitem__(key)
+        del self.__set_at[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self.expire()
+        return super().get(key, default)
+
+    def keys(self) -> KeysView[Hashable]:
+        self.expire()
+        return super().keys()
+
+    def values(self) -> ValuesView[Any]:
+        self.expire()
+        return super().values()
+
+    def items(self) -> ItemsView[Hashable, Any]:
+        self.expire()
+        return super().items()
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        self.__set_at.pop(key, None)
+        return super().pop(key, *default)
+
+    def popitem(self, last: bool = True) -> tuple[Hashable, Any]:
+        key, value = super().popitem(last=last)
+        del self.__set_at[key]
+        return key, value
+
+    def clear(self) -> None:
+        super().clear()
+        self.__set_at.clear()
+
+    def touch(self, key: Hashable) -> None:
+        """
+        Keys expire after they were set rather than used, so this does nothing,
+        it is only here so that every store can be used the same way.
+
+        Args:
+            key (Hashable): The key that was used
+        """
+
+    def expire(self) -> None:
+        """
+        Purges the keys that have expired
+        """
+        deadline = time.monotonic() - self.ttl
+        set_at = self.__set_at
+        while set_at and set_at[key := next(OrderedDict.__iter__(self))] < deadline:
+            self.__evict(key)
+
+    def __evict(self, key: Hashable) -> None:
+        del self[key]
+        if self.on_evict is not None:
+            self.on_evict(key)
@@ -0,0 +1,30 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from .index import EmojiEntry, EmojiIndex
+from .tokenizer import QUALIFIED, TOKENIZER, Token, Tokenizer, scan, tokenize
+
+__all__: tuple[str, ...] = (
+    "EmojiEntry",
+    "EmojiIndex",
+    "Token",
+    "Tokenizer",
+    "TOKENIZER",
+    "QUALIFIED",
+    "tokenize",
+    "scan",
+)
@@ -0,0 +1,374 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import bisect
+import sys
+from collections import Counter
+from typing import TYPE_CHECKING, ClassVar, Final, Iterable
+
+if TYPE_CHECKING:
+    from discord import Emoji
+
+__all__: Final[tuple[str, str]] = ("EmojiEntry", "EmojiIndex")
+
+
+def trigrams(name: str) -> frozenset[str]:
+    """
+    Splits a (lowercase) name into its trigrams, the name is padded
+    so that its start and end make up trigrams of their own, like pg_trgm does
+
+    Args:
+        name (str): The name to split
+
+    Returns:
+        frozenset[str]: The distinct trigrams of the name
+    """
+    padded = f"  {name} "
+    return frozenset(padded[index : index + 3] for index in range(len(padded) - 2))
+
+
+def positioned(name: str) -> list[str]:
+    """
+    Splits a (lowercase) name into its trigrams like `trigrams` does,
+    but tags each of them with where in the name it occurs and how long the name is
+
+    Args:
+        name (str): The name to split
+
+    Returns:
+        list[str]: The trigrams, each followed by a character holding its position
+            and another one holding the length of the name
+    """
+    padded = f"  {name} "
+    length = chr(len(name))
+    return [padded[index : index + 3] + chr(index) + length for index in range(len(padded) - 2)]
+
+
+class EmojiEntry:
+    """
+    What the index holds for a single emoji, the name is interned
+    so that emojis sharing a name share the string too
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("id", "guild_id", "name", "animated")
+
+    def __init__(self, emoji_id: int, guild_id: int, name: str, animated: bool) -> None:
+        self.id: int = emoji_id
+        self.guild_id: int = guild_id
+        self.name: str = sys.intern(name)
+        self.animated: bool = animated
+
+    @classmethod
+    def from_emoji(cls, emoji: Emoji) -> EmojiEntry:
+        return cls(emoji.id, emoji.guild_id, emoji.name, emoji.animated)
+
+    def __repr__(self) -> str:
+        return (
+            f"<EmojiEntry id={self.id} guild_id={self.guild_id} name={self.name!r} animated={self.animated}>"
+        )
+
+    def __str__(self) -> str:
+        return f"<{'a' if self.animated else ''}:{self.name}:{self.id}>"
+
+
+class EmojiIndex:
+    """
+    Indexes the emojis of every guild by name, names are matched case insensitively.
+
+    Exact lookups go through a dict of names. Prefix lookups bisect a sorted list of the
+    distinct names, which finds the range of names starting with the prefix like a trie
+    would, at a fraction of the memory. So that adding a name does not shift the whole list,
+    new names go to a small sorted list of their own and removed ones are only marked,
+    both are merged into the main list once there are enough of them.
+    Fuzzy lookups go through an inverted index of trigrams, see `fuzzy`.
+
+    The index is kept up to date guild by guild with `replace_guild` and `drop_guild`,
+    only the emojis that were added or removed are touched.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "__by_id",
+        "__by_guild",
+        "__by_name",
+        "__names",
+        "__pending",
+        "__buried",
+        "__postings",
+    )
+
+    # How many names may be pending or buried before they are merged into the sorted names
+    merge_after: ClassVar[int] = 4096
+
+    def __init__(self) -> None:
+        self.__by_id: dict[int, EmojiEntry] = {}
+        self.__by_guild: dict[int, set[int]] = {}
+        # Lowercase name to the emojis by that name, and the same names sorted
+        self.__by_name: dict[str, list[EmojiEntry]] = {}
+        self.__names: list[str] = []
+        self.__pending: list[str] = []
+        self.__buried: set[str] = set()
+        # Trigram, its position and the length of the name (see `positioned`)
+        # to the lowercase names it occurs in
+        self.__postings: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__by_id)
+
+    def __contains__(self, emoji_id: object) -> bool:
+        return emoji_id in self.__by_id
+
+    def __repr__(self) -> str:
+        return (
+            f"<EmojiIndex emojis={len(self.__by_id)} names={len(self.__by_name)} "
+            f"guilds={len(self.__by_guild)}>"
+        )
+
+    def get(self, emoji_id: int) -> EmojiEntry | None:
+        """
+        Args:
+            emoji_id (int): The ID of the emoji
+
+        Returns:
+            EmojiEntry | None: The emoji, if it is indexed
+        """
+        return self.__by_id.get(emoji_id)
+
+    def add(self, entry: EmojiEntry) -> None:
+        """
+        Indexes an emoji, replacing whatever was indexed under its ID
+
+        Args:
+            entry (EmojiEntry): The emoji
+        """
+        if entry.id in self.__by_id:
+            self.remove(entry.id)
+        self.__by_id[entry.id] = entry
+        self.__by_guild.setdefault(entry.guild_id, set()).add(entry.id)
+        key = sys.intern(entry.name.lower())
+        if (entries := self.__by_name.get(key)) is not None:
+            entries.append(entry)
+            return
+        self.__by_name[key] = [entry]
+        if key in self.__buried:
+            self.__buried.discard(key)
+        else:
+            bisect.insort(self.__pending, key)
+            if len(self.__pending) > self.merge_after:
+                self.__merge()
+        for trigram in positioned(key):
+            self.__postings.setdefault(trigram, set()).add(key)
+
+    def remove(self, emoji_id: int) -> EmojiEntry | None:
+        """
+        Removes an emoji from the index
+
+        Args:
+            emoji_id (int): The ID of the emoji
+
+        Returns:
+            EmojiEntry | None: The emoji that was removed, if it was indexed
+        """
+        if (entry := self.__by_id.pop(emoji_id, None)) is None:
+            return None
+        guild = self.__by_guild[entry.guild_id]
+        guild.discard(emoji_id)
+        if not guild:
+            del self.__by_guild[entry.guild_id]
+        key = entry.name.lower()
+        entries = self.__by_name[key]
+        entries.remove(entry)
+        if entries:
+            return entry
+        del self.__by_name[key]
+        pending = self.__pending
+        index = bisect.bisect_left(pending, key)
+        if index < len(pending) and pending[index] == key:
+            del pending[index]
+        else:
+            self.__buried.add(key)
+            if len(self.__buried) > self.merge_after:
+                self.__merge()
+        for trigram in positioned(key):
+            posting = self.__postings[trigram]
+            posting.discard(key)
+            if not posting:
+                del self.__postings[trigram]
+        return entry
+
+    def replace_guild(self, guild_id: int, emojis: Iterable[Emoji | EmojiEntry]) -> None:
+        """
+        Brings the emojis of a guild up to date, only the emojis
+        that were added, removed or renamed are indexed again
+
+        Args:
+            guild_id (int): The ID of the guild
+            emojis (Iterable[Emoji | EmojiEntry]): Every emoji the guild has now
+        """
+        stale = set(self.__by_guild.get(guild_id, ()))
+        for emoji in emojis:
+            stale.discard(emoji.id)
+            indexed = self.__by_id.get(emoji.id)
+            if indexed is not None and indexed.name == emoji.name and indexed.animated == emoji.animated:
+                continue
+            self.add(
+                emoji
+                if isinstance(emoji, EmojiEntry)
+                else EmojiEntry(emoji.id, guild_id, emoji.name, emoji.animated)
+            )
+        for emoji_id in stale:
+            self.remove(emoji_id)
+
+    def drop_guild(self, guild_id: int) -> None:
+        """
+        Removes every emoji of a guild from the index
+
+        Args:
+            guild_id (int): The ID of the guild
+        """
+        for emoji_id in tuple(self.__by_guild.get(guild_id, ())):
+            self.remove(emoji_id)
+
+    def exact(self, name: str) -> list[EmojiEntry]:
+        """
+        Args:
+            name (str): The name of the emoji
+
+        Returns:
+            list[EmojiEntry]: Every emoji by that name, across every guild
+        """
+        return list(self.__by_name.get(name.lower(), ()))
+
+    def prefix(self, prefix: str, limit: int = 25) -> list[EmojiEntry]:
+        """
+        Args:
+            prefix (str): What the names have to start with
+            limit (int): The most emojis to return
+
+        Returns:
+            list[EmojiEntry]: The emojis whose names start with the prefix, in alphabetical order
+        """
+        prefix = prefix.lower()
+        buried = self.__buried
+        # Every name has an emoji at least, so `limit` names out of either list are plenty
+        matched: list[str] = []
+        for names in (self.__names, self.__pending):
+            taken = 0
+            for index in range(bisect.bisect_left(names, prefix), len(names)):
+                name = names[index]
+                if taken >= limit or not name.startswith(prefix):
+                    break
+                if name not in buried:
+                    matched.append(name)
+                    taken += 1
+        matched.sort()
+
+        by_name = self.__by_name
+        found: list[EmojiEntry] = []
+        for name in matched:
+            found.extend(by_name[name][: limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
+
+    def fuzzy(
+        self, query: str, limit: int = 25, max_edits: int = 1, threshold: float = 0.3
+    ) -> list[EmojiEntry]:
+        """
+        Finds the emojis whose names are similar to the query, even if they are misspelt.
+        Every edit to a name breaks at most 3 of its trigrams and shifts the others by at most
+        one position, so a name that is at most `max_edits` edits away still has all but
+        `3 * max_edits` of the trigrams of the query, no further than `max_edits` positions
+        away from where the query has them, and is at most `max_edits` characters longer
+        or shorter than the query. Such a name has to turn up within the rarest
+        `3 * max_edits + 1` of those trigrams, so names are only picked out of these,
+        counting how many of them they were found in. The best counted ones are then ranked
+        by how similar they are to the query (the Jaccard index of their trigrams).
+        A short name that is a single edit away shares few trigrams with the query, so the
+        threshold is lowered to the least similarity a name within `max_edits` edits can have.
+
+        Args:
+            query (str): The name to look for
+            limit (int): The most emojis to return
+            max_edits (int): How many edits (insertions, deletions or substitutions)
+                away from the query a name can be to be picked
+            threshold (float): The least similarity (between 0 and 1) a name further
+                than `max_edits` edits away must have
+
+        Returns:
+            list[EmojiEntry]: The emojis with the most similar names first
+        """
+        query = query.lower()
+        wanted = trigrams(query)
+        padded = f"  {query} "
+        postings = self.__postings
+        lengths = [
+            chr(length) for length in range(max(1, len(query) - max_edits), len(query) + max_edits + 1)
+        ]
+        # Every trigram of the query, along with the names of about the same length
+        # having it close to the same position
+        nearby: list[list[set[str]]] = []
+        for index in range(len(padded) - 2):
+            trigram = padded[index : index + 3]
+            nearby.append(
+                [
+                    posting
+                    for position in range(max(0, index - max_edits), index + max_edits + 1)
+                    for length in lengths
+                    if (posting := postings.get(trigram + chr(position) + length)) is not None
+                ]
+            )
+        nearby.sort(key=lambda found: sum(map(len, found)))
+
+        shared: Counter[str] = Counter()
+        for found in nearby[: 3 * max_edits + 1]:
+            for posting in found:
+                shared.update(posting)
+
+        # The query has len(wanted) trigrams, a name within `max_edits` edits keeps all but
+        # `3 * max_edits` of them and has at most `max_edits` more
+        kept = max(len(wanted) - 3 * max_edits, 0)
+        threshold = min(threshold, kept / (len(wanted) + 4 * max_edits))
+        scored: list[tuple[float, str]] = []
+        for name, _ in shared.most_common(2 * limit):
+            # Counting the trigrams of the name with repeats, which is close enough
+            padded = f"  {name} "
+            common = sum(trigram in padded for trigram in wanted)
+            score = common / (len(padded) - 2 + len(wanted) - common)
+            if score >= threshold:
+                scored.append((score, name))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        by_name = self.__by_name
+        found: list[EmojiEntry] = []
+        for _, name in scored:
+            found.extend(by_name[name][: limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
+
+    def __merge(self) -> None:
+        names = self.__names
+        # Both lists are sorted already, which is the best case of the sort
+        names.extend(self.__pending)
+        names.sort()
+        if self.__buried:
+            buried = self.__buried
+            names[:] = [name for name in names if name not in buried]
+        self.__pending.clear()
+        self.__buried.clear()
@@ -0,0 +1,280 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import itertools
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import ClassVar, Final, Iterable, Iterator
+
+__all__: Final[tuple[str, ...]] = (
+    "Token",
+    "CUSTOM_EMOJI",
+    "Tokenizer",
+    "TOKENIZER",
+    "QUALIFIED",
+    "load_sequences",
+    "variants",
+    "tokenize",
+    "scan",
+)
+
+SEQUENCES: Final[Path] = Path(__file__).parent / "sequences.txt"
+VS16: Final[str] = "\ufe0f"
+
+CUSTOM_EMOJI: Final[str] = r"<(?P<animated>a?):(?P<name>[A-Za-z0-9_]{2,32}):(?P<id>[0-9]{15,21})>"
+
+
+def load_sequences(file_path: str | Path = SEQUENCES) -> list[str]:
+    """
+    Loads the fully-qualified emoji sequences
+
+    Args:
+        file_path (str | Path): The file with one sequence of hexadecimal code points per line
+
+    Returns:
+        list[str]: The sequences
+    """
+    with open(file_path, "r", encoding="UTF-8") as sequences_file:
+        return [
+            "".join(chr(int(code_point, 16)) for code_point in line.split())
+            for line in sequences_file
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def variants(sequence: str) -> Iterator[str]:
+    """
+    Every way a fully-qualified sequence is written with some of its U+FE0F left out,
+    other than leaving a single code point, which would be the text presentation of it
+    (see ED-18 and ED-18a of UTS #51)
+
+    Args:
+        sequence (str): The fully-qualified sequence
+
+    Yields:
+        str: The minimally-qualified and unqualified sequences, the sequence itself first
+    """
+    parts = sequence.split(VS16)
+    for kept in itertools.product((VS16, ""), repeat=len(parts) - 1):
+        variant = "".join(itertools.chain.from_iterable(zip(parts, kept))) + parts[-1]
+        if variant == sequence or len(variant) > 1:
+            yield variant
+
+
+def _trie(sequences: Iterable[str]) -> dict[str, dict]:
+    root: dict[str, dict] = {}
+    for sequence in sequences:
+        node = root
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return root
+
+
+def _alternatives(node: dict[str, dict]) -> list[str]:
+    # Siblings that are followed by the same thing share a character class
+    tails: defaultdict[str, list[str]] = defaultdict(list)
+    for char, child in node.items():
+        if char:
+            tails[_tail(child)].append(char)
+    alternatives: list[str] = []
+    for tail, chars in tails.items():
+        head = re.escape(chars[0]) if len(chars) == 1 else f"[{''.join(map(re.escape, sorted(chars)))}]"
+        alternatives.append(head + tail)
+    return alternatives
+
+
+def _tail(node: dict[str, dict]) -> str:
+    alternatives = _alternatives(node)
+    if not alternatives:
+        return ""
+    if "" in node:
+        # Greedy, the longest sequence wins and shorter ones are backtracked to
+        return f"(?:{'|'.join(alternatives)})?"
+    return alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+
+
+class Tokenizer:
+    """
+    Finds emojis, both custom emojis and the given Unicode emoji sequences, in a single pass.
+
+    The sequences are compiled into a regular expression shaped like their trie, where no two
+    alternatives start with the same character, so that matching walks down the trie without
+    trying siblings, and the longest sequence at a position is the one that matches.
+    The regular expression engine tells whether a character may start a match by going
+    through every first character one after the other, which is slow with over a thousand of them.
+    Where matches may start is looked for with a second regular expression instead,
+    a character class of a few ranges that covers every first character (and some more),
+    the trie is only matched where it finds something.
+
+    Args:
+        sequences (Iterable[str]): The Unicode emoji sequences
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("pattern", "starts")
+
+    # First characters closer than this are put in the same range, some of those in between slip in
+    GAP: ClassVar[int] = 128
+
+    def __init__(self, sequences: Iterable[str]) -> None:
+        root = _trie(sequences)
+        self.pattern: re.Pattern[str] = re.compile("|".join((CUSTOM_EMOJI, *_alternatives(root))))
+        # Keycaps start with ASCII, which is too common to go looking for on its own
+        keycaps = "".join(re.escape(char) for char in sorted(root) if char and char.isascii())
+        self.starts: re.Pattern[str] = re.compile(
+            f"[<{self.__ranges(char for char in root if char and not char.isascii())}]"
+            f"|[{keycaps}](?=[\\ufe0f\\u20e3])"
+        )
+
+    def __repr__(self) -> str:
+        return f"<Tokenizer pattern={len(self.pattern.pattern)} starts={len(self.starts.pattern)}>"
+
+    def finditer(self, content: str, start: int = 0, end: int | None = None) -> Iterator[re.Match[str]]:
+        """
+        Like `re.Pattern.finditer`, the custom emoji matches have their `animated`, `name` and `id` groups set
+
+        Args:
+            content (str): The text
+            start (int): Where to start looking from
+            end (int | None): Where to stop looking, the end of the text when None
+
+        Yields:
+            re.Match[str]: The emojis, in the order they appear in
+        """
+        end = len(content) if end is None else end
+        search, match = self.starts.search, self.pattern.match
+        while (candidate := search(content, start, end)) is not None:
+            if (found := match(content, candidate.start(), end)) is not None:
+                yield found
+                start = found.end()
+            else:
+                start = candidate.start() + 1
+
+    @classmethod
+    def __ranges(cls, chars: Iterable[str]) -> str:
+        ranges: list[list[int]] = []
+        for code_point in sorted(map(ord, chars)):
+            if ranges and code_point - ranges[-1][1] <= cls.GAP:
+                ranges[-1][1] = code_point
+            else:
+                ranges.append([code_point, code_point])
+        return "".join(
+            re.escape(chr(low)) if low == high else f"{re.escape(chr(low))}-{re.escape(chr(high))}"
+            for low, high in ranges
+        )
+
+
+_FULLY_QUALIFIED: Final[list[str]] = load_sequences()
+# Minimally-qualified and unqualified sequences, to the fully-qualified sequence they stand for
+QUALIFIED: Final[dict[str, str]] = {
+    variant: sequence
+    for sequence in _FULLY_QUALIFIED
+    for variant in itertools.islice(variants(sequence), 1, None)
+}
+TOKENIZER: Final[Tokenizer] = Tokenizer(itertools.chain(_FULLY_QUALIFIED, QUALIFIED))
+
+
+class Token:
+    """
+    An emoji found in a piece of text, either a custom emoji or a Unicode emoji sequence.
+    Unicode emojis keep the text they were written with, `emoji` is their fully-qualified form.
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("start", "end", "text", "id", "name", "animated")
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        text: str,
+        emoji_id: int | None = None,
+        name: str | None = None,
+        animated: bool = False,
+    ) -> None:
+        self.start: int = start
+        self.end: int = end
+        self.text: str = text
+        self.id: int | None = emoji_id
+        self.name: str | None = name
+        self.animated: bool = animated
+
+    def __repr__(self) -> str:
+        return f"<Token start={self.start} end={self.end} text={self.text!r}>"
+
+    @property
+    def custom(self) -> bool:
+        """
+        Returns:
+            bool: Whether this is a custom emoji
+        """
+        return self.id is not None
+
+    @property
+    def emoji(self) -> str:
+        """
+        Returns:
+            str: The ID of a custom emoji, or the fully-qualified sequence of a Unicode emoji
+        """
+        if self.id is not None:
+            return str(self.id)
+        return QUALIFIED.get(self.text, self.text)
+
+
+def _skippable(content: str) -> bool:
+    # Every emoji has either a `<` or something beyond ASCII in it, which most messages have neither of
+    return content.isascii() and "<" not in content
+
+
+def tokenize(content: str, start: int = 0, end: int | None = None) -> Iterator[Token]:
+    """
+    Finds the emojis in a piece of text in a single pass, lazily
+
+    Args:
+        content (str): The text
+        start (int): Where to start looking from
+        end (int | None): Where to stop looking, the end of the text when None
+
+    Yields:
+        Token: The emojis, in the order they appear in
+    """
+    if _skippable(content):
+        return
+    for match in TOKENIZER.finditer(content, start, end):
+        if (emoji_id := match["id"]) is not None:
+            yield Token(
+                match.start(), match.end(), match[0], int(emoji_id), match["name"], bool(match["animated"])
+            )
+        else:
+            yield Token(match.start(), match.end(), match[0])
+
+
+def scan(content: str) -> list[str]:
+    """
+    Lists the emojis of a piece of text, like `tokenize` does without building a token for each of them
+
+    Args:
+        content (str): The text
+
+    Returns:
+        list[str]: The ID of every custom emoji, the fully-qualified sequence of every Unicode emoji
+    """
+    if _skippable(content):
+        return []
+    return [match["id"] or QUALIFIED.get(match[0], match[0]) for match in TOKENIZER.finditer(content)]
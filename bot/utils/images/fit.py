@@ -0,0 +1,238 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import io
+import math
+import time
+from typing import ClassVar, Final
+
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+__all__: Final[tuple[str, ...]] = ("EMOJI_LIMIT", "UPLOADABLE", "FitResult", "fit_emoji")
+
+# Discord refuses emojis larger than this
+EMOJI_LIMIT: Final[int] = 256 * 1024
+# The formats Discord takes emojis in
+UPLOADABLE: Final[frozenset[str]] = frozenset({"PNG", "JPEG", "GIF", "WEBP"})
+# Images with more pixels than this (across every frame) are refused outright
+MAX_PIXELS: Final[int] = 64_000_000
+# Aim a little below the limit, so that the size estimate being off does not cost another pass
+_HEADROOM: Final[float] = 0.92
+
+
+class _ViewReader(io.RawIOBase):
+    """
+    Reads an image straight out of a buffer, such as a block of shared memory,
+    where `io.BytesIO` would copy the whole of it first. The buffer is let go of on close.
+    """
+
+    __slots__: ClassVar[tuple[str, str]] = ("__view", "__offset")
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        super().__init__()
+        self.__view: memoryview = memoryview(data).cast("B")
+        self.__offset: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with memoryview(buffer).cast("B") as target:
+            chunk = self.__view[self.__offset : self.__offset + len(target)]
+            target[: len(chunk)] = chunk
+        self.__offset += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.__offset, io.SEEK_END: len(self.__view)}[whence]
+        if base + offset < 0:
+            raise ValueError("Negative seek position")
+        self.__offset = base + offset
+        return self.__offset
+
+    def tell(self) -> int:
+        return self.__offset
+
+    def close(self) -> None:
+        if not self.closed:
+            self.__view.release()
+        super().close()
+
+
+class FitResult:
+    """
+    An image that fits within the size limit, along with how it got there
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("data", "format", "width", "height", "frames", "passes")
+
+    def __init__(self, data: bytes, format: str, width: int, height: int, frames: int, passes: int) -> None:
+        self.data: bytes = data
+        self.format: str = format
+        self.width: int = width
+        self.height: int = height
+        self.frames: int = frames
+        # How many times the image was encoded, 0 when it already fit as it was
+        self.passes: int = passes
+
+    def __repr__(self) -> str:
+        return (
+            f"<FitResult format={self.format} size={len(self.data)} dimensions={self.width}x{self.height} "
+            f"frames={self.frames} passes={self.passes}>"
+        )
+
+
+def fit_emoji(
+    data: bytes | memoryview,
+    *,
+    limit: int = EMOJI_LIMIT,
+    max_side: int = 128,
+    min_side: int = 48,
+    deadline: float | None = None,
+) -> FitResult:
+    """
+    Shrinks an image until it is no larger than `limit` bytes, this is CPU bound and meant to
+    run on a worker process. Images are scaled so that their longer side is at most `max_side`
+    (which is all Discord shows of an emoji anyway), images that already fit are left alone.
+
+    Every encode pass tells how many bytes a pixel of a frame takes, assuming that stays about
+    the same, the next pass is sized to land just under the limit, which usually takes one
+    or two passes. Animations are shrunk down to `min_side` at most, past that every other
+    frame is dropped (the durations of the dropped frames are added to the kept ones).
+
+    Args:
+        data (bytes | memoryview): The image, anything Pillow can open, it is read in place
+        limit (int): The most bytes the result can take
+        max_side (int): The longest either side of the result can be
+        min_side (int): Animations are not shrunk below this, frames are dropped instead
+        deadline (float | None): The `time.monotonic` after which the fitting is given up on
+
+    Raises:
+        ValueError: The image cannot be opened, or is too large to be worth opening
+        TimeoutError: The deadline was exceeded
+
+    Returns:
+        FitResult: The image, as a PNG, or a GIF when it is animated
+    """
+    with io.BufferedReader(_ViewReader(data)) as file:
+        try:
+            image = Image.open(file)
+        except (UnidentifiedImageError, Image.DecompressionBombError) as exc:
+            raise ValueError(f"Cannot open the image: {exc}") from exc
+        with image:
+            frame_count = getattr(image, "n_frames", 1)
+            if image.width * image.height * frame_count > MAX_PIXELS:
+                raise ValueError(
+                    f"Image of {image.width}x{image.height} with {frame_count} frames is too large"
+                )
+            if image.format in UPLOADABLE and len(data) <= limit and max(image.size) <= max_side:
+                return FitResult(bytes(data), image.format, image.width, image.height, frame_count, 0)
+            if frame_count > 1:
+                frames: list[Image.Image] = []
+                durations: list[int] = []
+                for frame in ImageSequence.Iterator(image):
+                    frames.append(frame.convert("RGBA"))
+                    durations.append(frame.info.get("duration", 100))
+                    _check(deadline)
+                return _fit_animated(frames, durations, limit, max_side, min_side, deadline)
+            return _fit_static(image.convert("RGBA"), limit, max_side, deadline)
+
+
+def _fit_static(image: Image.Image, limit: int, max_side: int, deadline: float | None) -> FitResult:
+    side = min(max_side, max(image.size))
+    passes = 0
+    while True:
+        _check(deadline)
+        scaled = _scale(image, side)
+        buffer = io.BytesIO()
+        scaled.save(buffer, "PNG", optimize=True)
+        passes += 1
+        if buffer.tell() <= limit or side <= 1:
+            return FitResult(buffer.getvalue(), "PNG", scaled.width, scaled.height, 1, passes)
+        side = _next_side(side, buffer.tell(), limit)
+
+
+def _fit_animated(
+    frames: list[Image.Image],
+    durations: list[int],
+    limit: int,
+    max_side: int,
+    min_side: int,
+    deadline: float | None,
+) -> FitResult:
+    side = min(max_side, max(frames[0].size))
+    passes = 0
+    while True:
+        _check(deadline)
+        scaled = [_scale(frame, side) for frame in frames]
+        buffer = io.BytesIO()
+        scaled[0].save(
+            buffer,
+            "GIF",
+            save_all=True,
+            append_images=scaled[1:],
+            duration=durations,
+            loop=0,
+            disposal=2,
+            optimize=True,
+        )
+        passes += 1
+        size = buffer.tell()
+        if size <= limit or (side <= 1 and len(frames) == 1):
+            return FitResult(buffer.getvalue(), "GIF", scaled[0].width, scaled[0].height, len(frames), passes)
+        wanted = _next_side(side, size, limit)
+        if wanted >= min(min_side, side) or len(frames) == 1:
+            side = wanted
+            continue
+        # Shrinking any further would make the emoji unrecognisable, so fewer frames have to do,
+        # the bytes a frame takes at `min_side` tell how many of them fit
+        target = min(min_side, side)
+        per_frame = size / len(frames) * (target / side) ** 2
+        side = target
+        step = max(2, math.ceil(len(frames) * per_frame / (limit * _HEADROOM)))
+        frames, durations = _drop_frames(frames, durations, step)
+
+
+def _scale(image: Image.Image, side: int) -> Image.Image:
+    if max(image.size) <= side:
+        return image
+    ratio = side / max(image.size)
+    size = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _next_side(side: int, size: int, limit: int) -> int:
+    # The size grows with the number of pixels, that is with the square of the side
+    return max(1, min(side - 1, math.floor(side * math.sqrt(limit * _HEADROOM / size))))
+
+
+def _drop_frames(
+    frames: list[Image.Image], durations: list[int], step: int
+) -> tuple[list[Image.Image], list[int]]:
+    kept = frames[::step]
+    merged = [sum(durations[index : index + step]) for index in range(0, len(durations), step)]
+    return kept, merged
+
+
+def _check(deadline: float | None) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError("Fitting the image took too long")
@@ -0,0 +1,190 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, ClassVar, Final
+
+from utils.benchmark import Histogram, histogram
+
+from .fit import EMOJI_LIMIT, FitResult, fit_emoji
+
+__all__: Final[tuple[str, ...]] = ("ImagePipeline", "PipelineFull")
+
+logger = logging.getLogger(__name__)
+
+# Images larger than this cross over to the workers through shared memory rather than the pipe of the pool,
+# the workers read them in place. Results are at most the emoji limit and come back through the pipe
+SHARED_THRESHOLD: Final[int] = 64 * 1024
+# Large images are copied into shared memory this many bytes at a time, yielding to the event loop in between
+COPY_CHUNK: Final[int] = 1024 * 1024
+
+
+class PipelineFull(RuntimeError):
+    """
+    Raised when the pipeline already has as many images as it may have queued
+    """
+
+
+def _initialize(nice: int) -> None:
+    # Workers give way to the bot itself whenever they compete for a CPU
+    if nice:
+        os.nice(nice)
+    signal.signal(signal.SIGALRM, _expire)
+
+
+def _expire(_signum: int, _frame: object) -> None:
+    raise TimeoutError("Fitting the image took too long")
+
+
+def _run(source: bytes | tuple[str, int], options: dict[str, Any], timeout: float) -> FitResult:
+    # Fitting checks the deadline between passes, the alarm catches a single pass that runs over
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if isinstance(source, bytes):
+            return fit_emoji(source, deadline=time.monotonic() + timeout, **options)
+        name, size = source
+        # The parent owns the block and unlinks it once the job is done
+        shared = SharedMemory(name)
+        try:
+            view = shared.buf[:size]
+            try:
+                return fit_emoji(view, deadline=time.monotonic() + timeout, **options)
+            finally:
+                view.release()
+        finally:
+            shared.close()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class ImagePipeline:
+    """
+    Fits images for emoji uploads on a pool of worker processes (see `fit_emoji`),
+    so that the CPU bound work never holds up the event loop.
+    At most `max_pending` images may be queued or in flight at once, `fit` raises `PipelineFull`
+    past that rather than letting the queue grow without bound. Every job is given `timeout`
+    seconds, which the workers enforce on themselves so that a job that runs over does not
+    keep a worker busy either. The worker processes are only started on the first job.
+
+    Args:
+        workers (int | None): How many worker processes to run, None for half of the CPUs
+        max_pending (int): How many images may be queued or in flight at once
+        timeout (float): How long a job may take, in seconds
+        nice (int): How much lower the priority of the workers is than that of the bot
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "workers",
+        "max_pending",
+        "timeout",
+        "nice",
+        "pending",
+        "timings",
+        "__executor",
+    )
+
+    def __init__(
+        self, *, workers: int | None = None, max_pending: int = 32, timeout: float = 20.0, nice: int = 5
+    ) -> None:
+        self.workers: int = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_pending: int = max_pending
+        self.timeout: float = timeout
+        self.nice: int = nice
+        self.pending: int = 0
+        self.timings: Histogram = histogram(f"{__name__}.fit")
+        self.__executor: ProcessPoolExecutor | None = None
+
+    def __repr__(self) -> str:
+        return f"<ImagePipeline workers={self.workers} pending={self.pending} max_pending={self.max_pending}>"
+
+    async def fit(self, data: bytes, *, limit: int = EMOJI_LIMIT, max_side: int = 128) -> FitResult:
+        """
+        Shrinks an image until it fits within the size limit of emojis
+
+        Args:
+            data (bytes): The image
+            limit (int): The most bytes the result can take
+            max_side (int): The longest either side of the result can be
+
+        Raises:
+            PipelineFull: There are `max_pending` images queued already
+            ValueError: The image cannot be opened, or is too large to be worth opening
+            TimeoutError: The image took longer than `timeout` seconds
+
+        Returns:
+            FitResult: The image that fits
+        """
+        if self.pending >= self.max_pending:
+            raise PipelineFull(f"There are {self.pending} images being fitted already")
+        self.pending += 1
+        shared: SharedMemory | None = None
+        start = time.perf_counter_ns()
+        try:
+            source: bytes | tuple[str, int] = data
+            if len(data) > SHARED_THRESHOLD:
+                shared = SharedMemory(create=True, size=len(data))
+                with memoryview(data) as view:
+                    for offset in range(0, len(data), COPY_CHUNK):
+                        shared.buf[offset : offset + COPY_CHUNK] = view[offset : offset + COPY_CHUNK]
+                        await asyncio.sleep(0)
+                source = (shared.name, len(data))
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.__start(), _run, source, {"limit": limit, "max_side": max_side}, self.timeout
+            )
+            # The worker gives up on its own after `timeout`, this only covers it being stuck in the queue
+            return await asyncio.wait_for(future, self.timeout * 2)
+        except BrokenProcessPool:
+            # A worker died (most likely killed for running out of memory), the next job starts a new pool
+            logger.error("The image workers broke down, restarting them on the next job")
+            self.close()
+            raise
+        finally:
+            self.pending -= 1
+            self.timings.record(time.perf_counter_ns() - start)
+            if shared is not None:
+                shared.close()
+                shared.unlink()
+
+    def close(self) -> None:
+        """
+        Stops the worker processes, along with whatever jobs they had queued
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+    def __start(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            logger.info("Starting %s image workers", self.workers)
+            self.__executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize,
+                initargs=(self.nice,),
+            )
+        return self.__executor
@@ -0,0 +1,62 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+from typing import Final
+
+import psutil
+from discord import Client
+
+__all__: Final[tuple[str, ...]] = ("process_memory", "discord_caches")
+
+_PROCESS: Final[psutil.Process] = psutil.Process()
+
+
+def process_memory() -> dict[str, int]:
+    """
+    Returns:
+        dict[str, int]: The resident set size and the virtual memory size of this process, in bytes
+    """
+    info = _PROCESS.memory_info()
+    return {"rss": info.rss, "vms": info.vms}
+
+
+def discord_caches(client: Client) -> dict[str, int]:
+    """
+    Counts the objects that discord.py holds on to, members are counted
+    against the member count of their guilds to tell how many of them are cached.
+
+    Args:
+        client (Client): The client
+
+    Returns:
+        dict[str, int]: The number of objects in each cache
+    """
+    guilds = client.guilds
+    return {
+        "guilds": len(guilds),
+        "members": sum(len(guild.members) for guild in guilds),
+        "member_count": sum(guild.member_count or 0 for guild in guilds),
+        "channels": sum(len(guild.channels) for guild in guilds),
+        "roles": sum(len(guild.roles) for guild in guilds),
+        "emojis": len(client.emojis),
+        "stickers": len(client.stickers),
+        "users": len(client.users),
+        "messages": len(client.cached_messages),
+        "private_channels": len(client.private_channels),
+    }
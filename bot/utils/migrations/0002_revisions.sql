@@ -0,0 +1,60 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+-- Every row carries the ID of the transaction that last wrote it,
+-- which lets the caches pull only what has changed since they last synced.
+ALTER TABLE guild_prefixes
+    ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT txid_current();
+CREATE INDEX IF NOT EXISTS guild_prefixes_revision_idx ON guild_prefixes (revision);
+
+-- Deletions leave a tombstone behind, tombstones older than a day are pruned.
+CREATE TABLE IF NOT EXISTS guild_prefix_tombstones (
+    guild_id BIGINT NOT NULL,
+    revision BIGINT NOT NULL DEFAULT txid_current(),
+    buried_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS guild_prefix_tombstones_revision_idx ON guild_prefix_tombstones (revision);
+CREATE INDEX IF NOT EXISTS guild_prefix_tombstones_buried_at_idx ON guild_prefix_tombstones (buried_at);
+
+CREATE OR REPLACE FUNCTION guild_prefixes_touch() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.revision := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION guild_prefixes_bury() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO guild_prefix_tombstones (guild_id)
+    SELECT DISTINCT guild_id FROM buried;
+    DELETE FROM guild_prefix_tombstones
+    WHERE buried_at < now() - INTERVAL '1 day';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS guild_prefixes_touch ON guild_prefixes;
+CREATE TRIGGER guild_prefixes_touch
+    BEFORE UPDATE ON guild_prefixes
+    FOR EACH ROW EXECUTE FUNCTION guild_prefixes_touch();
+
+DROP TRIGGER IF EXISTS guild_prefixes_bury ON guild_prefixes;
+CREATE TRIGGER guild_prefixes_bury
+    AFTER DELETE ON guild_prefixes
+    REFERENCING OLD TABLE AS buried
+    FOR EACH STATEMENT EXECUTE FUNCTION guild_prefixes_bury();
\ No newline at end of file
@@ -0,0 +1,49 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+-- Prefixes are unique per guild rather than globally, the primary key
+-- doubles as the index every per guild query looks the guild up in.
+ALTER TABLE guild_prefixes DROP CONSTRAINT IF EXISTS guild_prefixes_guild_prefix_key;
+ALTER TABLE guild_prefixes ADD CONSTRAINT guild_prefixes_pkey PRIMARY KEY (guild_id, guild_prefix);
+
+-- Each guild can have 32 or less unique prefixes,
+-- each of such unique prefixes can be up to 32 characters long (see VARCHAR(32)).
+ALTER TABLE guild_prefixes
+    ADD CONSTRAINT guild_prefixes_guild_prefix_check CHECK (guild_prefix <> '');
+
+CREATE OR REPLACE FUNCTION guild_prefixes_limit() RETURNS TRIGGER AS $$
+DECLARE
+    overflown BIGINT;
+BEGIN
+    SELECT guild_id INTO overflown FROM guild_prefixes
+    WHERE guild_id IN (SELECT guild_id FROM inserted)
+    GROUP BY guild_id
+    HAVING count(*) > 32
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'guild % cannot have more than 32 prefixes', overflown
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER guild_prefixes_limit
+    AFTER INSERT ON guild_prefixes
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT EXECUTE FUNCTION guild_prefixes_limit();
\ No newline at end of file
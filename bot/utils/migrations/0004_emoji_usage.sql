@@ -0,0 +1,28 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+-- How many times each emoji was used in a guild, per time bucket (the start of it).
+-- Custom emojis are stored as their ID, Unicode emojis as themselves.
+-- Rows are only ever added to in batches (see utils.usage), never per message.
+CREATE TABLE IF NOT EXISTS emoji_usage (
+    guild_id BIGINT NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    emoji TEXT NOT NULL,
+    uses BIGINT NOT NULL CHECK (uses > 0),
+    PRIMARY KEY (guild_id, bucket, emoji)
+);
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from pathlib import Path
+from typing import ClassVar, Final
+
+from asyncpg import Connection
+
+__all__: Final[tuple[str, ...]] = ("Migration", "load_migrations", "migrate")
+
+logger = logging.getLogger(__name__)
+
+# Held while migrating, so that only one process (of a cluster, say) migrates at a time
+MIGRATION_LOCK: Final[int] = 0x656D6F6A69
+
+_FILE_NAME = re.compile(r"(?P<version>\d+)_(?P<name>\w+)\.sql")
+
+_CREATE_SCHEMA_VERSION: Final[
+    str
+] = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+class Migration:
+    """
+    A single step of the schema, loaded from a `<version>_<name>.sql` file
+
+    Args:
+        version (int): The version the schema is at once this is applied
+        name (str): What the migration does
+        sql (str): The statements to run
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("version", "name", "sql")
+
+    def __init__(self, version: int, name: str, sql: str) -> None:
+        self.version: int = version
+        self.name: str = name
+        self.sql: str = sql
+
+    def __repr__(self) -> str:
+        return f"<Migration version={self.version} name={self.name!r}>"
+
+
+def load_migrations(directory: Path = Path(__file__).parent) -> list[Migration]:
+    """
+    Loads every migration in a directory, in the order they are to be applied
+
+    Args:
+        directory (Path): The directory to look in, defaults to the one of this package
+
+    Raises:
+        ValueError: When two migrations share a version
+
+    Returns:
+        list[Migration]: The migrations, ordered by version
+    """
+    migrations: dict[int, Migration] = {}
+    for path in directory.glob("*.sql"):
+        if (match := _FILE_NAME.fullmatch(path.name)) is None:
+            raise ValueError(f"{path.name} is not named <version>_<name>.sql")
+        version = int(match["version"])
+        if version in migrations:
+            raise ValueError(f"{path.name} has the same version as {migrations[version].name}")
+        migrations[version] = Migration(version, match["name"], path.read_text(encoding="UTF-8"))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def migrate(connection: Connection, migrations: list[Migration] | None = None) -> int:
+    """
+    Applies every migration the database has not seen yet, each one within its own
+    transaction along with the bump of `schema_version`, so a failing migration
+    leaves the schema at the last one that went through.
+
+    Args:
+        connection (Connection): The connection to migrate on
+        migrations (list[Migration] | None): The migrations to apply, defaults to the ones of this package
+
+    Returns:
+        int: The version the schema is at
+    """
+    if migrations is None:
+        migrations = load_migrations()
+    await connection.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK)
+    try:
+        await connection.execute(_CREATE_SCHEMA_VERSION)
+        current: int = await connection.fetchval("SELECT coalesce(max(version), 0) FROM schema_version")
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            logger.info("Migrating schema to version %s (%s)", migration.version, migration.name)
+            async with connection.transaction():
+                await connection.execute(migration.sql)
+                await connection.execute(
+                    "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                    migration.version,
+                    migration.name,
+                )
+            current = migration.version
+        logger.info("Schema is at version %s", current)
+        return current
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK)
@@ -0,0 +1,210 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, ClassVar, Final, Iterable
+
+__all__: Final[tuple[str, ...]] = ("Stage", "Startup")
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    A single step of the startup, which only starts once the stages it requires are ready
+
+    Args:
+        name (str): The name the stage is known by
+        func (Callable[[], Awaitable[None]]): Runs the stage
+        requires (tuple[str, ...]): The stages that have to be ready before this one starts
+        critical (bool): Whether the startup cannot go on without this stage
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = (
+        "name",
+        "func",
+        "requires",
+        "critical",
+        "done",
+        "elapsed",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[None]],
+        requires: tuple[str, ...],
+        critical: bool = False,
+    ) -> None:
+        self.name: str = name
+        self.func: Callable[[], Awaitable[None]] = func
+        self.requires: tuple[str, ...] = requires
+        self.critical: bool = critical
+        self.done: asyncio.Event = asyncio.Event()
+        self.elapsed: float | None = None
+        self.error: BaseException | None = None
+
+    def __repr__(self) -> str:
+        return f"<Stage name={self.name!r} ready={self.ready} elapsed={self.elapsed}>"
+
+    @property
+    def ready(self) -> bool:
+        """
+        Returns:
+            bool: Whether the stage has finished without an error
+        """
+        return self.done.is_set() and self.error is None
+
+
+class Startup:
+    """
+    Runs the stages of the startup concurrently and keeps track of how long each one took.
+    Rather than waiting for the whole startup, whatever depends on a stage
+    can check whether it `is_ready`, or `wait_for` it.
+    Stages that fail are logged, critical ones are handed to `on_failure` as well.
+
+    Args:
+        on_failure (Callable[[Stage], Any] | None): Called with every critical stage that fails
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("stages", "on_failure", "__tasks", "__started_at")
+
+    def __init__(self, *, on_failure: Callable[[Stage], Any] | None = None) -> None:
+        self.stages: dict[str, Stage] = {}
+        self.on_failure: Callable[[Stage], Any] | None = on_failure
+        self.__tasks: set[asyncio.Task[None]] = set()
+        self.__started_at: float | None = None
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[None]],
+        *,
+        requires: Iterable[str] = (),
+        critical: bool = False,
+    ) -> None:
+        """
+        Adds a stage, stages that are added once the startup is underway start right away
+
+        Args:
+            name (str): The name of the stage
+            func (Callable[[], Awaitable[None]]): Runs the stage
+            requires (Iterable[str]): The stages that have to be ready before this one starts
+            critical (bool): Whether the startup cannot go on without this stage
+
+        Raises:
+            ValueError: When there already is a stage by that name
+        """
+        if name in self.stages:
+            raise ValueError(f"There already is a stage named {name}")
+        stage = self.stages[name] = Stage(name, func, tuple(requires), critical)
+        if self.__started_at is not None:
+            self.__spawn(stage)
+
+    def start(self) -> None:
+        """
+        Starts every stage, the ones with requirements wait for them on their own
+
+        Raises:
+            ValueError: When a stage requires a stage that does not exist
+        """
+        for stage in self.stages.values():
+            if missing := [name for name in stage.requires if name not in self.stages]:
+                raise ValueError(f"Stage {stage.name} requires unknown stages {missing}")
+        self.__started_at = time.perf_counter()
+        for stage in self.stages.values():
+            self.__spawn(stage)
+
+    def is_ready(self, name: str) -> bool:
+        """
+        Args:
+            name (str): The name of the stage
+
+        Returns:
+            bool: Whether the stage has finished without an error
+        """
+        return self.stages[name].ready
+
+    async def wait_for(self, name: str) -> bool:
+        """
+        Waits for a stage to finish
+
+        Args:
+            name (str): The name of the stage
+
+        Returns:
+            bool: Whether the stage finished without an error
+        """
+        stage = self.stages[name]
+        await stage.done.wait()
+        return stage.error is None
+
+    def timings(self) -> dict[str, float]:
+        """
+        Returns:
+            dict[str, float]: How many seconds every stage that is done took, by name
+        """
+        return {name: stage.elapsed for name, stage in self.stages.items() if stage.elapsed is not None}
+
+    def cancel(self) -> None:
+        """
+        Cancels the stages that are still running
+        """
+        for task in self.__tasks:
+            task.cancel()
+
+    def __spawn(self, stage: Stage) -> None:
+        task = asyncio.create_task(self.__run(stage), name=f"startup-{stage.name}")
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    def __failed(self, stage: Stage) -> None:
+        if stage.critical and self.on_failure is not None:
+            self.on_failure(stage)
+
+    async def __run(self, stage: Stage) -> None:
+        try:
+            for name in stage.requires:
+                if not await self.wait_for(name):
+                    stage.error = RuntimeError(f"Required stage {name} failed")
+                    logger.error("Startup stage %s was skipped, as %s failed", stage.name, name)
+                    self.__failed(stage)
+                    return
+            started = time.perf_counter()
+            await stage.func()
+            stage.elapsed = time.perf_counter() - started
+            logger.info("Startup stage %s is ready after %.2fs", stage.name, stage.elapsed)
+        except asyncio.CancelledError as exc:
+            stage.error = exc
+            raise
+        except Exception as exc:
+            stage.error = exc
+            logger.exception("Startup stage %s failed", stage.name)
+            self.__failed(stage)
+        finally:
+            stage.done.set()
+        if all(other.done.is_set() for other in self.stages.values()):
+            logger.info(
+                "Startup finished in %.2fs (%s)",
+                time.perf_counter() - self.__started_at,
+                ", ".join(f"{name} {elapsed:.2f}s" for name, elapsed in self.timings().items()),
+            )
@@ -0,0 +1,31 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+(
+    SELECT emoji, sum(uses)::BIGINT AS uses FROM emoji_usage
+    WHERE guild_id = $1 AND bucket >= $2
+    GROUP BY emoji
+    ORDER BY uses DESC, emoji
+    LIMIT $3
+)
+UNION
+-- The emojis with uses yet to be flushed, wherever they rank
+(
+    SELECT emoji, sum(uses)::BIGINT AS uses FROM emoji_usage
+    WHERE guild_id = $1 AND bucket >= $2 AND emoji = ANY($4::TEXT[])
+    GROUP BY emoji
+);
\ No newline at end of file
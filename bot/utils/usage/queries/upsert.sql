@@ -0,0 +1,20 @@
+/*
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+INSERT INTO emoji_usage (guild_id, bucket, emoji, uses)
+SELECT * FROM unnest($1::BIGINT[], $2::TIMESTAMPTZ[], $3::TEXT[], $4::BIGINT[])
+ON CONFLICT (guild_id, bucket, emoji) DO UPDATE SET uses = emoji_usage.uses + EXCLUDED.uses;
\ No newline at end of file
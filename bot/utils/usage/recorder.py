@@ -0,0 +1,176 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, ClassVar, Final, Iterable
+
+from asyncpg import InterfaceError, Pool, PostgresError
+from utils.emojis import QUALIFIED, scan
+
+from .queries import TOP, UPSERT
+
+if TYPE_CHECKING:
+    from discord import Message, RawReactionActionEvent
+
+__all__: Final[tuple[str]] = ("UsageRecorder",)
+
+logger = logging.getLogger(__name__)
+
+# Guild ID, start of the time bucket (as a UNIX timestamp), emoji and how many times it was used
+UsageRow = tuple[int, int, str, int]
+
+
+class UsageRecorder:
+    """
+    Counts how many times emojis are used, in memory, per guild, emoji and time bucket.
+    Recording a use costs a dict lookup, the database only sees the counts when they are
+    flushed, which upserts all of them at once in batches of `max_batch` rows.
+    Counts that could not be flushed are kept for the next flush.
+
+    Args:
+        pool (Pool): The pool to flush the counts with
+        bucket (int): How long a time bucket is, in seconds
+        max_batch (int): The most rows upserted by a single statement
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("pool", "bucket", "max_batch", "recorded", "__counts")
+
+    def __init__(self, pool: Pool, *, bucket: int = 3600, max_batch: int = 10_000) -> None:
+        self.pool: Pool = pool
+        self.bucket: int = bucket
+        self.max_batch: int = max_batch
+        self.recorded: int = 0
+        # Guild ID to the uses of every emoji per time bucket, since the last flush
+        self.__counts: dict[int, Counter[tuple[int, str]]] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self.__counts.values()))
+
+    def __repr__(self) -> str:
+        return f"<UsageRecorder pending={len(self)} recorded={self.recorded} bucket={self.bucket}>"
+
+    def record(self, guild_id: int, emojis: Iterable[str]) -> None:
+        """
+        Counts a use of each of the emojis, in the current time bucket
+
+        Args:
+            guild_id (int): The guild the emojis were used in
+            emojis (Iterable[str]): The IDs of custom emojis and Unicode emojis themselves
+        """
+        if (counts := self.__counts.get(guild_id)) is None:
+            counts = self.__counts[guild_id] = Counter()
+        now = int(time.time())
+        bucket = now - now % self.bucket
+        for emoji in emojis:
+            counts[bucket, emoji] += 1
+            self.recorded += 1
+
+    def record_message(self, message: Message) -> None:
+        """
+        Counts the emojis used in the content of a message, messages outside of guilds are ignored
+
+        Args:
+            message (Message): The message
+        """
+        if message.guild is not None and (emojis := scan(message.content)):
+            self.record(message.guild.id, emojis)
+
+    def record_reaction(self, payload: RawReactionActionEvent) -> None:
+        """
+        Counts the emoji of a reaction, reactions outside of guilds are ignored
+
+        Args:
+            payload (RawReactionActionEvent): The reaction that was added
+        """
+        if payload.guild_id is not None:
+            emoji = payload.emoji
+            key = str(emoji.id) if emoji.id is not None else QUALIFIED.get(emoji.name, emoji.name)
+            self.record(payload.guild_id, (key,))
+
+    async def flush(self) -> int:
+        """
+        Writes every count recorded since the last flush to the database.
+        Rows are sorted so that every process upserts them in the same order,
+        which keeps concurrent flushes from deadlocking on each other.
+
+        Returns:
+            int: The number of rows written
+        """
+        counts, self.__counts = self.__counts, {}
+        rows: list[UsageRow] = sorted(
+            (guild_id, bucket, emoji, uses)
+            for guild_id, uses_of in counts.items()
+            for (bucket, emoji), uses in uses_of.items()
+        )
+        written = 0
+        try:
+            for start in range(0, len(rows), self.max_batch):
+                guild_ids, buckets, emojis, uses = zip(*rows[start : start + self.max_batch])
+                await UPSERT.execute(
+                    self.pool,
+                    guild_ids,
+                    [datetime.fromtimestamp(bucket, timezone.utc) for bucket in buckets],
+                    emojis,
+                    uses,
+                )
+                written += len(guild_ids)
+        except (PostgresError, InterfaceError, OSError):
+            logger.exception(
+                "Could not flush %s emoji usage rows, keeping them for later", len(rows) - written
+            )
+        finally:
+            # Also when the flush is cancelled, for whatever was not written
+            self.__requeue(rows[written:])
+        if written:
+            logger.debug("Flushed %s emoji usage rows", written)
+        return written
+
+    async def top(self, guild_id: int, *, since: datetime, limit: int = 10) -> list[tuple[str, int]]:
+        """
+        The most used emojis of a guild, including the uses that were not flushed yet
+
+        Args:
+            guild_id (int): The ID of the guild
+            since (datetime): Only uses in time buckets starting at or after this are counted
+            limit (int): The most emojis to return
+
+        Returns:
+            list[tuple[str, int]]: The emojis (IDs of custom emojis, Unicode emojis themselves)
+                and how many times they were used, the most used first
+        """
+        after = since.timestamp()
+        pending: Counter[str] = Counter()
+        for (bucket, emoji), uses in self.__counts.get(guild_id, {}).items():
+            if bucket >= after:
+                pending[emoji] += uses
+        # The flushed uses of the pending emojis are fetched too, even the ones outside of the top
+        totals: Counter[str] = Counter()
+        for record in await TOP.fetch(self.pool, guild_id, since, limit, list(pending)):
+            totals[record["emoji"]] = record["uses"]
+        totals.update(pending)
+        return totals.most_common(limit)
+
+    def __requeue(self, rows: list[UsageRow]) -> None:
+        for guild_id, bucket, emoji, uses in rows:
+            if (counts := self.__counts.get(guild_id)) is None:
+                counts = self.__counts[guild_id] = Counter()
+            counts[bucket, emoji] += uses
@@ -0,0 +1,107 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import ClassVar, Hashable
+
+from fakes import FakePool, prefixes_for
+from utils.caching import BaseCache, LRUStore
+from utils.caching.queries import SELECT_ALL, Query
+
+
+class GuildCache(BaseCache):
+    """
+    The least a cache other than `PrefixCache` needs, to make sure `BaseCache` holds up on its own
+    """
+
+    __slots__: ClassVar[tuple[str, ...]] = ("__pool", "__store", "__snapshot")
+
+    def __init__(self, pool: FakePool, *, snapshot: Path | None = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.__pool: FakePool = pool
+        self.__store = self.new_store()
+        self.__snapshot: Path | None = snapshot
+
+    @property
+    def pool(self) -> FakePool:
+        return self.__pool
+
+    @property
+    def __store__(self):
+        return self.__store
+
+    @__store__.setter
+    def __store__(self, value) -> None:
+        self.__store = value
+
+    @property
+    def query(self) -> Query:
+        return SELECT_ALL
+
+    @property
+    def key(self) -> str:
+        return "guild_id"
+
+    @property
+    def compact(self) -> bool:
+        return True
+
+    @property
+    def snapshot(self) -> Path | None:
+        return self.__snapshot
+
+
+def test_pull_keeps_the_store_bounded() -> None:
+    async def main() -> GuildCache:
+        return await GuildCache(FakePool(50, 2), max_size=10)
+
+    cache = asyncio.run(main())
+    assert isinstance(cache.__store__, LRUStore)
+    assert len(cache) == 10
+    assert cache.stats.evictions == 40
+    # The most recently pulled guilds are the ones that are kept
+    assert cache.lookup(49) is not None
+    assert cache.lookup(0) is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_restore_keeps_the_store_bounded(tmp_path: Path) -> None:
+    snapshot = tmp_path / "guilds.snapshot"
+
+    async def main() -> GuildCache:
+        await (await GuildCache(FakePool(50, 2), snapshot=snapshot)).save()
+        bounded = GuildCache(FakePool(50, 2), snapshot=snapshot, max_size=10)
+        assert bounded.restore()
+        return bounded
+
+    cache = asyncio.run(main())
+    assert isinstance(cache.__store__, LRUStore)
+    assert len(cache) == 10
+    assert cache.lookup(49) == tuple(prefixes_for(49, 2))
+
+
+def test_unbounded_store_is_a_dict() -> None:
+    async def main() -> GuildCache:
+        return await GuildCache(FakePool(50, 2))
+
+    cache = asyncio.run(main())
+    assert type(cache.__store__) is dict
+    assert len(cache) == 50
+    assert isinstance(cache[0], tuple)
@@ -0,0 +1,185 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+from discord import DiscordServerError, NotFound
+from discord.http import HTTPClient, Route
+from fakes import FakeDiscord
+from utils.bulk import BulkScheduler, CreateEmoji, DeleteEmoji, EditEmoji, EmojiJob
+
+# The smallest valid GIF, the fake endpoint does not look at it anyway
+IMAGE: bytes = b"GIF89a\x01\x00\x01\x00\x00\x00\x00;"
+
+
+def against(
+    fake: FakeDiscord, scenario: Callable[[HTTPClient], Awaitable[Any]], *, max_ratelimit_timeout: float = 0
+) -> Any:
+    """
+    Runs a scenario with a client of the fake endpoint
+    """
+
+    async def main() -> Any:
+        base, Route.BASE = Route.BASE, await fake.start()
+        http = HTTPClient(asyncio.get_running_loop())
+        if max_ratelimit_timeout:
+            # discord.py does not go below 30 seconds, which is far too long to wait out here
+            http.max_ratelimit_timeout = max_ratelimit_timeout
+        try:
+            await http.static_login("fake")
+            return await scenario(http)
+        finally:
+            await http.close()
+            await fake.close()
+            Route.BASE = base
+
+    return asyncio.run(main())
+
+
+def test_jobs_are_resolved_in_order() -> None:
+    fake = FakeDiscord(latency=0.01)
+    jobs: list[EmojiJob] = [
+        CreateEmoji(1, "first", IMAGE),
+        EditEmoji(2, 10, name="second"),
+        DeleteEmoji(1, 11),
+        CreateEmoji(3, "third", IMAGE),
+    ]
+    progress: list[int] = []
+
+    async def scenario(http: HTTPClient) -> list[Any]:
+        scheduler = BulkScheduler(http)
+        operation = scheduler.submit(jobs, on_progress=lambda op: progress.append(op.done))
+        results = await operation
+        assert operation.finished and operation.progress == 1.0
+        assert scheduler.completed == 4 and not len(scheduler)
+        return results
+
+    created, edited, deleted, other = against(fake, scenario)
+    assert created["name"] == "first" and other["name"] == "third"
+    assert edited == {"id": "10", "name": "second", "roles": [], "animated": False}
+    # Discord responds to deletes with no content
+    assert deleted == ""
+    assert progress == [1, 2, 3, 4]
+
+
+def test_server_errors_are_retried() -> None:
+    fake = FakeDiscord(limit=100, latency=0.001, error_rate=0.3, error_status=503, seed=3)
+
+    async def scenario(http: HTTPClient) -> tuple[BulkScheduler, list[Any]]:
+        scheduler = BulkScheduler(http, base_delay=0.001, max_delay=0.01, max_attempts=10)
+        jobs = [EditEmoji(guild_id, index, name="renamed") for guild_id in (1, 2) for index in range(20)]
+        return scheduler, await scheduler.submit(jobs)
+
+    scheduler, results = against(fake, scenario)
+    assert fake.errors > 0
+    assert scheduler.retries == fake.errors
+    assert scheduler.completed == 40 and scheduler.failed == 0
+    assert not any(isinstance(result, BaseException) for result in results)
+
+
+def test_jobs_are_given_up_on_after_max_attempts() -> None:
+    fake = FakeDiscord(latency=0.001, error_rate=1.0, error_status=503)
+
+    async def scenario(http: HTTPClient) -> tuple[BulkScheduler, list[Any]]:
+        scheduler = BulkScheduler(http, base_delay=0.001, max_delay=0.01, max_attempts=3)
+        return scheduler, await scheduler.submit([DeleteEmoji(1, 1), DeleteEmoji(2, 2)])
+
+    scheduler, results = against(fake, scenario)
+    assert all(isinstance(result, DiscordServerError) for result in results)
+    assert fake.requests == 6
+    assert (scheduler.failed, scheduler.retries) == (2, 4)
+
+
+def test_client_errors_are_not_retried() -> None:
+    fake = FakeDiscord(latency=0.001)
+
+    async def scenario(http: HTTPClient) -> tuple[BulkScheduler, list[Any]]:
+        scheduler = BulkScheduler(http)
+        # Neither makes it to Discord, so neither is worth retrying
+        return scheduler, await scheduler.submit([CreateEmoji(1, "bad", b"not an image"), DeleteEmoji(1, 1)])
+
+    scheduler, (bad, deleted) = against(fake, scenario)
+    assert isinstance(bad, ValueError)
+    assert deleted == ""
+    assert (scheduler.failed, scheduler.retries, fake.requests) == (1, 0, 1)
+
+
+def test_rate_limits_are_waited_out() -> None:
+    fake = FakeDiscord(limit=2, window=0.1, latency=0.001)
+
+    async def scenario(http: HTTPClient) -> tuple[BulkScheduler, list[Any]]:
+        scheduler = BulkScheduler(http, base_delay=0.001)
+        return scheduler, await scheduler.submit([DeleteEmoji(1, index) for index in range(6)])
+
+    scheduler, results = against(fake, scenario, max_ratelimit_timeout=0.01)
+    assert results == [""] * 6
+    # The client raises rather than waiting, and the scheduler waits
+    # the limit out without it counting as a failure
+    assert scheduler.rate_limited > 0
+    assert (scheduler.completed, scheduler.failed) == (6, 0)
+
+
+def test_guilds_are_limited_separately() -> None:
+    fake = FakeDiscord(limit=100, latency=0.02)
+
+    async def scenario(http: HTTPClient) -> BulkScheduler:
+        scheduler = BulkScheduler(http, concurrency=8, per_guild=2)
+        await scheduler.submit([DeleteEmoji(guild_id, index) for guild_id in (1, 2, 3) for index in range(8)])
+        return scheduler
+
+    against(fake, scenario)
+    # Every guild has the most of its jobs in flight that it may, but never more
+    assert fake.peaks == {1: 2, 2: 2, 3: 2}
+
+
+def test_concurrency_is_shared_across_guilds() -> None:
+    fake = FakeDiscord(latency=0.02)
+
+    async def scenario(http: HTTPClient) -> None:
+        scheduler = BulkScheduler(http, concurrency=2, per_guild=1)
+        started = asyncio.get_running_loop().time()
+        await scheduler.submit([DeleteEmoji(guild_id, 1) for guild_id in range(1, 7)])
+        return asyncio.get_running_loop().time() - started
+
+    elapsed = against(fake, scenario)
+    # 6 requests, 2 at a time
+    assert elapsed >= 3 * fake.latency
+    assert set(fake.peaks.values()) == {1}
+
+
+def test_closing_fails_what_is_left() -> None:
+    fake = FakeDiscord(latency=0.05)
+
+    async def scenario(http: HTTPClient) -> list[Any]:
+        scheduler = BulkScheduler(http)
+        operation = scheduler.submit([DeleteEmoji(1, index) for index in range(5)])
+        await asyncio.sleep(0.07)
+        await scheduler.close()
+        return await asyncio.wait_for(operation, timeout=1)
+
+    results = against(fake, scenario)
+    assert results[0] == ""
+    assert all(isinstance(result, asyncio.CancelledError) for result in results[2:])
+
+
+def test_emoji_jobs_are_abstract() -> None:
+    with pytest.raises(TypeError):
+        EmojiJob(1)  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,89 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+from image_pipeline import animation
+from PIL import Image
+from utils.images import EMOJI_LIMIT, ImagePipeline, fit_emoji
+from utils.images.pipeline import SHARED_THRESHOLD
+
+
+def png(side: int) -> bytes:
+    file = io.BytesIO()
+    Image.effect_noise((side, side), 80).convert("RGB").save(file, "PNG")
+    return file.getvalue()
+
+
+def test_images_that_fit_are_left_alone() -> None:
+    image = png(64)
+    result = fit_emoji(image)
+    assert (result.data, result.format, result.passes) == (image, "PNG", 0)
+
+
+def test_large_images_are_shrunk() -> None:
+    result = fit_emoji(png(600), limit=20_000)
+    assert len(result.data) <= 20_000
+    assert max(result.width, result.height) <= 128
+
+
+def test_animations_stay_animated() -> None:
+    result = fit_emoji(animation(200, 30, noise=True), limit=64 * 1024)
+    assert result.format == "GIF" and result.frames > 1
+    assert len(result.data) <= 64 * 1024
+
+
+def test_unreadable_images_are_refused() -> None:
+    with pytest.raises(ValueError):
+        fit_emoji(b"not an image")
+
+
+def test_shared_memory_is_read_in_place() -> None:
+    image = png(300)
+    shared = SharedMemory(create=True, size=len(image))
+    try:
+        shared.buf[: len(image)] = image
+        view = shared.buf[: len(image)]
+        result = fit_emoji(view)
+        # Nothing holds on to the block once the image is fitted, or closing it would fail
+        view.release()
+    finally:
+        shared.close()
+        shared.unlink()
+    assert len(result.data) <= EMOJI_LIMIT
+    assert max(result.width, result.height) <= 128
+
+
+def test_pipeline_fits_on_workers() -> None:
+    images = [png(64), animation(320, 40, noise=True)]
+    assert len(images[1]) > SHARED_THRESHOLD
+
+    async def main() -> list:
+        pipeline = ImagePipeline(workers=1, nice=0)
+        try:
+            return await asyncio.gather(*map(pipeline.fit, images))
+        finally:
+            pipeline.close()
+
+    small, large = asyncio.run(main())
+    assert small.data == images[0]
+    assert large.format == "GIF" and len(large.data) <= EMOJI_LIMIT
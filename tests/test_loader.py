@@ -0,0 +1,115 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from utils.caching import BatchLoader
+
+
+class Recorder:
+    """
+    A `load_many` that doubles its keys and keeps count of the batches it was handed
+    """
+
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+        self.release: asyncio.Event | None = None
+
+    async def __call__(self, keys: list[int]) -> dict[int, int]:
+        self.batches.append(keys)
+        if self.release is not None:
+            await self.release.wait()
+        return {key: key * 2 for key in keys if key >= 0}
+
+
+def test_concurrent_loads_are_batched() -> None:
+    async def main() -> tuple[list[int | None], Recorder]:
+        recorder = Recorder()
+        loader: BatchLoader[int, int] = BatchLoader(recorder, default=-1)
+        values = await asyncio.gather(*(loader.load(key) for key in (1, 2, 2, 3, -5)))
+        return values, recorder
+
+    values, recorder = asyncio.run(main())
+    assert values == [2, 4, 4, 6, -1]
+    assert recorder.batches == [[1, 2, 3, -5]]
+
+
+def test_full_batches_are_dispatched_right_away() -> None:
+    async def main() -> Recorder:
+        recorder = Recorder()
+        loader: BatchLoader[int, int] = BatchLoader(recorder, delay=60, max_batch=2)
+        await asyncio.gather(loader.load(1), loader.load(2))
+        return recorder
+
+    assert asyncio.run(main()).batches == [[1, 2]]
+
+
+def test_failures_reach_every_waiter() -> None:
+    async def failing(keys: list[int]) -> dict[int, int]:
+        raise LookupError(keys)
+
+    async def main() -> list[BaseException | int | None]:
+        loader: BatchLoader[int, int] = BatchLoader(failing)
+        results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+        assert not loader
+        return results
+
+    assert all(isinstance(result, LookupError) for result in asyncio.run(main()))
+
+
+def test_cancelled_batches_do_not_strand_their_keys() -> None:
+    async def main() -> tuple[int | None, Recorder]:
+        recorder = Recorder()
+        recorder.release = asyncio.Event()
+        loader: BatchLoader[int, int] = BatchLoader(recorder)
+        waiter = asyncio.create_task(loader.load(1))
+        while not recorder.batches:
+            await asyncio.sleep(0)
+        # Stands in for the batch being torn down on shutdown
+        (batch,) = asyncio.all_tasks() - {asyncio.current_task(), waiter}
+        batch.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, timeout=1)
+        assert 1 not in loader
+
+        recorder.release.set()
+        return await asyncio.wait_for(loader.load(1), timeout=1), recorder
+
+    value, recorder = asyncio.run(main())
+    assert value == 2
+    assert recorder.batches == [[1], [1]]
+
+
+def test_cancelled_waiters_leave_the_batch_running() -> None:
+    async def main() -> tuple[int | None, Recorder]:
+        recorder = Recorder()
+        recorder.release = asyncio.Event()
+        loader: BatchLoader[int, int] = BatchLoader(recorder)
+        first = asyncio.create_task(loader.load(1))
+        second = asyncio.create_task(loader.load(1))
+        while not recorder.batches:
+            await asyncio.sleep(0)
+        first.cancel()
+        recorder.release.set()
+        return await second, recorder
+
+    value, recorder = asyncio.run(main())
+    assert value == 2
+    assert recorder.batches == [[1]]
@@ -0,0 +1,113 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import asyncpg
+import pytest
+from utils.migrations import MIGRATION_LOCK, load_migrations, migrate
+
+
+def write(directory: Path, **migrations: str) -> Path:
+    for name, sql in migrations.items():
+        (directory / f"{name}.sql").write_text(sql, encoding="UTF-8")
+    return directory
+
+
+def test_migrations_are_loaded_in_order(tmp_path: Path) -> None:
+    write(tmp_path, **{"10_last": "SELECT 1;", "2_first": "SELECT 1;", "3_second": "SELECT 1;"})
+    assert [(migration.version, migration.name) for migration in load_migrations(tmp_path)] == [
+        (2, "first"),
+        (3, "second"),
+        (10, "last"),
+    ]
+
+
+@pytest.mark.parametrize("names", [("1_first", "01_again"), ("first",)])
+def test_badly_named_migrations_are_refused(tmp_path: Path, names: tuple[str, ...]) -> None:
+    write(tmp_path, **dict.fromkeys(names, "SELECT 1;"))
+    with pytest.raises(ValueError):
+        load_migrations(tmp_path)
+
+
+def test_migrating_twice_is_a_no_op(database: str) -> None:
+    latest = load_migrations()[-1].version
+
+    async def main() -> tuple[int, int, list[int]]:
+        connection = await asyncpg.connect(database)
+        try:
+            first, second = await migrate(connection), await migrate(connection)
+            applied = await connection.fetch("SELECT version FROM schema_version ORDER BY version")
+            return first, second, [record["version"] for record in applied]
+        finally:
+            await connection.close()
+
+    first, second, applied = asyncio.run(main())
+    assert first == second == latest
+    assert applied == [migration.version for migration in load_migrations()]
+
+
+def test_concurrent_processes_migrate_once(database: str) -> None:
+    async def main() -> tuple[list[int], list[int]]:
+        connections = [await asyncpg.connect(database) for _ in range(4)]
+        try:
+            versions = await asyncio.gather(*map(migrate, connections))
+            applied = await connections[0].fetch("SELECT version FROM schema_version ORDER BY version")
+            return list(versions), [record["version"] for record in applied]
+        finally:
+            await asyncio.gather(*(connection.close() for connection in connections))
+
+    versions, applied = asyncio.run(main())
+    # Without the advisory lock, the migrations would race and some would fail or run twice
+    assert set(versions) == {load_migrations()[-1].version}
+    assert applied == [migration.version for migration in load_migrations()]
+
+
+def test_a_failing_migration_stops_at_the_last_good_one(database: str, tmp_path: Path) -> None:
+    write(
+        tmp_path,
+        **{
+            "1_create": "CREATE TABLE things (id INTEGER PRIMARY KEY);",
+            "2_broken": "ALTER TABLE things ADD COLUMN name TEXT; SELECT * FROM missing;",
+            "3_never": "ALTER TABLE things ADD COLUMN other TEXT;",
+        },
+    )
+
+    async def main() -> tuple[int, list[str], bool]:
+        connection = await asyncpg.connect(database)
+        other = await asyncpg.connect(database)
+        try:
+            with pytest.raises(asyncpg.UndefinedTableError):
+                await migrate(connection, load_migrations(tmp_path))
+            version = await connection.fetchval("SELECT max(version) FROM schema_version")
+            columns = await connection.fetch(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'things'"
+            )
+            # The lock is let go of even though migrating failed
+            unlocked = await other.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK)
+            return version, [record["column_name"] for record in columns], unlocked
+        finally:
+            await connection.close()
+            await other.close()
+
+    version, columns, unlocked = asyncio.run(main())
+    assert version == 1
+    assert columns == ["id"]
+    assert unlocked
@@ -0,0 +1,38 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from fakes import FakeBot, FakeGuild, FakeMessage, FakePool, prefixes_for
+from prefix_cache import DEFAULT_PREFIX, new_cache
+
+
+async def resolve(cache, guild_id: int) -> tuple[str, ...]:
+    return tuple(await cache(FakeBot(), FakeMessage(FakeGuild(guild_id), "hello")))
+
+
+def test_pull_against_the_fake_pool() -> None:
+    async def main() -> list[tuple[str, ...]]:
+        cache = await new_cache(FakePool(20, 3))
+        return [await resolve(cache, guild_id) for guild_id in (0, 19, 20)]
+
+    found, last, missing = asyncio.run(main())
+    assert set(prefixes_for(0, 3)) <= set(found)
+    assert set(prefixes_for(19, 3)) <= set(last)
+    assert set(missing) >= set(DEFAULT_PREFIX)
@@ -0,0 +1,149 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import asyncpg
+from utils.caching import PrefixCache
+from utils.caching.base import ORIGIN
+from utils.caching.queries import SELECT_ALL
+from utils.migrations import migrate
+
+CHANNEL = "test_guild_prefixes"
+
+
+async def connect(database: str) -> tuple[asyncpg.Pool, asyncpg.Connection]:
+    pool = await asyncpg.create_pool(database, min_size=1, max_size=4)
+    connection = await asyncpg.connect(database)
+    await migrate(connection)
+    await connection.execute(
+        "INSERT INTO guild_prefixes (guild_id, guild_prefix) VALUES (1, '!'), (2, '?'), (2, '$')"
+    )
+    return pool, connection
+
+
+def prefix_cache(pool: asyncpg.Pool, **options) -> PrefixCache:
+    return PrefixCache(
+        pool=pool, fetch_query=SELECT_ALL, key="guild_id", default=["."], compact=True, **options
+    )
+
+
+async def prefixes(cache: PrefixCache, guild_id: int) -> set[str] | None:
+    try:
+        return set(await cache.get_prefix_for(guild_id))
+    except KeyError:
+        return None
+
+
+async def settles_on(cache: PrefixCache, guild_id: int, expected: set[str] | None) -> None:
+    async with asyncio.timeout(2):
+        while await prefixes(cache, guild_id) != expected:
+            await asyncio.sleep(0.01)
+
+
+def test_changes_from_other_processes_are_pulled(database: str) -> None:
+    async def main() -> None:
+        pool, connection = await connect(database)
+        cache = await prefix_cache(pool)
+        await cache.listen(CHANNEL)
+        try:
+            async with connection.transaction():
+                await connection.execute(
+                    "INSERT INTO guild_prefixes (guild_id, guild_prefix) VALUES (3, '>')"
+                )
+                await connection.execute("SELECT pg_notify($1, 'elsewhere:3')", CHANNEL)
+            await settles_on(cache, 3, {">"})
+
+            async with connection.transaction():
+                await connection.execute("DELETE FROM guild_prefixes WHERE guild_id = 2")
+                await connection.execute("SELECT pg_notify($1, 'elsewhere:2')", CHANNEL)
+            await settles_on(cache, 2, None)
+        finally:
+            await cache.unlisten()
+            await connection.close()
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_changes_are_published_once_committed(database: str) -> None:
+    async def main() -> None:
+        pool, connection = await connect(database)
+        cache = await prefix_cache(pool)
+        await cache.listen(CHANNEL)
+        payloads: asyncio.Queue[str] = asyncio.Queue()
+        await connection.add_listener(CHANNEL, lambda *args: payloads.put_nowait(args[-1]))
+        try:
+            loads = cache.stats.loads.count
+            await cache.append(1, "+")
+            async with asyncio.timeout(2):
+                assert await payloads.get() == f"{ORIGIN}:1"
+            assert await prefixes(cache, 1) == {"!", "+"}
+            # The cache is told about its own change too, it is not pulled again for it
+            await asyncio.sleep(0.1)
+            assert cache.stats.loads.count == loads
+        finally:
+            await cache.unlisten()
+            await connection.close()
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_sync_catches_up_on_missed_changes(database: str) -> None:
+    async def main() -> None:
+        pool, connection = await connect(database)
+        cache = await prefix_cache(pool)
+        try:
+            await connection.execute("INSERT INTO guild_prefixes (guild_id, guild_prefix) VALUES (3, '>')")
+            await connection.execute("UPDATE guild_prefixes SET guild_prefix = '#' WHERE guild_id = 1")
+            await connection.execute("DELETE FROM guild_prefixes WHERE guild_id = 2")
+            assert await prefixes(cache, 2) == {"?", "$"}
+
+            await cache.sync()
+            assert [await prefixes(cache, guild_id) for guild_id in (1, 2, 3)] == [{"#"}, None, {">"}]
+        finally:
+            await connection.close()
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_restored_snapshot_catches_up_from_its_watermark(database: str, tmp_path: Path) -> None:
+    snapshot = tmp_path / "prefixes.snapshot"
+
+    async def main() -> None:
+        pool, connection = await connect(database)
+        try:
+            await (await prefix_cache(pool, snapshot=snapshot)).save()
+            await connection.execute("DELETE FROM guild_prefixes WHERE guild_id = 1")
+            await connection.execute("INSERT INTO guild_prefixes (guild_id, guild_prefix) VALUES (3, '>')")
+
+            cache = await prefix_cache(pool, snapshot=snapshot)
+            # Served from the snapshot as it was taken, until the sync in the background is done
+            assert cache.warm
+            assert [await prefixes(cache, guild_id) for guild_id in (1, 2, 3)] == [{"!"}, {"?", "$"}, None]
+            await settles_on(cache, 3, {">"})
+            assert await prefixes(cache, 1) is None
+        finally:
+            await connection.close()
+            await pool.close()
+
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+EmojiWizard is a project licensed under GNU Affero General Public License.
+Copyright (C) 2022-present  Achxy
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from utils.migrations import migrate
+from utils.usage import UsageRecorder
+
+SINCE = datetime.now(timezone.utc) - timedelta(days=1)
+
+
+class CountingPool:
+    """Counts the statements executed on a pool"""
+
+    def __init__(self, pool: asyncpg.Pool) -> None:
+        self.pool = pool
+        self.executed = 0
+
+    async def execute(self, *args, **kwargs) -> str:
+        self.executed += 1
+        return await self.pool.execute(*args, **kwargs)
+
+
+async def connect(database: str) -> asyncpg.Pool:
+    pool = await asyncpg.create_pool(database, min_size=1, max_size=2)
+    async with pool.acquire() as connection:
+        await migrate(connection)
+    return pool
+
+
+async def uses(pool: asyncpg.Pool) -> dict[tuple[int, str], int]:
+    records = await pool.fetch("SELECT guild_id, emoji, SUM(uses) AS uses FROM emoji_usage GROUP BY 1, 2")
+    return {(record["guild_id"], record["emoji"]): record["uses"] for record in records}
+
+
+def test_flushes_are_upserted_in_batches(database: str) -> None:
+    async def main() -> None:
+        pool = await connect(database)
+        counting = CountingPool(pool)
+        recorder = UsageRecorder(counting, max_batch=2)
+        try:
+            recorder.record(1, ["🙂", "🙂", "123"])
+            recorder.record(2, ["🙂", "456", "789"])
+            assert await recorder.flush() == 5
+            assert counting.executed == 3
+            assert len(recorder) == 0
+
+            recorder.record(1, ["🙂", "999"])
+            assert await recorder.flush() == 2
+            assert await uses(pool) == {
+                (1, "🙂"): 3,
+                (1, "123"): 1,
+                (1, "999"): 1,
+                (2, "🙂"): 1,
+                (2, "456"): 1,
+                (2, "789"): 1,
+            }
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_counts_that_could_not_be_flushed_are_kept(database: str) -> None:
+    async def main() -> None:
+        pool = await connect(database)
+        closed = await asyncpg.create_pool(database, min_size=0, max_size=1)
+        await closed.close()
+        recorder = UsageRecorder(closed)
+        try:
+            recorder.record(1, ["🙂", "🙂", "123"])
+            assert await recorder.flush() == 0
+            assert len(recorder) == 2
+
+            recorder.record(1, ["🙂"])
+            recorder.pool = pool
+            assert await recorder.flush() == 2
+            assert await uses(pool) == {(1, "🙂"): 3, (1, "123"): 1}
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_top_counts_pending_and_flushed_uses(database: str) -> None:
+    async def main() -> None:
+        pool = await connect(database)
+        recorder = UsageRecorder(pool)
+        try:
+            recorder.record(1, ["🙂", "🙂", "123", "456"])
+            recorder.record(2, ["123"] * 5)
+            await recorder.flush()
+            recorder.record(1, ["123", "123", "789"])
+            assert await recorder.top(1, since=SINCE) == [("123", 3), ("🙂", 2), ("456", 1), ("789", 1)]
+            assert await recorder.top(1, since=SINCE, limit=1) == [("123", 3)]
+            # Older time buckets are not counted
+            assert await recorder.top(1, since=datetime.now(timezone.utc) + timedelta(hours=2)) == []
+        finally:
+            await pool.close()
+
+    asyncio.run(main())